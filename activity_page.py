@@ -7,18 +7,17 @@
 
 import streamlit as st
 from modules import display_recent_workouts, display_activity_summary
-from data_fetcher import get_user_profile, create_user_post, get_user_workouts, users
+from session_data import get_profile, get_workouts, get_totals, create_post
+from user_session import get_user_id
 import datetime
 import pandas as pd
 import json
-from home_page import userId
-import random
 
-user_id = random.choice(list(users.keys()))
-workout_data = get_user_workouts(user_id)
+user_id = get_user_id()
+workout_data = get_workouts(user_id)
 
 try:
-    user_profile = get_user_profile(user_id)
+    user_profile = get_profile(user_id)
     user_name = user_profile['full_name']
     st.title(f"{user_name}'s Activity Dashboard")
 except ValueError:
@@ -86,10 +85,12 @@ with tab3:
     
     # Create a summary for sharing
     if workout_data:
-        total_workouts = len(workout_data)
-        total_distance = sum(w['distance'] for w in workout_data)
-        total_steps = sum(w['steps'] for w in workout_data)
-        total_calories = sum(w['calories_burned'] for w in workout_data)
+        # All-time totals come from the points rollups instead of re-summing every workout
+        totals = get_totals(user_id)
+        total_workouts = totals['workouts']
+        total_distance = totals['distance']
+        total_steps = totals['steps']
+        total_calories = totals['calories_burned']
         
         share_text = f"""
         🏃‍♂️ My Fitness Journey 🏃‍♀️
@@ -144,7 +145,7 @@ with tab3:
         if st.button("📣 Share to Community"):
             try:
                 # Call function to create a post (we'll implement this next)
-                create_user_post(user_id, share_message)
+                create_post(user_id, share_message)
                 st.success("Successfully shared to community! Your friends can now see your progress.")
             except Exception as e:
                 st.error(f"Error sharing post: {str(e)}")
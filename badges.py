@@ -0,0 +1,179 @@
+#############################################################################
+# badges.py
+#
+# This file contains the badge engine. Each user has a small running state
+# (workout streak, workout count, best calories and longest workout) that is
+# updated in O(1) per new workout, so earned badges never require scanning
+# the user's workout history.
+#
+# The stored states are kept current by leaderboard_utils.record_workout.
+# Run this file to rebuild every user's state from all stored workouts,
+# e.g. for a backfill:
+#
+#   $ python badges.py --rebuild
+#############################################################################
+
+import argparse
+import datetime
+from data_fetcher import get_workouts_for_scoring, replace_badge_states, BADGE_STATE_TABLE
+
+# Badges in display order: (badge_id, title)
+BADGES = [
+    ('calorie_record', "New calories burned record"),
+    ('100_workouts', "100 workouts completed"),
+    ('7_day_streak', "7 day streak"),
+    ('30_day_streak', "30 day streak"),
+    ('longest_workout', "Longest workout ever"),
+]
+
+
+class BadgeState:
+    """
+    One user's running badge state.
+
+    Streaks count consecutive calendar days with at least one workout.
+    Workouts should arrive in start time order; a workout older than the
+    last one still counts towards the totals and records but doesn't change
+    the streak.
+    """
+
+    def __init__(self, last_workout_day=None, current_streak=0, longest_streak=0,
+                 workout_count=0, max_calories=0, max_duration_seconds=0, earned=()):
+        self.last_workout_day = last_workout_day
+        self.current_streak = current_streak
+        self.longest_streak = longest_streak
+        self.workout_count = workout_count
+        self.max_calories = max_calories
+        self.max_duration_seconds = max_duration_seconds
+        self.earned = set(earned)
+
+    def update(self, day, calories_burned, duration_seconds):
+        """
+        Add one workout to the state in O(1).
+
+        Args:
+            day: date the workout started
+            calories_burned: Calories burned by the workout
+            duration_seconds: Length of the workout in seconds
+
+        Returns:
+            List of newly earned badge IDs, in display order
+        """
+        earned_before = set(self.earned)
+
+        if self.last_workout_day is None or day > self.last_workout_day:
+            if self.last_workout_day is not None and day - self.last_workout_day == datetime.timedelta(days=1):
+                self.current_streak += 1
+            else:
+                self.current_streak = 1
+            self.last_workout_day = day
+            self.longest_streak = max(self.longest_streak, self.current_streak)
+
+        # A record only counts once there is an earlier workout to beat
+        if self.workout_count > 0 and calories_burned > self.max_calories:
+            self.earned.add('calorie_record')
+        if self.workout_count > 0 and duration_seconds > self.max_duration_seconds:
+            self.earned.add('longest_workout')
+        self.workout_count += 1
+        self.max_calories = max(self.max_calories, calories_burned)
+        self.max_duration_seconds = max(self.max_duration_seconds, duration_seconds)
+
+        if self.workout_count >= 100:
+            self.earned.add('100_workouts')
+        if self.longest_streak >= 7:
+            self.earned.add('7_day_streak')
+        if self.longest_streak >= 30:
+            self.earned.add('30_day_streak')
+
+        return [badge_id for badge_id, _ in BADGES if badge_id in self.earned and badge_id not in earned_before]
+
+    def update_from_workout(self, workout):
+        """
+        Add a workout dictionary (in the format returned by
+        data_fetcher.get_user_workouts) to the state.
+
+        Returns:
+            List of newly earned badge IDs
+        """
+        start = datetime.datetime.strptime(workout['start_timestamp'], '%Y-%m-%d %H:%M:%S')
+        duration_seconds = 0
+        if workout.get('end_timestamp'):
+            end = datetime.datetime.strptime(workout['end_timestamp'], '%Y-%m-%d %H:%M:%S')
+            duration_seconds = max(0, int((end - start).total_seconds()))
+        return self.update(start.date(), workout.get('calories_burned', 0) or 0, duration_seconds)
+
+    def current_streak_on(self, today):
+        """The streak as of today (0 once a day has been missed)."""
+        if self.last_workout_day is None or (today - self.last_workout_day).days > 1:
+            return 0
+        return self.current_streak
+
+    def badges(self):
+        """Earned badge IDs in display order."""
+        return [badge_id for badge_id, _ in BADGES if badge_id in self.earned]
+
+    def to_row(self, user_id):
+        """The state as a BadgeStates table row."""
+        return {
+            'UserId': user_id,
+            'LastWorkoutDay': self.last_workout_day.isoformat() if self.last_workout_day else None,
+            'CurrentStreak': self.current_streak,
+            'LongestStreak': self.longest_streak,
+            'WorkoutCount': self.workout_count,
+            'MaxCalories': self.max_calories,
+            'MaxDurationSeconds': self.max_duration_seconds,
+            'Badges': self.badges(),
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a state from a row returned by data_fetcher.get_badge_state."""
+        return cls(
+            last_workout_day=row['last_workout_day'],
+            current_streak=row['current_streak'],
+            longest_streak=row['longest_streak'],
+            workout_count=row['workout_count'],
+            max_calories=row['max_calories'],
+            max_duration_seconds=row['max_duration_seconds'],
+            earned=row['badges'],
+        )
+
+
+def rebuild_badge_states(columns):
+    """
+    Replay every workout, oldest first, into fresh per-user states.
+
+    Args:
+        columns: Dictionary of lists from data_fetcher.get_workouts_for_scoring
+
+    Returns:
+        Dictionary of user_id -> BadgeState
+    """
+    states = {}
+    order = sorted(range(len(columns['user_id'])), key=lambda i: columns['start_timestamp'][i])
+    for i in order:
+        state = states.setdefault(columns['user_id'][i], BadgeState())
+        state.update(
+            columns['start_timestamp'][i].date(),
+            columns['calories_burned'][i],
+            columns['duration_seconds'][i]
+        )
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-user badge states.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild every user's badge state from the Workouts table")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        states = rebuild_badge_states(get_workouts_for_scoring(datetime.datetime(1970, 1, 1)))
+        replace_badge_states([state.to_row(user_id) for user_id, state in states.items()])
+        print(f"Rebuilt {BADGE_STATE_TABLE} for {len(states)} users.")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
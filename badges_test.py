@@ -0,0 +1,90 @@
+#############################################################################
+# badges_test.py
+#
+# This file contains tests for badges.py.
+#############################################################################
+import datetime
+import unittest
+from badges import BadgeState, rebuild_badge_states
+
+DAY = datetime.date(2025, 3, 1)
+
+
+class TestBadgeState(unittest.TestCase):
+
+    def test_streaks(self):
+        """Tests that streaks count consecutive days and reset after a gap."""
+        state = BadgeState()
+        earned = []
+        for offset in range(7):
+            earned += state.update(DAY + datetime.timedelta(days=offset), 100, 600)
+        self.assertEqual(state.current_streak, 7)
+        self.assertIn('7_day_streak', earned)
+
+        # A second workout on the same day doesn't extend the streak
+        state.update(DAY + datetime.timedelta(days=6), 50, 60)
+        self.assertEqual(state.current_streak, 7)
+
+        state.update(DAY + datetime.timedelta(days=9), 50, 60)
+        self.assertEqual(state.current_streak, 1)
+        self.assertEqual(state.longest_streak, 7)
+        self.assertEqual(state.current_streak_on(DAY + datetime.timedelta(days=10)), 1)
+        self.assertEqual(state.current_streak_on(DAY + datetime.timedelta(days=11)), 0)
+
+    def test_thirty_day_streak_and_workout_count(self):
+        """Tests the 30 day streak and 100 workouts badges."""
+        state = BadgeState()
+        earned = []
+        for offset in range(100):
+            earned += state.update(DAY + datetime.timedelta(days=offset // 3), 100, 600)
+        self.assertEqual(earned, ['7_day_streak', '30_day_streak', '100_workouts'])
+        self.assertEqual(state.workout_count, 100)
+
+    def test_records(self):
+        """Tests that records need an earlier workout to beat."""
+        state = BadgeState()
+        self.assertEqual(state.update(DAY, 300, 1800), [])
+        self.assertEqual(state.update(DAY, 200, 3600), ['longest_workout'])
+        self.assertEqual(state.update(DAY, 400, 60), ['calorie_record'])
+        # Badges are only emitted the first time they're earned
+        self.assertEqual(state.update(DAY, 500, 7200), [])
+        self.assertEqual(state.badges(), ['calorie_record', 'longest_workout'])
+
+    def test_row_round_trip(self):
+        """Tests saving and loading a state."""
+        state = BadgeState()
+        state.update_from_workout({'start_timestamp': '2025-03-01 08:00:00', 'end_timestamp': '2025-03-01 08:45:00', 'calories_burned': 250})
+        row = state.to_row('user1')
+        self.assertEqual(row['LastWorkoutDay'], '2025-03-01')
+        self.assertEqual(row['MaxDurationSeconds'], 2700)
+
+        loaded = BadgeState.from_row({
+            'last_workout_day': DAY,
+            'current_streak': row['CurrentStreak'],
+            'longest_streak': row['LongestStreak'],
+            'workout_count': row['WorkoutCount'],
+            'max_calories': row['MaxCalories'],
+            'max_duration_seconds': row['MaxDurationSeconds'],
+            'badges': row['Badges'],
+        })
+        self.assertEqual(loaded.update(DAY + datetime.timedelta(days=1), 300, 60), ['calorie_record'])
+        self.assertEqual(loaded.current_streak, 2)
+
+    def test_rebuild_replays_in_order(self):
+        """Tests rebuilding states from unordered workout columns."""
+        columns = {
+            'user_id': ['user1', 'user2', 'user1'],
+            'start_timestamp': [datetime.datetime(2025, 3, 2, 9), datetime.datetime(2025, 3, 2, 9), datetime.datetime(2025, 3, 1, 9)],
+            'calories_burned': [500, 100, 100],
+            'distance': [0.0, 0.0, 0.0],
+            'steps': [0, 0, 0],
+            'duration_seconds': [600, 600, 600],
+        }
+        states = rebuild_badge_states(columns)
+        self.assertEqual(states['user1'].current_streak, 2)
+        self.assertEqual(states['user1'].badges(), ['calorie_record'])
+        self.assertEqual(states['user2'].workout_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,19 @@
 import streamlit as st
 from streamlit_modal import Modal
 from modules import display_genai_advice, display_post
-from data_fetcher import get_genai_advice, get_user_profile, get_user_posts, users, get_user_workouts
-from leaderboard_utils import get_user_rankings, get_user_activity_metrics, get_user_stats
-import random
+from data_fetcher import get_friend_graph
+from leaderboard_utils import (
+    get_user_rankings, get_friends_leaderboard, get_user_activity_metrics, get_user_stats, get_user_badges, pop_new_badges,
+    get_user_display, subscribe_to_points
+)
+from badges import BADGES
+from scoring_rules import get_rules
+from user_session import get_user_id
+from session_data import get_advice, get_posts, get_profile
 import pandas as pd
 
-# Get the user ID only once
-if 'userId' not in globals():
-    userId = random.choice(list(users.keys()))
-else:
-    from home_page import userId
+# The session's user (see user_session.py)
+userId = get_user_id()
 
 # Initialize session state without triggering reruns
 if "initialized" not in st.session_state:
@@ -18,6 +21,13 @@ if "initialized" not in st.session_state:
     st.session_state.time_period = "Week"  # Default: weekly view
     st.session_state.initialized = True
 
+# Seconds between live leaderboard refreshes
+LEADERBOARD_REFRESH_SECONDS = 5
+
+# Each session subscribes once to the points of newly recorded workouts
+if "points_subscription" not in st.session_state:
+    st.session_state.points_subscription = subscribe_to_points(LEADERBOARD_REFRESH_SECONDS)
+
 # Function to toggle view with immediate rerun
 def toggle_view():
     st.session_state.view_mode = "activity" if st.session_state.view_mode == "leaderboard" else "leaderboard"
@@ -27,6 +37,53 @@ def toggle_view():
 def set_time_period(period):
     st.session_state.time_period = period
 
+# Live rankings: recorded workouts are pushed to this session through the
+# points event bus and the rankings redraw at most once per interval
+@st.fragment(run_every=LEADERBOARD_REFRESH_SECONDS)
+def display_rankings(current_period):
+    """
+    Displays the rankings table, redrawing it only when points changed.
+    
+    Args:
+        current_period: Time period in lowercase, e.g. "week" or "last 7 days"
+    """
+    # Rank against everyone or only against friends
+    ranking_scope = st.radio("Rankings", ["Global", "Friends"], horizontal=True, key="ranking_scope")
+    
+    update = st.session_state.points_subscription.poll()
+    rendered = st.session_state.get("rendered_rankings")
+    if update is None and rendered is not None and rendered[0] == (current_period, ranking_scope):
+        rankings = rendered[1]
+    else:
+        # Get rankings data for current time period
+        if ranking_scope == "Friends":
+            rankings = get_friends_leaderboard(userId, current_period)["rankings"]
+        else:
+            rankings = get_user_rankings(current_period)
+        st.session_state.rendered_rankings = ((current_period, ranking_scope), rankings)
+    
+    if update is not None:
+        st.caption(f"Updated with {update['workouts']} new workout(s)")
+    
+    # Format the data for display
+    users_data = [
+        {"Rank": user["rank"], "User": user["name"], "Points": user["points"]}
+        for user in rankings
+    ]
+    
+    # Create and display the dataframe
+    df = pd.DataFrame(users_data)
+    st.dataframe(
+        df,
+        hide_index=True,
+        column_config={
+            "Rank": st.column_config.NumberColumn(format="%d"),
+            "User": st.column_config.TextColumn(),
+            "Points": st.column_config.NumberColumn(format="%d")
+        },
+        use_container_width=True
+    )
+
 # Main function to display the leaderboard
 def display_leaderboard():
     """
@@ -34,7 +91,7 @@ def display_leaderboard():
     """
     # Get user profile - only get this once
     try:
-        user_profile = get_user_profile(userId)
+        user_profile = get_profile(userId)
         user_name = user_profile['full_name']
         profile_img = user_profile.get('profile_image', '')
     except:
@@ -74,7 +131,7 @@ def display_leaderboard():
                 toggle_view()
         
         # Tabs for time periods
-        time_periods = ["Day", "Week", "Month", "Year"]
+        time_periods = ["Day", "Week", "Month", "Year", "Last 7 Days", "Last 30 Days"]
         
         # Create tabs and find currently selected tab
         tab_index = time_periods.index(st.session_state.time_period)
@@ -94,27 +151,7 @@ def display_leaderboard():
             # User rankings view
             st.markdown("<h4 style='color:white;'>User Rankings</h4>", unsafe_allow_html=True)
             
-            # Get rankings data for current time period
-            rankings = get_user_rankings(current_period)
-            
-            # Format the data for display
-            users_data = [
-                {"Rank": user["rank"], "User": user["name"], "Points": user["points"]}
-                for user in rankings
-            ]
-            
-            # Create and display the dataframe
-            df = pd.DataFrame(users_data)
-            st.dataframe(
-                df,
-                hide_index=True,
-                column_config={
-                    "Rank": st.column_config.NumberColumn(format="%d"),
-                    "User": st.column_config.TextColumn(),
-                    "Points": st.column_config.NumberColumn(format="%d")
-                },
-                use_container_width=True
-            )
+            display_rankings(current_period)
             
         else:
             # Activity metrics view
@@ -143,7 +180,8 @@ def display_leaderboard():
                 use_container_width=True
             )
         
-        # Help icon with tooltip
+        # Help icon with tooltip explaining the active scoring rules
+        points_rules = "".join(f"• {line}<br>" for line in get_rules().describe())
         st.markdown(
             """
             <style>
@@ -177,13 +215,12 @@ def display_leaderboard():
                 opacity: 1;
             }
             </style>
-            
+            """ + f"""
             <div class='tooltip'>
                 <span style='background-color:rgba(255,255,255,0.2); border-radius:50%; width:25px; height:25px; display:inline-block; text-align:center; line-height:25px; color:white;'>?</span>
                 <div class='tooltiptext'>
                     <strong>Points Calculation:</strong><br>
-                    • 1 calorie burned = 1 point<br>
-                    • 1 mile traveled = 5 points<br>
+                    {points_rules}
                 </div>
             </div>
             """,
@@ -193,124 +230,71 @@ def display_leaderboard():
         # Close the purple container
         st.markdown('</div>', unsafe_allow_html=True)
 
+# Badge titles, artwork and congratulation text, keyed by badge ID (see badges.BADGES)
+BADGE_TITLES = dict(BADGES)
+BADGE_DISPLAY = {
+    'calorie_record': {
+        'icon': "https://images.unsplash.com/photo-1744856950784-fe3032e1ceb4?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'image': "https://images.unsplash.com/photo-1513151233558-d860c5398176?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'lines': ["## New Record ", "## Calories Burned :fire: "],
+    },
+    '100_workouts': {
+        'icon': "https://images.unsplash.com/photo-1744856950907-a8d9102f1bfd?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'image': "https://images.unsplash.com/photo-1534258936925-c58bed479fcb?q=80&w=1931&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'lines': ["### 100 WORKOUT CHALLANGE COMPLETED ", "#### Keet it going :thumbsup: "],
+    },
+    '7_day_streak': {
+        'icon': "https://images.unsplash.com/photo-1744856951342-cb989cd667ae?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'image': "https://images.unsplash.com/photo-1562771242-a02d9090c90c?q=80&w=2071&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'lines': ["## 7 DAYS STREAK ", "### Congrats on working out", "### for 7days in a row :clap: "],
+    },
+    '30_day_streak': {
+        'icon': "https://images.unsplash.com/photo-1744856950904-12e217f0690a?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'image': "https://images.unsplash.com/photo-1607962837359-5e7e89f86776?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'lines': ["## 30 DAYS STREAK ", "### Congrats on working out", "### for 30 days in a row :clap: "],
+    },
+    'longest_workout': {
+        'icon': "https://images.unsplash.com/photo-1744856950752-2bc8ea70379d?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'image': "https://images.unsplash.com/photo-1585473233369-14a97aa923df?q=80&w=2047&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+        'lines': ["## LONGEST TIME EVER ", "### You're doing great :thumbsup: ", "### Don't stop :fire: "],
+    },
+}
+
 # Function to display badges
 def display_badges():
-    """Displays the badges section."""
+    """Displays the badges the user has earned."""
     st.markdown("<h4>Badges</h4>", unsafe_allow_html=True)
     
-    # - Badge 1 -
-    modal1 = Modal("Congratulations :tada: :tada: :tada:", key="modal1")
-
-    # Show image
-    st.image("https://images.unsplash.com/photo-1744856950784-fe3032e1ceb4?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=110)
-
-    if st.button(":tada: View :tada:", key="button1"):
-        modal1.open()
-
-    # Modal content
-    if modal1.is_open():
-        with modal1.container():
-            col1, col2 = st.columns(2, gap="small")
-
-            with col1:
-                st.image("https://images.unsplash.com/photo-1513151233558-d860c5398176?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=700)
-
-            with col2:
-                st.write("## New Record ")
-                st.write("## Calories Burned :fire: ")
-                # st.markdown("#### New Record Calories Burned :fire: :thumbsup:")
-                # st.write("Here’s your record :clap:")
-
-    # - Badge 2 -
-    modal2 = Modal("Congratulations :tada: :tada: :tada:", key="modal2")
-
-    # Show image
-    st.image("https://images.unsplash.com/photo-1744856950907-a8d9102f1bfd?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=110)
-
-    if st.button(":tada: View :tada:", key="button2"):
-        modal2.open()
-
-    # Modal content
-    if modal2.is_open():
-        with modal2.container():
-            col1, col2 = st.columns(2, gap="small")
-
-            with col1:
-                st.image("https://images.unsplash.com/photo-1534258936925-c58bed479fcb?q=80&w=1931&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=700)
-
-            with col2:
-                st.write("### 100 WORKOUT CHALLANGE COMPLETED ")
-                st.write("#### Keet it going :thumbsup: ")
-
-
-    # - Badge 3 -
-    modal3 = Modal("Congratulations :tada: :tada: :tada:", key="modal3")
-
-    # Show image
-    st.image("https://images.unsplash.com/photo-1744856951342-cb989cd667ae?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=110)
-
-    if st.button(":tada: View :tada:", key="button3"):
-        modal3.open()
-
-    # Modal content
-    if modal3.is_open():
-        with modal3.container():
-            col1, col2 = st.columns(2, gap="small")
-
-            with col1:
-                st.image("https://images.unsplash.com/photo-1562771242-a02d9090c90c?q=80&w=2071&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=700)
-
-            with col2:
-                st.write("## 7 DAYS STREAK ")
-                st.write("### Congrats on working out")
-                st.write("### for 7days in a row :clap: ")
-
-    # - Badge 4 -
-    modal4 = Modal("Congratulations :tada: :tada: :tada:", key="modal4")
-
-    # Show image
-    st.image("https://images.unsplash.com/photo-1744856950904-12e217f0690a?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=110)
-
-    if st.button(":tada: View :tada:", key="button4"):
-        modal4.open()
-
-    # Modal content
-    if modal4.is_open():
-       with modal4.container():
-            col1, col2 = st.columns(2, gap="small")
-
-            with col1:
-                st.image("https://images.unsplash.com/photo-1607962837359-5e7e89f86776?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=700)
-
-            with col2:
-                st.write("## 30 DAYS STREAK ")
-                st.write("### Congrats on working out")
-                st.write("### for 30 days in a row :clap: ")
-
-    # - Badge 5 -
-    modal5 = Modal("Congratulations :tada: :tada: :tada:", key="modal5")
-
-    # Show image
-    st.image("https://images.unsplash.com/photo-1744856950752-2bc8ea70379d?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=110)
+    # Celebrate badges earned by workouts recorded since the last visit
+    for badge_id in pop_new_badges(userId):
+        st.toast(f"New badge: {BADGE_TITLES[badge_id]} :tada:")
+    
+    earned = get_user_badges(userId)
+    if not earned:
+        st.caption("Keep working out to earn badges!")
+    
+    for badge_id in earned:
+        badge = BADGE_DISPLAY[badge_id]
+        modal = Modal("Congratulations :tada: :tada: :tada:", key=f"modal_{badge_id}")
 
-    if st.button(":tada: View :tada:", key="button5"):
-        modal5.open()
+        # Show image
+        st.image(badge['icon'], width=110, caption=BADGE_TITLES[badge_id])
 
-    # Modal content
-    if modal5.is_open():
-        with modal5.container():
-            col1, col2 = st.columns(2, gap="small")
+        if st.button(":tada: View :tada:", key=f"button_{badge_id}"):
+            modal.open()
 
-            with col1:
-                st.image("https://images.unsplash.com/photo-1585473233369-14a97aa923df?q=80&w=2047&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", width=700)
+        # Modal content
+        if modal.is_open():
+            with modal.container():
+                col1, col2 = st.columns(2, gap="small")
 
-            with col2:
-                st.write("## LONGEST TIME EVER ")
-                st.write("### You're doing great :thumbsup: ")
-                st.write("### Don't stop :fire: ")
+                with col1:
+                    st.image(badge['image'], width=700)
 
+                with col2:
+                    for line in badge['lines']:
+                        st.write(line)
 
-    
 # Main community page
 st.title('Community')
 
@@ -341,6 +325,9 @@ with leaderboard_tab:
         col1.metric("Friends Rank", f"#{stats['friend_rank']}")
         col2.metric("Badges Earned", str(stats["badges"]))
         
+        col1, col2 = st.columns(2)
+        col1.metric("Standing", f"Top {stats['top_percent']}%")
+        
         # Motivational image
         st.image("https://upload.wikimedia.org/wikipedia/commons/thumb/a/ad/Jumping-1461189_960_720.jpg/640px-Jumping-1461189_960_720.jpg", 
                 caption="Stay motivated!")
@@ -354,14 +341,14 @@ with feed_tab:
 
     with col1:
         try:
-            advice_data = get_genai_advice(userId)
+            advice_data = get_advice(userId)
             display_genai_advice(advice_data['timestamp'], advice_data['content'], advice_data['image'])
         except:
             st.info("GenAI advice not available.")
 
     with col2:
         try:
-            user_profile = get_user_profile(userId)
+            user_profile = get_profile(userId)
             friends_ids = user_profile.get('friends', [])
 
             all_posts = []
@@ -369,13 +356,13 @@ with feed_tab:
 
             for friend_id in friends_ids:
                 try:
-                    friend_profile = get_user_profile(friend_id)
+                    friend_profile = get_profile(friend_id)
                     friend_profiles[friend_id] = {
                         'full_name': friend_profile['full_name'],
                         'profile_image': friend_profile['profile_image']
                     }
                     
-                    friend_posts = get_user_posts(friend_id)
+                    friend_posts = get_posts(friend_id)
                     
                     for post in friend_posts:
                         post['full_name'] = friend_profiles[friend_id]['full_name']
@@ -398,6 +385,13 @@ with feed_tab:
                     )
             else:
                 st.info("No posts available from your friends.")
+
+            # Friends of friends, ranked by how many mutual friends they share
+            suggestions = get_friend_graph().suggestions(userId, k=3)
+            if suggestions:
+                st.markdown("#### People you may know")
+                for suggested_id, mutual_friends in suggestions:
+                    st.write(f"{get_user_display(suggested_id)[0]} · {mutual_friends} mutual friend{'s' if mutual_friends != 1 else ''}")
         except Exception as e:
             st.error(f"Error loading social feed: {str(e)}")
             st.info("No friend posts available.")
\ No newline at end of file
@@ -8,11 +8,14 @@
 # testing earlier units.
 #############################################################################
 
+import json
 import random
 from google.cloud import bigquery
 import vertexai
 from vertexai.generative_models import GenerativeModel
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from friend_graph import FriendGraph
+from exercise_recommender import ItemRecommendations
 
 PROJECT_ID = "dreamteamproject-449421"
 
@@ -170,6 +173,689 @@ def get_user_workouts(user_id):
         print(f"Error fetching workouts from BigQuery: {e}")
         return []
 
+# Per-user points rollups. Day rows are the base granularity and the week
+# (starting Monday), month and year rows are derived from them. Every row
+# records the version of the scoring rules (scoring_rules.py) it was scored with.
+ROLLUP_TABLE = "dreamteamproject-449421.DreamDataset.PointsRollup"
+ROLLUP_GRANULARITIES = {
+    'day': 'DAY',
+    'week': 'WEEK(MONDAY)',
+    'month': 'MONTH',
+    'year': 'YEAR',
+}
+
+def rebuild_points_rollup(points_expression, rules_version):
+    """
+    Rebuilds the PointsRollup table from every workout (used for backfill and
+    when the scoring rules change).
+
+    The Workouts table gets its Points column if it doesn't have one yet and
+    every workout's stored Points are rescored first, then workouts are
+    grouped into one row per user and day, and the week, month and year rows
+    are summed from those day rows.
+
+    Args:
+        points_expression: SQL expression for one workout's points, from
+            scoring_rules.ScoringRules.to_sql
+        rules_version: Version of the scoring rules the expression came from
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+
+    totals = """
+                SUM(Points) AS Points,
+                SUM(Calories) AS Calories,
+                SUM(Distance) AS Distance,
+                SUM(Steps) AS Steps,
+                SUM(DurationSeconds) AS DurationSeconds,
+                SUM(WorkoutCount) AS WorkoutCount"""
+
+    derived = "\n            UNION ALL\n".join(f"""
+            SELECT
+                UserId,
+                '{granularity}' AS Granularity,
+                DATE_TRUNC(Day, {date_part}) AS PeriodStart,{totals},
+                {rules_version} AS RulesVersion
+            FROM daily
+            GROUP BY UserId, PeriodStart""" for granularity, date_part in ROLLUP_GRANULARITIES.items())
+
+    query = f"""
+        ALTER TABLE `dreamteamproject-449421.DreamDataset.Workouts`
+        ADD COLUMN IF NOT EXISTS Points INT64;
+
+        UPDATE `dreamteamproject-449421.DreamDataset.Workouts`
+        SET Points = {points_expression}
+        WHERE TRUE;
+
+        CREATE OR REPLACE TABLE `{ROLLUP_TABLE}`
+        CLUSTER BY Granularity, PeriodStart, UserId
+        AS
+        WITH daily AS (
+            SELECT
+                UserId,
+                DATE(CAST(StartTimestamp AS DATETIME)) AS Day,
+                SUM(IFNULL(Points, 0)) AS Points,
+                SUM(IFNULL(CaloriesBurned, 0)) AS Calories,
+                SUM(IFNULL(TotalDistance, 0)) AS Distance,
+                SUM(IFNULL(TotalSteps, 0)) AS Steps,
+                SUM(IFNULL(DATETIME_DIFF(CAST(EndTimestamp AS DATETIME), CAST(StartTimestamp AS DATETIME), SECOND), 0)) AS DurationSeconds,
+                COUNT(*) AS WorkoutCount
+            FROM `dreamteamproject-449421.DreamDataset.Workouts`
+            GROUP BY UserId, Day
+        )
+        {derived}
+    """
+
+    client.query(query).result()  # Wait for the table to be rebuilt
+
+def create_user_workout(user_id, workout, points, rules_version):
+    """
+    Stores a new workout and adds it to the user's points rollups.
+
+    The workout is stored with its points, and the insert and the rollup
+    update run in one transaction, so the day, week, month and year rows are
+    updated incrementally instead of being recomputed from the user's whole
+    history, and a failed rollup update doesn't leave the workout stored
+    without it.
+
+    An existing rollup row keeps its RulesVersion: it still holds points
+    scored with that version, so points_rollup.py --check keeps reporting it
+    until the rollups are rebuilt with the new rules.
+
+    Args:
+        user_id: ID of the user who did the workout
+        workout: Workout dictionary in the format returned by get_user_workouts
+        points: Points earned by the workout
+        rules_version: Version of the scoring rules the points came from
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+
+    start = datetime.strptime(workout['start_timestamp'], '%Y-%m-%d %H:%M:%S')
+    end = datetime.strptime(workout['end_timestamp'], '%Y-%m-%d %H:%M:%S')
+
+    periods = ",\n                    ".join(
+        f"STRUCT('{granularity}' AS Granularity, DATE_TRUNC(DATE(@start_timestamp), {date_part}) AS PeriodStart)"
+        for granularity, date_part in ROLLUP_GRANULARITIES.items()
+    )
+
+    query = f"""
+        BEGIN TRANSACTION;
+
+        INSERT INTO `dreamteamproject-449421.DreamDataset.Workouts` (
+            WorkoutId, UserId, StartTimestamp, EndTimestamp,
+            StartLocationLat, StartLocationLong, EndLocationLat, EndLocationLong,
+            TotalDistance, TotalSteps, CaloriesBurned, Points
+        )
+        VALUES (
+            @workout_id, @user_id, @start_timestamp, @end_timestamp,
+            @start_lat, @start_lng, @end_lat, @end_lng,
+            @distance, @steps, @calories, @points
+        );
+
+        MERGE `{ROLLUP_TABLE}` AS rollup
+        USING (
+            SELECT @user_id AS UserId, period.Granularity, period.PeriodStart
+            FROM UNNEST([
+                    {periods}
+            ]) AS period
+        ) AS workout
+        ON rollup.UserId = workout.UserId
+            AND rollup.Granularity = workout.Granularity
+            AND rollup.PeriodStart = workout.PeriodStart
+        WHEN MATCHED THEN UPDATE SET
+            Points = rollup.Points + @points,
+            Calories = rollup.Calories + @calories,
+            Distance = rollup.Distance + @distance,
+            Steps = rollup.Steps + @steps,
+            DurationSeconds = rollup.DurationSeconds + @duration_seconds,
+            WorkoutCount = rollup.WorkoutCount + 1
+        WHEN NOT MATCHED THEN INSERT
+            (UserId, Granularity, PeriodStart, Points, Calories, Distance, Steps, DurationSeconds, WorkoutCount, RulesVersion)
+        VALUES
+            (workout.UserId, workout.Granularity, workout.PeriodStart, @points, @calories, @distance, @steps, @duration_seconds, 1, @rules_version);
+
+        COMMIT TRANSACTION;
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("workout_id", "STRING", workout['workout_id']),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("start_timestamp", "DATETIME", start),
+            bigquery.ScalarQueryParameter("end_timestamp", "DATETIME", end),
+            bigquery.ScalarQueryParameter("start_lat", "FLOAT64", workout['start_lat_lng'][0]),
+            bigquery.ScalarQueryParameter("start_lng", "FLOAT64", workout['start_lat_lng'][1]),
+            bigquery.ScalarQueryParameter("end_lat", "FLOAT64", workout['end_lat_lng'][0]),
+            bigquery.ScalarQueryParameter("end_lng", "FLOAT64", workout['end_lat_lng'][1]),
+            bigquery.ScalarQueryParameter("distance", "FLOAT64", workout['distance']),
+            bigquery.ScalarQueryParameter("steps", "INT64", workout['steps']),
+            bigquery.ScalarQueryParameter("calories", "INT64", workout['calories_burned']),
+            bigquery.ScalarQueryParameter("duration_seconds", "INT64", int((end - start).total_seconds())),
+            bigquery.ScalarQueryParameter("points", "INT64", points),
+            bigquery.ScalarQueryParameter("rules_version", "INT64", rules_version),
+        ]
+    )
+
+    client.query(query, job_config=job_config).result()  # Wait for the query to complete
+
+def get_points_leaderboard(granularity, period_start, limit=5, user_id=None):
+    """Ranks every user by the points they earned in a period.
+
+    Points are read from the PointsRollup table, so each user costs one rollup
+    row per period instead of one row per workout, and the whole leaderboard
+    is a single query no matter how many users there are.
+
+    Args:
+        granularity: "day", "week", "month", or "year".
+        period_start: date the period starts on. Every rollup row of the
+            granularity from this date on is summed, so ("year", 1970-01-01)
+            gives all-time points.
+        limit: Number of top ranked users to return (None returns every
+            user with points, e.g. to build a ranking index).
+        user_id: Optional user whose row is also returned when they are
+            outside the top `limit` (used for "Your Stats").
+
+    Returns:
+        A list of dictionaries sorted by rank with keys:
+        - rank: Position on the leaderboard (1 is the top earner)
+        - user_id: The ID of the user
+        - name: The user's name (falls back to the user_id)
+        - points: Total points in the period (integer)
+        - profile_image: The user's profile image URL (or '')
+        - ranked_users: Number of users who earned points in the period
+    """
+    query = f"""
+        WITH points AS (
+            SELECT UserId, SUM(Points) AS Points
+            FROM `{ROLLUP_TABLE}`
+            WHERE Granularity = @granularity AND PeriodStart >= @period_start
+            GROUP BY UserId
+        ),
+        ranked AS (
+            SELECT
+                points.UserId,
+                points.Points,
+                users.Name,
+                users.ImageUrl,
+                ROW_NUMBER() OVER (ORDER BY points.Points DESC, points.UserId) AS Rank,
+                COUNT(*) OVER () AS RankedUsers
+            FROM points
+            LEFT JOIN `dreamteamproject-449421.DreamDataset.Users` AS users
+            ON users.UserId = points.UserId
+        )
+        SELECT UserId, Points, Name, ImageUrl, Rank, RankedUsers
+        FROM ranked
+        WHERE @limit IS NULL OR Rank <= @limit OR UserId = @user_id
+        ORDER BY Rank
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("granularity", "STRING", granularity),
+            bigquery.ScalarQueryParameter("period_start", "DATE", period_start),
+            bigquery.ScalarQueryParameter("limit", "INT64", limit),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+        ]
+    )
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        results = client.query(query, job_config=job_config).result()
+
+        return [{
+            'rank': int(row.Rank),
+            'user_id': row.UserId,
+            'name': row.Name or row.UserId,
+            'points': int(row.Points or 0),
+            'profile_image': row.ImageUrl or '',
+            'ranked_users': int(row.RankedUsers),
+        } for row in results]
+
+    except Exception as e:
+        print(f"Error fetching leaderboard from BigQuery: {e}")
+        return []
+
+def get_user_rollup_totals(user_id, granularity, period_start):
+    """
+    Returns a user's workout totals for a period from the PointsRollup table.
+
+    Args:
+        user_id: The ID of the user.
+        granularity: "day", "week", "month", or "year".
+        period_start: date the period starts on (see get_points_leaderboard).
+
+    Returns:
+        A dictionary with keys points, calories_burned, distance (km), steps,
+        duration_seconds and workouts. Every value is 0 when the user has no
+        workouts in the period.
+    """
+    totals = {
+        'points': 0,
+        'calories_burned': 0,
+        'distance': 0.0,
+        'steps': 0,
+        'duration_seconds': 0,
+        'workouts': 0,
+    }
+
+    query = f"""
+        SELECT
+            SUM(Points) AS Points,
+            SUM(Calories) AS Calories,
+            SUM(Distance) AS Distance,
+            SUM(Steps) AS Steps,
+            SUM(DurationSeconds) AS DurationSeconds,
+            SUM(WorkoutCount) AS WorkoutCount
+        FROM `{ROLLUP_TABLE}`
+        WHERE UserId = @user_id AND Granularity = @granularity AND PeriodStart >= @period_start
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("granularity", "STRING", granularity),
+            bigquery.ScalarQueryParameter("period_start", "DATE", period_start),
+        ]
+    )
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        for row in client.query(query, job_config=job_config).result():
+            totals['points'] = int(row.Points or 0)
+            totals['calories_burned'] = int(row.Calories or 0)
+            totals['distance'] = float(row.Distance or 0.0)
+            totals['steps'] = int(row.Steps or 0)
+            totals['duration_seconds'] = int(row.DurationSeconds or 0)
+            totals['workouts'] = int(row.WorkoutCount or 0)
+    except Exception as e:
+        print(f"Error fetching rollup totals from BigQuery: {e}")
+
+    return totals
+
+def get_daily_points(since_day):
+    """
+    Returns every user's daily points since a day, from the PointsRollup table.
+
+    Used to load the in-memory rolling-window index in one query.
+
+    Args:
+        since_day: date of the first day to return.
+
+    Returns:
+        A list of dictionaries with keys user_id, day (date), points, name and
+        profile_image.
+    """
+    query = f"""
+        SELECT rollup.UserId, rollup.PeriodStart, rollup.Points, users.Name, users.ImageUrl
+        FROM `{ROLLUP_TABLE}` AS rollup
+        LEFT JOIN `dreamteamproject-449421.DreamDataset.Users` AS users
+        ON users.UserId = rollup.UserId
+        WHERE rollup.Granularity = 'day' AND rollup.PeriodStart >= @since_day
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("since_day", "DATE", since_day),
+        ]
+    )
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        results = client.query(query, job_config=job_config).result()
+
+        return [{
+            'user_id': row.UserId,
+            'day': row.PeriodStart,
+            'points': int(row.Points or 0),
+            'name': row.Name,
+            'profile_image': row.ImageUrl,
+        } for row in results]
+
+    except Exception as e:
+        print(f"Error fetching daily points from BigQuery: {e}")
+        return []
+
+# Versions are DATETIME in the app's local time, like the naive datetimes the
+# leaderboard compares them with
+SNAPSHOT_TABLE = "dreamteamproject-449421.DreamDataset.LeaderboardSnapshots"
+
+def get_workouts_for_scoring(since):
+    """
+    Returns the scoring inputs of every user's workouts since a date, column by
+    column so they can be scored with vectorized arithmetic.
+
+    Args:
+        since: datetime; only workouts starting at or after it are returned.
+
+    Returns:
+        A dictionary of equally long lists with keys user_id, start_timestamp
+        (datetime), calories_burned, distance (km), steps and duration_seconds.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+
+    query = """
+        SELECT
+            UserId,
+            CAST(StartTimestamp AS DATETIME) AS StartTimestamp,
+            IFNULL(CaloriesBurned, 0) AS CaloriesBurned,
+            IFNULL(TotalDistance, 0) AS TotalDistance,
+            IFNULL(TotalSteps, 0) AS TotalSteps,
+            IFNULL(DATETIME_DIFF(CAST(EndTimestamp AS DATETIME), CAST(StartTimestamp AS DATETIME), SECOND), 0) AS DurationSeconds
+        FROM `dreamteamproject-449421.DreamDataset.Workouts`
+        WHERE CAST(StartTimestamp AS DATETIME) >= @since
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("since", "DATETIME", since),
+        ]
+    )
+
+    columns = {'user_id': [], 'start_timestamp': [], 'calories_burned': [], 'distance': [], 'steps': [], 'duration_seconds': []}
+    for row in client.query(query, job_config=job_config).result():
+        columns['user_id'].append(row.UserId)
+        columns['start_timestamp'].append(row.StartTimestamp)
+        columns['calories_burned'].append(row.CaloriesBurned)
+        columns['distance'].append(row.TotalDistance)
+        columns['steps'].append(row.TotalSteps)
+        columns['duration_seconds'].append(row.DurationSeconds)
+    return columns
+
+def get_rollup_rules_versions():
+    """
+    Returns the scoring rules versions found in the PointsRollup table, with
+    the number of rollup rows scored by each.
+
+    Returns:
+        A dictionary of rules version -> row count (empty on errors).
+    """
+    query = f"""
+        SELECT RulesVersion, COUNT(*) AS RowCount
+        FROM `{ROLLUP_TABLE}`
+        GROUP BY RulesVersion
+    """
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        return {row.RulesVersion: int(row.RowCount) for row in client.query(query).result()}
+    except Exception as e:
+        print(f"Error fetching rollup rules versions from BigQuery: {e}")
+        return {}
+
+def cluster_workouts_by_user():
+    """
+    Clusters the Workouts table by (UserId, StartTimestamp), so reading one
+    user's workouts in a time range only scans that user's blocks.
+    BigQuery reclusters existing rows in the background.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    table = client.get_table("dreamteamproject-449421.DreamDataset.Workouts")
+    if table.clustering_fields != ["UserId", "StartTimestamp"]:
+        table.clustering_fields = ["UserId", "StartTimestamp"]
+        client.update_table(table, ["clustering_fields"])
+
+def get_user_workout_points(user_id, since, limit=None, page_size=500):
+    """
+    Yields a user's workouts since a date with the points stored when they
+    were recorded, newest first.
+
+    Rows are read page by page, so long histories are never held in memory
+    at once. Workouts are numbered in time order within the range (1 is the
+    oldest) by the query itself.
+
+    Args:
+        user_id: ID of the user.
+        since: datetime; only workouts starting at or after it are returned.
+        limit: Optional maximum number of (most recent) workouts.
+        page_size: Number of rows fetched per page.
+
+    Yields:
+        Dictionaries with keys workout_id, number, start_timestamp
+        (datetime), calories_burned, distance (km) and points.
+
+    Raises:
+        google.api_core.exceptions.GoogleAPIError: The query failed.
+    """
+    query = """
+        SELECT
+            WorkoutId,
+            CAST(StartTimestamp AS DATETIME) AS StartTimestamp,
+            IFNULL(CaloriesBurned, 0) AS CaloriesBurned,
+            IFNULL(TotalDistance, 0) AS TotalDistance,
+            IFNULL(Points, 0) AS Points,
+            ROW_NUMBER() OVER (ORDER BY StartTimestamp, WorkoutId) AS Number
+        FROM `dreamteamproject-449421.DreamDataset.Workouts`
+        WHERE UserId = @user_id
+            AND CAST(StartTimestamp AS DATETIME) >= @since
+        ORDER BY StartTimestamp DESC, WorkoutId DESC
+        LIMIT @limit
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("since", "DATETIME", since),
+            # BigQuery has no unlimited LIMIT, so no limit means the largest INT64
+            bigquery.ScalarQueryParameter("limit", "INT64", limit if limit is not None else 2**63 - 1),
+        ]
+    )
+
+    # Errors are raised rather than shown as an empty history, e.g. when the
+    # Points column is missing because the rollups were never rebuilt
+    client = bigquery.Client(project=PROJECT_ID)
+    rows = client.query(query, job_config=job_config).result(page_size=page_size)
+    for row in rows:
+        yield {
+            'workout_id': row.WorkoutId,
+            'number': int(row.Number),
+            'start_timestamp': row.StartTimestamp,
+            'calories_burned': row.CaloriesBurned,
+            'distance': row.TotalDistance,
+            'points': int(row.Points),
+        }
+
+def create_leaderboard_snapshots_table():
+    """
+    Creates the LeaderboardSnapshots table if it doesn't exist yet.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    query = f"""
+        CREATE TABLE IF NOT EXISTS `{SNAPSHOT_TABLE}` (
+            Version DATETIME NOT NULL,
+            Period STRING NOT NULL,
+            PeriodStart DATE NOT NULL,
+            Rank INT64 NOT NULL,
+            UserId STRING NOT NULL,
+            Points INT64 NOT NULL
+        )
+        CLUSTER BY Period, PeriodStart
+    """
+    client.query(query).result()
+
+def save_leaderboard_snapshot(rows):
+    """
+    Appends a versioned leaderboard snapshot to the LeaderboardSnapshots table.
+
+    Args:
+        rows: Dictionaries with keys Version (ISO local datetime string), Period,
+            PeriodStart (ISO date string), Rank, UserId and Points.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    errors = client.insert_rows_json(SNAPSHOT_TABLE, rows)
+    if errors:
+        raise RuntimeError(f"Error saving leaderboard snapshot: {errors}")
+
+def get_latest_leaderboard_snapshot(period, period_start):
+    """
+    Returns the newest leaderboard snapshot written for a period.
+
+    Args:
+        period: "day", "week", "month", or "year".
+        period_start: date the period starts on.
+
+    Returns:
+        None when there is no snapshot for the period, otherwise a dictionary
+        with keys version (naive local datetime) and rankings (a list of dictionaries with
+        rank, user_id, name, points and profile_image, sorted by rank).
+    """
+    query = f"""
+        SELECT snapshot.Version, snapshot.Rank, snapshot.UserId, snapshot.Points, users.Name, users.ImageUrl
+        FROM `{SNAPSHOT_TABLE}` AS snapshot
+        LEFT JOIN `dreamteamproject-449421.DreamDataset.Users` AS users
+        ON users.UserId = snapshot.UserId
+        WHERE snapshot.Period = @period
+            AND snapshot.PeriodStart = @period_start
+            AND snapshot.Version = (
+                SELECT MAX(Version) FROM `{SNAPSHOT_TABLE}`
+                WHERE Period = @period AND PeriodStart = @period_start
+            )
+        ORDER BY snapshot.Rank
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("period", "STRING", period),
+            bigquery.ScalarQueryParameter("period_start", "DATE", period_start),
+        ]
+    )
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        rows = list(client.query(query, job_config=job_config).result())
+    except Exception as e:
+        print(f"Error fetching leaderboard snapshot from BigQuery: {e}")
+        return None
+
+    if not rows:
+        return None
+
+    version = rows[0].Version
+    if isinstance(version, str):
+        version = datetime.fromisoformat(version)
+    if version.tzinfo is not None:
+        # Compare as local time like the rest of the leaderboard
+        version = version.astimezone().replace(tzinfo=None)
+    return {
+        'version': version,
+        'rankings': [{
+            'rank': int(row.Rank),
+            'user_id': row.UserId,
+            'name': row.Name or row.UserId,
+            'points': int(row.Points),
+            'profile_image': row.ImageUrl or '',
+        } for row in rows],
+    }
+
+# Per-user running badge state (see badges.py)
+BADGE_STATE_TABLE = "dreamteamproject-449421.DreamDataset.BadgeStates"
+
+def get_badge_state(user_id):
+    """
+    Returns a user's stored badge state.
+
+    Returns:
+        None when the user has no state yet (or on errors), otherwise a
+        dictionary with keys last_workout_day (date or None), current_streak,
+        longest_streak, workout_count, max_calories, max_duration_seconds and
+        badges (list of badge IDs).
+    """
+    query = f"""
+        SELECT LastWorkoutDay, CurrentStreak, LongestStreak, WorkoutCount, MaxCalories, MaxDurationSeconds, Badges
+        FROM `{BADGE_STATE_TABLE}`
+        WHERE UserId = @user_id
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+        ]
+    )
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        rows = list(client.query(query, job_config=job_config).result())
+    except Exception as e:
+        print(f"Error fetching badge state from BigQuery: {e}")
+        return None
+
+    if not rows:
+        return None
+
+    row = rows[0]
+    return {
+        'last_workout_day': row.LastWorkoutDay,
+        'current_streak': int(row.CurrentStreak),
+        'longest_streak': int(row.LongestStreak),
+        'workout_count': int(row.WorkoutCount),
+        'max_calories': row.MaxCalories,
+        'max_duration_seconds': int(row.MaxDurationSeconds),
+        'badges': list(row.Badges or []),
+    }
+
+def save_badge_state(row):
+    """
+    Inserts or replaces one user's badge state.
+
+    Args:
+        row: Dictionary from badges.BadgeState.to_row.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+
+    query = f"""
+        MERGE `{BADGE_STATE_TABLE}` AS state
+        USING (SELECT @user_id AS UserId) AS updated
+        ON state.UserId = updated.UserId
+        WHEN MATCHED THEN UPDATE SET
+            LastWorkoutDay = @last_workout_day,
+            CurrentStreak = @current_streak,
+            LongestStreak = @longest_streak,
+            WorkoutCount = @workout_count,
+            MaxCalories = @max_calories,
+            MaxDurationSeconds = @max_duration_seconds,
+            Badges = @badges
+        WHEN NOT MATCHED THEN INSERT
+            (UserId, LastWorkoutDay, CurrentStreak, LongestStreak, WorkoutCount, MaxCalories, MaxDurationSeconds, Badges)
+        VALUES
+            (@user_id, @last_workout_day, @current_streak, @longest_streak, @workout_count, @max_calories, @max_duration_seconds, @badges)
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("user_id", "STRING", row['UserId']),
+            bigquery.ScalarQueryParameter("last_workout_day", "DATE", row['LastWorkoutDay']),
+            bigquery.ScalarQueryParameter("current_streak", "INT64", row['CurrentStreak']),
+            bigquery.ScalarQueryParameter("longest_streak", "INT64", row['LongestStreak']),
+            bigquery.ScalarQueryParameter("workout_count", "INT64", row['WorkoutCount']),
+            bigquery.ScalarQueryParameter("max_calories", "FLOAT64", row['MaxCalories']),
+            bigquery.ScalarQueryParameter("max_duration_seconds", "INT64", row['MaxDurationSeconds']),
+            bigquery.ArrayQueryParameter("badges", "STRING", row['Badges']),
+        ]
+    )
+
+    client.query(query, job_config=job_config).result()  # Wait for the query to complete
+
+def replace_badge_states(rows):
+    """
+    Replaces the whole BadgeStates table (used when rebuilding it).
+
+    Args:
+        rows: Dictionaries from badges.BadgeState.to_row.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        schema=[
+            bigquery.SchemaField("UserId", "STRING"),
+            bigquery.SchemaField("LastWorkoutDay", "DATE"),
+            bigquery.SchemaField("CurrentStreak", "INT64"),
+            bigquery.SchemaField("LongestStreak", "INT64"),
+            bigquery.SchemaField("WorkoutCount", "INT64"),
+            bigquery.SchemaField("MaxCalories", "FLOAT64"),
+            bigquery.SchemaField("MaxDurationSeconds", "INT64"),
+            bigquery.SchemaField("Badges", "STRING", mode="REPEATED"),
+        ],
+    )
+    client.load_table_from_json(rows, BADGE_STATE_TABLE, job_config=job_config).result()
+
 def get_user_posts(user_id):
     """Returns a list of posts for a specific user."""
     
@@ -211,14 +897,11 @@ def get_user_profile(user_id):
     # Initialize the BigQuery client
     client = bigquery.Client(project=PROJECT_ID)
 
-    # Define id variable for user with the user_id param
-    user_id = user_id
-
-    # SQL query for friends list(friends ids), full_name, username, date_of_birth, profile_image
+    # SQL query for full_name, username, date_of_birth, profile_image
     query = f"""
-        SELECT friends.UserId1, friends.UserId2, users.Username, users.Name, users.ImageUrl, users.DateOfBirth
-        FROM `dreamteamproject-449421.DreamDataset.Friends` AS friends, `dreamteamproject-449421.DreamDataset.Users` AS users
-        WHERE NOT (friends.UserId1 = @user_id OR friends.UserId2 = @user_id) AND users.UserId = @user_id
+        SELECT users.Username, users.Name, users.ImageUrl, users.DateOfBirth
+        FROM `dreamteamproject-449421.DreamDataset.Users` AS users
+        WHERE users.UserId = @user_id
     """
 
     # Define query parameters
@@ -237,17 +920,93 @@ def get_user_profile(user_id):
     # user profile dict to return
     user_profile={}
 
-    # Print the result
     for row in results:
         user_profile['full_name'] = row.Name
         user_profile['username'] = row.Username
         user_profile['date_of_birth'] = row.DateOfBirth
         user_profile['profile_image'] = row.ImageUrl
-        user_profile['friends'] = [row.UserId1, row.UserId2]
+        # Friends come from the in-memory friend graph, not a Friends scan
+        user_profile['friends'] = get_friend_graph().friends(user_id)
 
     return user_profile
 
 
+def get_friendships():
+    """
+    Returns every friendship in the Friends table with one bulk query.
+
+    Returns:
+        A list of (user_id, friend_id) tuples, one per Friends row.
+    """
+    query = """
+        SELECT UserId1, UserId2
+        FROM `dreamteamproject-449421.DreamDataset.Friends`
+    """
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        results = client.query(query).result()
+        return [(row.UserId1, row.UserId2) for row in results]
+
+    except Exception as e:
+        print(f"Error fetching friendships from BigQuery: {e}")
+        return []
+
+
+# Friend graph index (see friend_graph.py), loaded in bulk once per process
+# and reloaded periodically; friendships created here are applied in place.
+FRIEND_GRAPH_TTL = timedelta(minutes=10)
+_friend_graph = None
+_friend_graph_loaded_at = None
+
+def get_friend_graph(now=None):
+    """
+    Returns the in-memory friend graph, loading it with one bulk query when
+    it is missing or older than FRIEND_GRAPH_TTL.
+
+    Args:
+        now: Optional datetime to use instead of the current time.
+
+    Returns:
+        A friend_graph.FriendGraph.
+    """
+    global _friend_graph, _friend_graph_loaded_at
+
+    if now is None:
+        now = datetime.now()
+
+    if _friend_graph is None or now - _friend_graph_loaded_at > FRIEND_GRAPH_TTL:
+        _friend_graph = FriendGraph.from_pairs(get_friendships())
+        _friend_graph_loaded_at = now
+
+    return _friend_graph
+
+def create_friendship(user_id, friend_id):
+    """
+    Stores a new friendship and adds it to the in-memory friend graph.
+
+    Args:
+        user_id: ID of one user.
+        friend_id: ID of the other user.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+
+    query = """
+        INSERT INTO `dreamteamproject-449421.DreamDataset.Friends` (UserId1, UserId2)
+        VALUES (@user_id, @friend_id)
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("friend_id", "STRING", friend_id),
+        ]
+    )
+
+    client.query(query, job_config=job_config).result()  # Wait for the insert to complete
+    get_friend_graph().add_friendship(user_id, friend_id)
+
+
 def get_genai_advice(user_id):
     """Returns the most recent advice and a motivational workout image based on the user's profile."""
 
@@ -346,66 +1105,90 @@ def create_user_post(user_id, content, image=None):
     
     return new_post
 
-# Table name
+# Favorites are an append-only log of add and remove events. Compaction
+# (see favorites_compaction.py) folds events into FavoritesSnapshot, and the
+# FavoritesCurrent view is the snapshot plus the events since the last
+# compaction, latest event per exercise winning.
 TABLE_NAME = "dreamteamproject-449421.DreamDataset.Favorites"
+FAVORITE_EVENTS_TABLE = "dreamteamproject-449421.DreamDataset.FavoriteEvents"
+FAVORITES_SNAPSHOT_TABLE = "dreamteamproject-449421.DreamDataset.FavoritesSnapshot"
+FAVORITE_COMPACTIONS_TABLE = "dreamteamproject-449421.DreamDataset.FavoriteCompactions"
+FAVORITES_VIEW = "dreamteamproject-449421.DreamDataset.FavoritesCurrent"
 
-def add_favorite(user_id, exercise):
-    """Add a favorite exercise to the BigQuery table."""
-    client = bigquery.Client(project=PROJECT_ID)
-    row = {
+def favorite_event(user_id, exercise_name, action, exercise=None, event_time=None):
+    """
+    Builds a FavoriteEvents row.
+
+    Args:
+        user_id: The user's ID
+        exercise_name: Name of the exercise
+        action: "add" or "remove"
+        exercise: The exercise dictionary (for "add" events)
+        event_time: Optional datetime of the change (defaults to now; a
+            naive datetime is taken as local time)
+
+    Returns:
+        Dictionary ready for append_favorite_events
+    """
+    # EventTime is a TIMESTAMP compared with CURRENT_TIMESTAMP() when
+    # compacting, so store an explicit UTC time rather than local time
+    event_time = (event_time or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return {
         "UserId": user_id,
-        "Exercise": exercise
+        "ExerciseName": exercise_name,
+        "Action": action,
+        "Exercise": json.dumps(exercise) if exercise is not None else None,
+        "EventTime": event_time.isoformat(sep=' '),
     }
 
-    # Insert the row into BigQuery
+def append_favorite_events(events):
+    """
+    Appends a batch of favorite events in one streaming insert.
+
+    Args:
+        events: Rows from favorite_event.
+    """
+    if not events:
+        return
+    client = bigquery.Client(project=PROJECT_ID)
+    errors = client.insert_rows_json(FAVORITE_EVENTS_TABLE, events)
+    if errors:
+        raise RuntimeError(f"Error saving favorite events: {errors}")
+
+def add_favorite(user_id, exercise):
+    """Record that a user added a favorite exercise."""
     try:
-        client.insert_rows_json(TABLE_NAME, [row])  # Send the exercise as a JSON record
+        append_favorite_events([favorite_event(user_id, exercise['name'], 'add', exercise)])
         print(f"Exercise {exercise['name']} added to favorites.")
     except Exception as e:
         print(f"Error adding favorite: {e}")
 
 def remove_favorite(user_id, exercise_name):
-    """Mark a favorite exercise as deleted in the BigQuery table."""
-    client = bigquery.Client(project=PROJECT_ID)
-
-    # Construct the UPDATE query to set IsDeleted to True for the given user and exercise
-    query = f"""
-    DELETE FROM `{TABLE_NAME}`
-    WHERE UserId = @user_id AND Exercise.name = @exercise_name
-    """
-    
-    # Set up query parameters
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-            bigquery.ScalarQueryParameter("exercise_name", "STRING", exercise_name),
-        ]
-    )
-    
-    # Run the query to update the favorite
+    """Record that a user removed a favorite exercise."""
     try:
-        client.query(query, job_config=job_config).result()  # Wait for query to finish
-        print(f"Exercise {exercise_name} marked as deleted from favorites.")
+        append_favorite_events([favorite_event(user_id, exercise_name, 'remove')])
+        print(f"Exercise {exercise_name} removed from favorites.")
     except Exception as e:
         print(f"Error removing favorite: {e}")
 
 def get_user_favorites(user_id):
-    """Get all non-deleted favorite exercises for a user from BigQuery."""
+    """Get a user's current favorite exercises, oldest first."""
     client = bigquery.Client(project=PROJECT_ID)
-    
+
     query = f"""
     SELECT Exercise
-    FROM `{TABLE_NAME}`
+    FROM `{FAVORITES_VIEW}`
     WHERE UserId = @user_id
+    ORDER BY AddedAt
     """
-    
+
     # Set up query parameters
     job_config = bigquery.QueryJobConfig(
         query_parameters=[
             bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
         ]
     )
-    
+
     # Execute the query and fetch the results
     try:
         result = client.query(query, job_config=job_config).result()  # Wait for query to finish
@@ -415,3 +1198,215 @@ def get_user_favorites(user_id):
         print(f"Error fetching favorites: {e}")
         return []
 
+def _favorites_state_sql(events_condition):
+    # Current favorites from the snapshot plus the events matching the
+    # condition: the latest event per (user, exercise), kept if it is an add
+    return f"""
+        SELECT UserId, ExerciseName, Exercise, AddedAt
+        FROM (
+            SELECT UserId, ExerciseName, Exercise, Action, EventTime AS AddedAt
+            FROM (
+                SELECT UserId, ExerciseName, Exercise, 'add' AS Action, AddedAt AS EventTime
+                FROM `{FAVORITES_SNAPSHOT_TABLE}`
+                UNION ALL
+                SELECT UserId, ExerciseName, Exercise, Action, EventTime
+                FROM `{FAVORITE_EVENTS_TABLE}`
+                WHERE {events_condition}
+            )
+            WHERE TRUE
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY UserId, ExerciseName ORDER BY EventTime DESC) = 1
+        )
+        WHERE Action = 'add'
+    """
+
+_LAST_COMPACTION_SQL = f"(SELECT IFNULL(MAX(CompactedThrough), TIMESTAMP_SECONDS(0)) FROM `{FAVORITE_COMPACTIONS_TABLE}`)"
+
+def create_favorites_log():
+    """
+    Creates the favorites event log, snapshot, compaction history and view.
+
+    The snapshot starts from the rows of the old Favorites table, which is
+    left in place. Existing tables are kept, so this is safe to rerun.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    query = f"""
+        CREATE TABLE IF NOT EXISTS `{FAVORITE_EVENTS_TABLE}` (
+            UserId STRING NOT NULL,
+            ExerciseName STRING NOT NULL,
+            Action STRING NOT NULL,
+            Exercise JSON,
+            EventTime TIMESTAMP NOT NULL
+        )
+        PARTITION BY DATE(EventTime)
+        CLUSTER BY UserId;
+
+        CREATE TABLE IF NOT EXISTS `{FAVORITE_COMPACTIONS_TABLE}` (
+            CompactedThrough TIMESTAMP NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS `{FAVORITES_SNAPSHOT_TABLE}`
+        CLUSTER BY UserId
+        AS
+        SELECT
+            UserId,
+            JSON_VALUE(TO_JSON(Exercise), '$.name') AS ExerciseName,
+            TO_JSON(Exercise) AS Exercise,
+            TIMESTAMP_SECONDS(0) AS AddedAt
+        FROM `{TABLE_NAME}`;
+
+        CREATE OR REPLACE VIEW `{FAVORITES_VIEW}` AS
+        {_favorites_state_sql(f"EventTime > {_LAST_COMPACTION_SQL}")};
+    """
+    client.query(query).result()  # Wait for the script to complete
+
+def compact_favorites(margin=timedelta(hours=1)):
+    """
+    Folds favorite events older than margin into the snapshot and deletes
+    the events the previous compaction already folded in.
+
+    Deleting only events from before the previous compaction keeps the
+    DELETE away from rows still in the streaming buffer, and rerunning
+    after a failure is harmless because replaying events gives the same
+    state.
+
+    Args:
+        margin: How old events must be to be compacted
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    query = f"""
+        DECLARE previous TIMESTAMP DEFAULT {_LAST_COMPACTION_SQL};
+        DECLARE watermark TIMESTAMP DEFAULT TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {int(margin.total_seconds())} SECOND);
+
+        CREATE OR REPLACE TABLE `{FAVORITES_SNAPSHOT_TABLE}`
+        CLUSTER BY UserId
+        AS
+        {_favorites_state_sql("EventTime > previous AND EventTime <= watermark")};
+
+        INSERT INTO `{FAVORITE_COMPACTIONS_TABLE}` (CompactedThrough) VALUES (watermark);
+
+        DELETE FROM `{FAVORITE_EVENTS_TABLE}` WHERE EventTime <= previous;
+    """
+    client.query(query).result()  # Wait for the script to complete
+
+def get_favorite_pairs():
+    """
+    Returns every current favorite with one bulk query.
+
+    Returns:
+        A list of (user_id, exercise_name) tuples.
+    """
+    query = f"""
+        SELECT UserId, ExerciseName
+        FROM `{FAVORITES_VIEW}`
+    """
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        return [(row.UserId, row.ExerciseName) for row in client.query(query).result()]
+    except Exception as e:
+        print(f"Error fetching favorites from BigQuery: {e}")
+        return []
+
+# Precomputed "also favorited" lists (see exercise_recommender.py)
+EXERCISE_RECOMMENDATIONS_TABLE = "dreamteamproject-449421.DreamDataset.ExerciseRecommendations"
+
+def replace_exercise_recommendations(rows):
+    """
+    Replaces the whole ExerciseRecommendations table (used by the batch job).
+
+    Args:
+        rows: Dictionaries from ItemRecommendations.to_rows.
+    """
+    client = bigquery.Client(project=PROJECT_ID)
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        schema=[
+            bigquery.SchemaField("ExerciseName", "STRING"),
+            bigquery.SchemaField("Rank", "INT64"),
+            bigquery.SchemaField("Recommended", "STRING"),
+            bigquery.SchemaField("CoCount", "INT64"),
+            bigquery.SchemaField("ExerciseCount", "INT64"),
+            bigquery.SchemaField("RecommendedCount", "INT64"),
+        ],
+        clustering_fields=["ExerciseName"],
+    )
+    client.load_table_from_json(rows, EXERCISE_RECOMMENDATIONS_TABLE, job_config=job_config).result()
+
+def get_exercise_recommendation_rows():
+    """
+    Returns every stored recommendation row with one bulk query.
+
+    Returns:
+        A list of dictionaries with keys ExerciseName, Rank, Recommended,
+        CoCount, ExerciseCount and RecommendedCount.
+    """
+    query = f"""
+        SELECT ExerciseName, Rank, Recommended, CoCount, ExerciseCount, RecommendedCount
+        FROM `{EXERCISE_RECOMMENDATIONS_TABLE}`
+    """
+
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        return [dict(row.items()) for row in client.query(query).result()]
+    except Exception as e:
+        print(f"Error fetching exercise recommendations from BigQuery: {e}")
+        return []
+
+def get_exercise_recommendations_modified():
+    """
+    Returns when the ExerciseRecommendations table was last replaced, read
+    from the table's metadata without running a query.
+
+    Returns:
+        A datetime, or None if the table can't be read.
+    """
+    try:
+        client = bigquery.Client(project=PROJECT_ID)
+        return client.get_table(EXERCISE_RECOMMENDATIONS_TABLE).modified
+    except Exception as e:
+        print(f"Error fetching exercise recommendations metadata from BigQuery: {e}")
+        return None
+
+# Recommendations loaded once per process; favorites changed here are applied
+# in place. Every EXERCISE_RECOMMENDATIONS_CHECK_INTERVAL the table's
+# last-modified time is checked, and the lists are only reloaded when the
+# batch job has replaced the table since they were loaded.
+EXERCISE_RECOMMENDATIONS_CHECK_INTERVAL = timedelta(hours=1)
+_exercise_recommendations = None
+_exercise_recommendations_modified = None
+_exercise_recommendations_checked_at = None
+
+def get_exercise_recommendations(now=None):
+    """
+    Returns the in-memory exercise recommendations, loading them with one
+    bulk query the first time.
+
+    Favorites toggled in the app update the lists in memory and are saved,
+    so the next batch run includes them; the lists are only reloaded when
+    the ExerciseRecommendations table changed.
+    That is checked at most once per EXERCISE_RECOMMENDATIONS_CHECK_INTERVAL,
+    so a nightly batch is picked up within the hour and the in-app updates
+    are kept until then.
+
+    Args:
+        now: Optional datetime to use instead of the current time.
+
+    Returns:
+        An exercise_recommender.ItemRecommendations.
+    """
+    global _exercise_recommendations, _exercise_recommendations_modified, _exercise_recommendations_checked_at
+
+    if now is None:
+        now = datetime.now()
+
+    if _exercise_recommendations is not None and now - _exercise_recommendations_checked_at <= EXERCISE_RECOMMENDATIONS_CHECK_INTERVAL:
+        return _exercise_recommendations
+
+    _exercise_recommendations_checked_at = now
+    modified = get_exercise_recommendations_modified()
+    # Keep the current lists when the table is unchanged or its metadata can't be read
+    if _exercise_recommendations is None or (modified is not None and modified != _exercise_recommendations_modified):
+        _exercise_recommendations = ItemRecommendations.from_rows(get_exercise_recommendation_rows())
+        _exercise_recommendations_modified = modified
+
+    return _exercise_recommendations
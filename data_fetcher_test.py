@@ -5,13 +5,16 @@
 #
 # You will write these tests in Unit 3.
 #############################################################################
+import json
 import unittest
 from unittest.mock import patch, MagicMock
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
 import random
 from data_fetcher import (
     get_user_sensor_data, get_user_workouts, get_user_profile,
-    get_genai_advice, get_user_posts, create_user_post
+    get_genai_advice, get_user_posts, create_user_post, get_points_leaderboard,
+    create_user_workout, get_user_rollup_totals, get_latest_leaderboard_snapshot, get_badge_state,
+    get_user_workout_points, create_leaderboard_snapshots_table, rebuild_points_rollup
 )
 
 class TestDataFetcher(unittest.TestCase):
@@ -59,6 +62,190 @@ class TestDataFetcher(unittest.TestCase):
         self.assertEqual(result[0]['distance'], 5.5)
         self.assertEqual(result[0]['steps'], 1000)
 
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_points_leaderboard(self, mock_bigquery_client):
+        """Tests get_points_leaderboard function."""
+        mock_client_instance = mock_bigquery_client.return_value
+        mock_query_job = mock_client_instance.query.return_value
+        mock_query_job.result.return_value = [
+            MagicMock(UserId="user2", Points=540, Name="Blake", ImageUrl=None, Rank=1, RankedUsers=3),
+            MagicMock(UserId="user1", Points=120, Name=None, ImageUrl="http://example.com/remi.jpg", Rank=2, RankedUsers=3)
+        ]
+
+        result = get_points_leaderboard("week", date(2025, 3, 17), limit=2)
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['rank'], 1)
+        self.assertEqual(result[0]['name'], "Blake")
+        self.assertEqual(result[0]['points'], 540)
+        self.assertEqual(result[0]['profile_image'], "")
+        self.assertEqual(result[1]['name'], "user1")
+        self.assertEqual(result[1]['ranked_users'], 3)
+
+        # Points are aggregated per user from the rollups in one query
+        mock_client_instance.query.assert_called_once()
+        called_query = mock_client_instance.query.call_args[0][0]
+        self.assertIn("PointsRollup", called_query)
+        self.assertIn("GROUP BY UserId", called_query)
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_user_rollup_totals(self, mock_bigquery_client):
+        """Tests get_user_rollup_totals function."""
+        mock_client_instance = mock_bigquery_client.return_value
+        mock_query_job = mock_client_instance.query.return_value
+        mock_query_job.result.return_value = [
+            MagicMock(Points=620, Calories=500, Distance=12.5, Steps=9000, DurationSeconds=3600, WorkoutCount=2)
+        ]
+
+        result = get_user_rollup_totals("user1", "month", date(2025, 3, 1))
+        self.assertEqual(result['points'], 620)
+        self.assertEqual(result['calories_burned'], 500)
+        self.assertEqual(result['distance'], 12.5)
+        self.assertEqual(result['workouts'], 2)
+
+        # A period without workouts sums to NULL in BigQuery
+        mock_query_job.result.return_value = [
+            MagicMock(Points=None, Calories=None, Distance=None, Steps=None, DurationSeconds=None, WorkoutCount=None)
+        ]
+        result = get_user_rollup_totals("user1", "day", date(2025, 3, 20))
+        self.assertEqual(result['points'], 0)
+        self.assertEqual(result['workouts'], 0)
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_latest_leaderboard_snapshot(self, mock_bigquery_client):
+        """Tests get_latest_leaderboard_snapshot function."""
+        mock_client_instance = mock_bigquery_client.return_value
+        mock_query_job = mock_client_instance.query.return_value
+        mock_query_job.result.return_value = [
+            MagicMock(Version=datetime(2025, 3, 20, 6, 0, 0), Rank=1, UserId="user2", Points=900, Name="Blake", ImageUrl=None),
+            MagicMock(Version=datetime(2025, 3, 20, 6, 0, 0), Rank=2, UserId="user1", Points=450, Name="Remi", ImageUrl="http://example.com/remi.jpg"),
+        ]
+
+        result = get_latest_leaderboard_snapshot("week", date(2025, 3, 17))
+        self.assertEqual(result['version'], datetime(2025, 3, 20, 6, 0, 0))
+        self.assertEqual([row['user_id'] for row in result['rankings']], ["user2", "user1"])
+        self.assertEqual(result['rankings'][0]['profile_image'], "")
+
+        # No snapshot has been written for the period
+        mock_query_job.result.return_value = []
+        self.assertIsNone(get_latest_leaderboard_snapshot("week", date(2025, 3, 24)))
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_latest_leaderboard_snapshot_aware_version(self, mock_bigquery_client):
+        """Tests that a timezone-aware version comes back as naive local time."""
+        version = datetime(2025, 3, 20, 6, 0, 0, tzinfo=timezone.utc)
+        mock_bigquery_client.return_value.query.return_value.result.return_value = [
+            MagicMock(Version=version, Rank=1, UserId="user2", Points=900, Name="Blake", ImageUrl=None),
+        ]
+
+        result = get_latest_leaderboard_snapshot("week", date(2025, 3, 17))
+        self.assertIsNone(result['version'].tzinfo)
+        self.assertEqual(result['version'], version.astimezone().replace(tzinfo=None))
+        # Comparable with the naive now() the leaderboard uses
+        self.assertIsInstance(datetime.now() - result['version'], timedelta)
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_create_leaderboard_snapshots_table(self, mock_bigquery_client):
+        """Tests create_leaderboard_snapshots_table function."""
+        create_leaderboard_snapshots_table()
+        query = mock_bigquery_client.return_value.query.call_args[0][0]
+        self.assertIn("CREATE TABLE IF NOT EXISTS", query)
+        self.assertIn("Version DATETIME", query)
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_user_workout_points(self, mock_bigquery_client):
+        """Tests get_user_workout_points function."""
+        mock_client_instance = mock_bigquery_client.return_value
+        mock_query_job = mock_client_instance.query.return_value
+        mock_query_job.result.return_value = [
+            MagicMock(WorkoutId="w2", Number=2, StartTimestamp=datetime(2025, 3, 20, 8, 0), CaloriesBurned=300, TotalDistance=5.0, Points=315),
+            MagicMock(WorkoutId="w1", Number=1, StartTimestamp=datetime(2025, 3, 19, 8, 0), CaloriesBurned=100, TotalDistance=0.0, Points=100),
+        ]
+
+        rows = get_user_workout_points("user1", datetime(2025, 3, 17), limit=50, page_size=20)
+        self.assertEqual([row['workout_id'] for row in rows], ["w2", "w1"])
+
+        # Stored points are read in pages from a query ordered newest first
+        called_query = mock_client_instance.query.call_args[0][0]
+        self.assertIn("ORDER BY StartTimestamp DESC", called_query)
+        mock_query_job.result.assert_called_once_with(page_size=20)
+        params = {
+            param.name: param.value
+            for param in mock_client_instance.query.call_args[1]['job_config'].query_parameters
+        }
+        self.assertEqual(params['limit'], 50)
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_user_workout_points_error(self, mock_bigquery_client):
+        """Tests that query errors are raised instead of returning no workouts."""
+        mock_bigquery_client.return_value.query.side_effect = RuntimeError("Unrecognized name: Points")
+        with self.assertRaises(RuntimeError):
+            list(get_user_workout_points("user1", datetime(2025, 3, 17)))
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_rebuild_points_rollup_adds_points_column(self, mock_bigquery_client):
+        """Tests that the rebuild adds the Points column before rescoring workouts."""
+        rebuild_points_rollup("CAST(IFNULL(CaloriesBurned, 0) AS INT64)", 1)
+        query = mock_bigquery_client.return_value.query.call_args[0][0]
+        self.assertIn("ADD COLUMN IF NOT EXISTS Points INT64", query)
+        self.assertLess(query.index("ADD COLUMN"), query.index("SET Points"))
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_badge_state(self, mock_bigquery_client):
+        """Tests get_badge_state function."""
+        mock_client_instance = mock_bigquery_client.return_value
+        mock_query_job = mock_client_instance.query.return_value
+        mock_query_job.result.return_value = [
+            MagicMock(LastWorkoutDay=date(2025, 3, 20), CurrentStreak=3, LongestStreak=8, WorkoutCount=41,
+                      MaxCalories=620.0, MaxDurationSeconds=5400, Badges=['calorie_record', '7_day_streak']),
+        ]
+
+        result = get_badge_state("user1")
+        self.assertEqual(result['last_workout_day'], date(2025, 3, 20))
+        self.assertEqual(result['longest_streak'], 8)
+        self.assertEqual(result['badges'], ['calorie_record', '7_day_streak'])
+
+        # Users without workouts have no state yet
+        mock_query_job.result.return_value = []
+        self.assertIsNone(get_badge_state("user9"))
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_create_user_workout(self, mock_bigquery_client):
+        """Tests create_user_workout function."""
+        mock_client_instance = mock_bigquery_client.return_value
+
+        workout = {
+            'workout_id': 'workout9',
+            'start_timestamp': '2025-03-20 12:00:00',
+            'end_timestamp': '2025-03-20 12:30:00',
+            'start_lat_lng': [1.0, 2.0],
+            'end_lat_lng': [1.5, 2.5],
+            'distance': 5.0,
+            'steps': 6000,
+            'calories_burned': 300,
+        }
+        create_user_workout("user1", workout, 315, 1)
+
+        # The insert and the incremental rollup update are one query
+        mock_client_instance.query.assert_called_once()
+        called_query = mock_client_instance.query.call_args[0][0]
+        self.assertIn("INSERT INTO", called_query)
+        self.assertIn("MERGE", called_query)
+        # The insert and the rollup update commit together
+        self.assertLess(called_query.index("BEGIN TRANSACTION"), called_query.index("INSERT INTO"))
+        self.assertLess(called_query.index("MERGE"), called_query.index("COMMIT TRANSACTION"))
+        self.assertNotIn("RulesVersion =", called_query)
+        for granularity in ['day', 'week', 'month', 'year']:
+            self.assertIn(f"'{granularity}' AS Granularity", called_query)
+
+        params = {
+            param.name: param.value
+            for param in mock_client_instance.query.call_args[1]['job_config'].query_parameters
+        }
+        self.assertEqual(params['points'], 315)
+        self.assertEqual(params['duration_seconds'], 1800)
+        self.assertEqual(params['rules_version'], 1)
+        self.assertIn("@points", called_query.split("MERGE")[0])
+
     @patch('data_fetcher.bigquery.Client')
     def test_get_user_posts(self, mock_bigquery_client):
         """Tests get_user_posts function."""
@@ -85,12 +272,16 @@ class TestDataFetcher(unittest.TestCase):
         self.assertEqual(result[1]['image'], "http://example.com/image2.jpg")
 
     @patch('data_fetcher.bigquery.Client')
-    def test_get_user_profile(self, mock_bigquery_client):
+    @patch('data_fetcher.get_friendships')
+    def test_get_user_profile(self, mock_get_friendships, mock_bigquery_client):
         """Tests get_user_profile function."""
+        import data_fetcher
+        data_fetcher._friend_graph = None
+        mock_get_friendships.return_value = [("user1", "friend1"), ("friend2", "user1"), ("friend1", "friend2")]
         mock_client_instance = mock_bigquery_client.return_value
         mock_query_job = mock_client_instance.query.return_value
         mock_query_job.result.return_value = [
-            MagicMock(UserId1="friend1", UserId2="friend2", Username="remi_the_rems", Name="Remi", DateOfBirth="1990-01-01", ImageUrl="http://example.com/profile.jpg")
+            MagicMock(Username="remi_the_rems", Name="Remi", DateOfBirth="1990-01-01", ImageUrl="http://example.com/profile.jpg")
         ]
         
         result = get_user_profile("user1")
@@ -98,8 +289,13 @@ class TestDataFetcher(unittest.TestCase):
         self.assertEqual(result['username'], "remi_the_rems")
         self.assertEqual(result['date_of_birth'], "1990-01-01")
         self.assertEqual(result['profile_image'], "http://example.com/profile.jpg")
-        self.assertIn("friend1", result['friends'])
-        self.assertIn("friend2", result['friends'])
+        self.assertEqual(result['friends'], ["friend1", "friend2"])
+        
+        # Friends come from the cached friend graph, not a scan of Friends per profile
+        get_user_profile("user2")
+        mock_get_friendships.assert_called_once()
+        self.assertNotIn("Friends", mock_client_instance.query.call_args[0][0])
+        data_fetcher._friend_graph = None
 
     @patch('data_fetcher.vertexai.init')
     @patch('data_fetcher.GenerativeModel')
@@ -148,7 +344,7 @@ class TestDataFetcher(unittest.TestCase):
 
     @patch('data_fetcher.bigquery.Client')
     def test_add_favorite(self, mock_bigquery_client):
-        """Tests add_favorite function."""
+        """Tests that add_favorite appends an add event."""
         from data_fetcher import add_favorite
 
         mock_client_instance = mock_bigquery_client.return_value
@@ -158,24 +354,116 @@ class TestDataFetcher(unittest.TestCase):
         add_favorite("user1", exercise)
         mock_client_instance.insert_rows_json.assert_called_once()
         args, _ = mock_client_instance.insert_rows_json.call_args
-        self.assertEqual(args[1][0]['Exercise'], exercise)
+        self.assertIn("FavoriteEvents", args[0])
+        self.assertEqual(json.loads(args[1][0]['Exercise']), exercise)
         self.assertEqual(args[1][0]['UserId'], "user1")
+        self.assertEqual(args[1][0]['Action'], "add")
 
     @patch('data_fetcher.bigquery.Client')
     def test_remove_favorite(self, mock_bigquery_client):
-        """Tests remove_favorite function."""
+        """Tests that remove_favorite appends a remove event instead of running a DELETE."""
         from data_fetcher import remove_favorite
 
         mock_client_instance = mock_bigquery_client.return_value
-        mock_query_job = mock_client_instance.query.return_value
-        mock_query_job.result.return_value = None  # Simulate success
+        mock_client_instance.insert_rows_json.return_value = []
 
         remove_favorite("user1", "Deadlift")
-        mock_client_instance.query.assert_called_once()
-        called_query = mock_client_instance.query.call_args[0][0]
-        self.assertIn("DELETE FROM", called_query)
-        self.assertIn("Exercise.name = @exercise_name", called_query)
+        mock_client_instance.query.assert_not_called()
+        args, _ = mock_client_instance.insert_rows_json.call_args
+        self.assertEqual(args[1][0]['ExerciseName'], "Deadlift")
+        self.assertEqual(args[1][0]['Action'], "remove")
+        self.assertIsNone(args[1][0]['Exercise'])
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_append_favorite_events(self, mock_bigquery_client):
+        """Tests that a batch of events is one insert and errors are raised."""
+        from data_fetcher import append_favorite_events, favorite_event
+
+        mock_client_instance = mock_bigquery_client.return_value
+        mock_client_instance.insert_rows_json.return_value = []
+        events = [
+            favorite_event("user1", "Squat", "add", {"name": "Squat"}, datetime(2025, 4, 16, 12, 0, 0, tzinfo=timezone.utc)),
+            favorite_event("user1", "Squat", "remove", event_time=datetime(2025, 4, 16, 14, 0, 5, tzinfo=timezone(timedelta(hours=2)))),
+        ]
+        append_favorite_events(events)
+        mock_client_instance.insert_rows_json.assert_called_once()
+        self.assertEqual(mock_client_instance.insert_rows_json.call_args[0][1][1]['EventTime'], "2025-04-16 12:00:05+00:00")
+
+        # Without a time the event is stamped with the current UTC time
+        stamped = datetime.fromisoformat(favorite_event("user1", "Squat", "remove")["EventTime"])
+        self.assertEqual(stamped.utcoffset(), timedelta(0))
+        self.assertLess(abs(datetime.now(timezone.utc) - stamped), timedelta(minutes=1))
+
+        append_favorite_events([])
+        self.assertEqual(mock_client_instance.insert_rows_json.call_count, 1)
+
+        mock_client_instance.insert_rows_json.return_value = [{"index": 0, "errors": ["invalid"]}]
+        with self.assertRaises(RuntimeError):
+            append_favorite_events(events)
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_compact_favorites(self, mock_bigquery_client):
+        """Tests that compaction keeps recent events and only deletes already-compacted ones."""
+        from data_fetcher import compact_favorites
+
+        compact_favorites(timedelta(minutes=30))
+        query = mock_bigquery_client.return_value.query.call_args[0][0]
+        self.assertIn("INTERVAL 1800 SECOND", query)
+        self.assertIn("EventTime > previous AND EventTime <= watermark", query)
+        self.assertIn("DELETE FROM `dreamteamproject-449421.DreamDataset.FavoriteEvents` WHERE EventTime <= previous", query)
+
+
+    @patch('data_fetcher.get_exercise_recommendations_modified')
+    @patch('data_fetcher.get_exercise_recommendation_rows')
+    def test_get_exercise_recommendations(self, mock_rows, mock_modified):
+        """Tests that recommendations are only reloaded after the batch job replaced the table."""
+        import data_fetcher
+        data_fetcher._exercise_recommendations = None
+        mock_rows.return_value = [{'ExerciseName': 'Squat', 'Rank': 1, 'Recommended': 'Lunge', 'CoCount': 2,
+                                   'ExerciseCount': 4, 'RecommendedCount': 2}]
+        mock_modified.return_value = datetime(2025, 4, 16, 2, 0, 0)
+        now = datetime(2025, 4, 16, 12, 0, 0)
+        interval = data_fetcher.EXERCISE_RECOMMENDATIONS_CHECK_INTERVAL
+        try:
+            recommendations = data_fetcher.get_exercise_recommendations(now)
+            self.assertEqual(recommendations.recommend('Squat')[0][0], 'Lunge')
+            self.assertIs(data_fetcher.get_exercise_recommendations(now + timedelta(minutes=5)), recommendations)
+            mock_rows.assert_called_once()
+            mock_modified.assert_called_once()
+
+            # Unchanged table: in-app updates are kept
+            recommendations.add_favorite({'Plank'}, 'Squat')
+            self.assertIs(data_fetcher.get_exercise_recommendations(now + interval + timedelta(minutes=1)), recommendations)
+            self.assertEqual(mock_modified.call_count, 2)
+            mock_rows.assert_called_once()
+
+            # Unreadable metadata: keep serving what we have
+            mock_modified.return_value = None
+            self.assertIs(data_fetcher.get_exercise_recommendations(now + 2 * interval + timedelta(minutes=2)), recommendations)
+            mock_rows.assert_called_once()
+
+            # Replaced by the batch job: reloaded
+            mock_modified.return_value = datetime(2025, 4, 17, 2, 0, 0)
+            reloaded = data_fetcher.get_exercise_recommendations(now + 3 * interval + timedelta(minutes=3))
+            self.assertIsNot(reloaded, recommendations)
+            self.assertEqual(mock_rows.call_count, 2)
+        finally:
+            data_fetcher._exercise_recommendations = None
+
+    @patch('data_fetcher.bigquery.Client')
+    def test_get_exercise_recommendations_modified(self, mock_bigquery_client):
+        """Tests reading the recommendations table's last-modified time from its metadata."""
+        from data_fetcher import get_exercise_recommendations_modified, EXERCISE_RECOMMENDATIONS_TABLE
+
+        modified = datetime(2025, 4, 17, 2, 0, 0)
+        mock_bigquery_client.return_value.get_table.return_value.modified = modified
+        self.assertEqual(get_exercise_recommendations_modified(), modified)
+        mock_bigquery_client.return_value.get_table.assert_called_once_with(EXERCISE_RECOMMENDATIONS_TABLE)
+        mock_bigquery_client.return_value.query.assert_not_called()
 
+        mock_bigquery_client.return_value.get_table.side_effect = Exception("not found")
+        with patch('builtins.print'):
+            self.assertIsNone(get_exercise_recommendations_modified())
 
 if __name__ == '__main__':
     unittest.main()
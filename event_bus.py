@@ -0,0 +1,105 @@
+#############################################################################
+# event_bus.py
+#
+# This file contains a small in-process publish/subscribe bus. Publishers
+# (e.g. leaderboard_utils.record_workout) post events to a topic, and each
+# subscriber collects them until it polls. Events that arrive between two
+# polls are coalesced, and a subscriber receives at most one update per
+# min_interval seconds.
+#############################################################################
+
+import threading
+import time
+import weakref
+
+
+class Subscription:
+    """
+    One subscriber's pending events for a topic.
+
+    Args:
+        min_interval: Minimum seconds between two delivered updates
+        coalesce: Function (pending, event) -> pending that folds a new
+            event into the pending update (pending is None at first).
+            By default events are collected in a list.
+    """
+
+    def __init__(self, min_interval=0, coalesce=None):
+        self.min_interval = min_interval
+        self._coalesce = coalesce or (lambda pending, event: (pending or []) + [event])
+        self._pending = None
+        self._last_delivered = None
+        self._lock = threading.Lock()
+
+    def deliver(self, event):
+        """Add a published event to the pending update."""
+        with self._lock:
+            self._pending = self._coalesce(self._pending, event)
+
+    def has_pending(self):
+        """Whether events arrived since the last update."""
+        return self._pending is not None
+
+    def poll(self, now=None):
+        """
+        Take the pending update if there is one and the interval has passed.
+
+        Args:
+            now: Optional time.monotonic() value to use instead of the current time
+
+        Returns:
+            The coalesced update, or None
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            if self._pending is None:
+                return None
+            if self._last_delivered is not None and now - self._last_delivered < self.min_interval:
+                return None
+            update, self._pending = self._pending, None
+            self._last_delivered = now
+            return update
+
+
+class EventBus:
+    """
+    Publish/subscribe within one process.
+
+    Subscriptions are held weakly, so a subscriber that goes away (e.g. a
+    closed Streamlit session) stops receiving events without unsubscribing.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, min_interval=0, coalesce=None):
+        """
+        Start collecting a topic's events.
+
+        Returns:
+            Subscription (keep a reference to it for as long as it's needed)
+        """
+        subscription = Subscription(min_interval, coalesce)
+        with self._lock:
+            self._subscribers.setdefault(topic, weakref.WeakSet()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, topic, subscription):
+        """Stop delivering a topic's events to a subscription."""
+        with self._lock:
+            self._subscribers.get(topic, weakref.WeakSet()).discard(subscription)
+
+    def publish(self, topic, event):
+        """
+        Deliver an event to every subscriber of a topic.
+
+        Returns:
+            Number of subscriptions the event was delivered to
+        """
+        with self._lock:
+            subscriptions = list(self._subscribers.get(topic, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+        return len(subscriptions)
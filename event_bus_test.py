@@ -0,0 +1,78 @@
+#############################################################################
+# event_bus_test.py
+#
+# This file contains tests for event_bus.py.
+#############################################################################
+import gc
+import threading
+import unittest
+from event_bus import EventBus
+from leaderboard_utils import coalesce_point_deltas
+
+
+class LocalPublisher:
+    """Stands in for workout ingest by publishing points from another thread."""
+
+    def __init__(self, bus, topic):
+        self.bus = bus
+        self.topic = topic
+
+    def publish_all(self, events):
+        thread = threading.Thread(target=lambda: [self.bus.publish(self.topic, event) for event in events])
+        thread.start()
+        thread.join()
+
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus()
+        self.publisher = LocalPublisher(self.bus, "points")
+
+    def test_coalesced_updates(self):
+        """Tests that events between polls arrive as one coalesced update."""
+        subscription = self.bus.subscribe("points", min_interval=5, coalesce=coalesce_point_deltas)
+        self.publisher.publish_all([
+            {'user_id': 'user1', 'points': 100},
+            {'user_id': 'user2', 'points': 40},
+            {'user_id': 'user1', 'points': 25},
+        ])
+
+        self.assertEqual(subscription.poll(now=100.0), {'deltas': {'user1': 125, 'user2': 40}, 'workouts': 3})
+        self.assertIsNone(subscription.poll(now=100.5))
+
+    def test_min_interval(self):
+        """Tests that a subscriber gets at most one update per interval."""
+        subscription = self.bus.subscribe("points", min_interval=5)
+        self.bus.publish("points", 'a')
+        self.assertEqual(subscription.poll(now=10.0), ['a'])
+
+        self.bus.publish("points", 'b')
+        self.bus.publish("points", 'c')
+        # Too soon: the events wait for the next interval
+        self.assertIsNone(subscription.poll(now=12.0))
+        self.assertTrue(subscription.has_pending())
+        self.assertEqual(subscription.poll(now=15.0), ['b', 'c'])
+
+    def test_topics_and_unsubscribe(self):
+        """Tests that subscribers only get their topic until they unsubscribe."""
+        points = self.bus.subscribe("points")
+        posts = self.bus.subscribe("posts")
+        self.assertEqual(self.bus.publish("points", 'a'), 1)
+        self.assertIsNone(posts.poll())
+
+        self.bus.unsubscribe("points", points)
+        self.assertEqual(self.bus.publish("points", 'b'), 0)
+        self.assertEqual(points.poll(), ['a'])
+
+    def test_dropped_subscription(self):
+        """Tests that a subscription nobody holds anymore stops receiving events."""
+        subscription = self.bus.subscribe("points")
+        self.assertEqual(self.bus.publish("points", 'a'), 1)
+        del subscription
+        gc.collect()
+        self.assertEqual(self.bus.publish("points", 'b'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
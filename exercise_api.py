@@ -0,0 +1,414 @@
+#############################################################################
+# exercise_api.py
+#
+# This file contains the api-ninjas exercise client and the exercise search
+# used when the local catalog has no snapshot.
+#
+# ExerciseApiClient keeps one pooled requests.Session, sends the requests of
+# a search in parallel, retries timeouts and server errors with jittered
+# backoff, and revalidates responses it has seen before with ETag and
+# If-Modified-Since, so an unchanged answer comes back as an empty 304.
+#
+# On top of it, a result cache understands filter containment: a query that
+# only narrows an earlier one (adds a filter, extends the name, drops a
+# difficulty) is answered by filtering the earlier results locally instead
+# of calling the API again.
+#############################################################################
+
+import collections
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_KEY = os.getenv("API_KEY")
+API_URL = "https://api.api-ninjas.com/v1/exercises"
+API_TIMEOUT_SECONDS = 10
+# Results per API response; a full page means there may be more
+API_PAGE_SIZE = 10
+
+# Connections kept open to the API, also the most requests sent at once
+API_POOL_SIZE = 8
+API_MAX_RETRIES = 3
+# First retry waits about this long, doubling after each further attempt
+API_RETRY_BACKOFF_SECONDS = 0.5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RESPONSE_CACHE_SIZE = 512
+
+QUERY_CACHE_SIZE = 256
+
+Query = collections.namedtuple("Query", ["name", "type_", "muscle", "difficulty"])
+
+
+def make_query(name=None, type_=None, muscle=None, difficulty=None):
+    """
+    A normalized, hashable exercise query.
+
+    Empty filters become None and difficulties a sorted tuple, so equal
+    searches share a cache entry.
+    """
+    return Query(
+        name.strip().lower() if name and name.strip() else None,
+        type_ or None,
+        muscle or None,
+        tuple(sorted(set(difficulty))) if difficulty else None,
+    )
+
+
+def contains(outer, inner):
+    """
+    Whether every result of the inner query is also a result of the outer one.
+
+    The API matches names by substring, so a longer name is narrower: any
+    name containing "press" contains "pre".
+    """
+    if outer.name is not None and (inner.name is None or outer.name not in inner.name):
+        return False
+    if outer.type_ is not None and outer.type_ != inner.type_:
+        return False
+    if outer.muscle is not None and outer.muscle != inner.muscle:
+        return False
+    if outer.difficulty is not None and (inner.difficulty is None or not set(inner.difficulty) <= set(outer.difficulty)):
+        return False
+    return True
+
+
+def matches(query, exercise):
+    """Whether an exercise satisfies a query, the way the API filters."""
+    return (
+        (query.name is None or query.name in exercise.get("name", "").lower())
+        and (query.type_ is None or exercise.get("type") == query.type_)
+        and (query.muscle is None or exercise.get("muscle") == query.muscle)
+        and (query.difficulty is None or exercise.get("difficulty") in query.difficulty)
+    )
+
+
+class ExerciseQueryCache:
+    """
+    LRU cache of query results that answers narrower queries from a cached
+    superset.
+
+    Only complete results can be narrowed: when the API returned a full
+    page there may be exercises it did not send, and filtering those
+    results would miss them.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        # Query -> (results, complete), least recently used first
+        self.entries = collections.OrderedDict()
+        self.stats = collections.Counter()
+        # Shared by every session's script thread
+        self.lock = threading.Lock()
+
+    def get(self, query):
+        """
+        Cached results for a query, or None on a miss.
+
+        Counts each lookup as an exact hit, a containment hit or a miss.
+        """
+        with self.lock:
+            if query in self.entries:
+                self.entries.move_to_end(query)
+                self.stats["exact_hits"] += 1
+                return self.entries[query][0]
+
+            for cached, (results, complete) in reversed(self.entries.items()):
+                if complete and contains(cached, query):
+                    self.entries.move_to_end(cached)
+                    narrowed = [exercise for exercise in results if matches(query, exercise)]
+                    self._put(query, narrowed, True)
+                    self.stats["containment_hits"] += 1
+                    return narrowed
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, query, results, complete):
+        """Store the results of a query."""
+        with self.lock:
+            self._put(query, results, complete)
+
+    def _put(self, query, results, complete):
+        # Callers hold the lock
+        self.entries[query] = (results, complete)
+        self.entries.move_to_end(query)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Share of lookups answered without calling the API."""
+        with self.lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats["exact_hits"] + self.stats["containment_hits"]
+        if lookups == 0:
+            return 0.0
+        return hits / lookups
+
+
+class ExerciseApiClient:
+    """
+    Pooled, retrying and revalidating client for the exercise API.
+    """
+
+    def __init__(self, url=API_URL, api_key=API_KEY, timeout=API_TIMEOUT_SECONDS,
+                 max_retries=API_MAX_RETRIES, backoff=API_RETRY_BACKOFF_SECONDS, sleep=time.sleep):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.session = requests.Session()
+        self.session.headers["X-Api-Key"] = api_key or ""
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=API_POOL_SIZE)
+        # Sorted params -> (ETag, Last-Modified, body), least recently used first
+        self.responses = collections.OrderedDict()
+        # Guards responses and stats, which the executor's threads update
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def retry_delay(self, attempt):
+        """Seconds to wait before retry number attempt (from 0), with jitter."""
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    def get(self, params):
+        """
+        One API request, revalidated against the response cache.
+
+        Args:
+            params: Dictionary of query parameters
+
+        Returns:
+            Decoded JSON body
+
+        Raises:
+            requests.RequestException: When the API still fails after the
+                retries or answers with a client error
+        """
+        key = tuple(sorted(params.items()))
+        headers = {}
+        with self.lock:
+            cached = self.responses.get(key)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = self.send(params, headers)
+        if response.status_code == 304 and cached is not None:
+            with self.lock:
+                self.stats["not_modified"] += 1
+                self.responses.move_to_end(key)
+            return cached[2]
+
+        response.raise_for_status()
+        body = response.json()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self.lock:
+            self.stats["downloaded"] += 1
+            if etag or last_modified:
+                self.responses[key] = (etag, last_modified, body)
+                self.responses.move_to_end(key)
+                while len(self.responses) > RESPONSE_CACHE_SIZE:
+                    self.responses.popitem(last=False)
+        return body
+
+    def send(self, params, headers):
+        """Send a request, retrying timeouts, connection errors and 429/5xx."""
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.get(self.url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return response
+            with self.lock:
+                self.stats["retries"] += 1
+            self.sleep(self.retry_delay(attempt))
+
+    def get_many(self, params_list):
+        """
+        Several requests in parallel over the pooled connections.
+
+        Returns:
+            List of decoded JSON bodies, in the order of params_list
+        """
+        if len(params_list) == 1:
+            return [self.get(params_list[0])]
+        return list(self.executor.map(self.get, params_list))
+
+
+_client = None
+
+
+def get_client():
+    """The exercise API client shared by the process."""
+    global _client
+    if _client is None:
+        _client = ExerciseApiClient()
+    return _client
+
+
+query_cache = ExerciseQueryCache()
+
+
+def stats_summary():
+    """
+    One line on how well the query cache and the API client's revalidation
+    are doing, for the exercise page's sidebar and logs.
+
+    Returns:
+        String such as "Query cache: 75% hit rate (2 exact, 1 narrowed, 1 missed);
+        API: 1 downloaded, 3 not modified, 0 retries"
+    """
+    with query_cache.lock:
+        cache_stats = collections.Counter(query_cache.stats)
+    # Don't open a client just to report that it hasn't been used
+    api_stats = collections.Counter()
+    if _client is not None:
+        with _client.lock:
+            api_stats = collections.Counter(_client.stats)
+    return (
+        f"Query cache: {query_cache.hit_rate():.0%} hit rate "
+        f"({cache_stats['exact_hits']} exact, {cache_stats['containment_hits']} narrowed, {cache_stats['misses']} missed); "
+        f"API: {api_stats['downloaded']} downloaded, {api_stats['not_modified']} not modified, {api_stats['retries']} retries"
+    )
+
+
+def query_params(query):
+    """
+    The API parameters of a query, one set per difficulty since the API
+    takes a single difficulty.
+    """
+    params = {}
+    if query.name:
+        params["name"] = query.name
+    if query.type_:
+        params["type"] = query.type_
+    if query.muscle:
+        params["muscle"] = query.muscle
+
+    if query.difficulty:
+        return [dict(params, difficulty=difficulty) for difficulty in query.difficulty]
+    return [params]
+
+
+def iter_exercise_pages(query, prefetch=True):
+    """
+    Lazily yield the pages of a query's results, following the offset.
+
+    The first page of every difficulty is requested in parallel up front.
+    With prefetch, the request for the next page is sent as soon as a full
+    page arrives, so it is usually ready when it is asked for.
+
+    Args:
+        query: Query from make_query
+        prefetch: Whether to request the next page in the background
+
+    Yields:
+        Lists of exercise dictionaries (a page is never empty)
+    """
+    client = get_client()
+    streams = query_params(query)
+    first_pages = [client.executor.submit(client.get, dict(params, offset=0)) for params in streams]
+
+    for params, first_page in zip(streams, first_pages):
+        page = first_page.result()
+        offset = 0
+        while page:
+            offset += len(page)
+            full = len(page) >= API_PAGE_SIZE
+            next_page = None
+            if full and prefetch:
+                next_page = client.executor.submit(client.get, dict(params, offset=offset))
+            yield page
+            if not full:
+                break
+            page = next_page.result() if next_page else client.get(dict(params, offset=offset))
+
+
+class ExercisePager:
+    """
+    The results of a query, loaded a page at a time as they are needed.
+
+    Once every page is loaded the results go in the query cache, so later
+    and narrower searches don't call the API.
+    """
+
+    def __init__(self, query, prefetch=True):
+        self.query = query
+        self.exercises = []
+        self.exhausted = False
+        self.pages = iter_exercise_pages(query, prefetch)
+
+    @classmethod
+    def from_results(cls, query, exercises):
+        """A pager with every result already loaded."""
+        pager = cls.__new__(cls)
+        pager.query = query
+        pager.exercises = list(exercises)
+        pager.exhausted = True
+        pager.pages = iter(())
+        return pager
+
+    def load(self, count):
+        """
+        The first count results, loading pages until there are enough.
+
+        Returns:
+            List of at most count exercise dictionaries
+        """
+        while len(self.exercises) < count and not self.exhausted:
+            try:
+                self.exercises.extend(next(self.pages))
+            except StopIteration:
+                self.exhausted = True
+                query_cache.put(self.query, self.exercises, True)
+            except (requests.RequestException, ValueError) as e:
+                print(f"Error fetching exercises: {e} ({stats_summary()})")
+                # Show what was loaded; the next search starts over
+                self.exhausted = True
+        return self.exercises[:count]
+
+    def has_more(self, count):
+        """Whether there are (or may be) more than count results."""
+        return len(self.exercises) > count or not self.exhausted
+
+
+def get_pager(name=None, type_=None, muscle=None, difficulty=None, prefetch=True):
+    """
+    A pager over the API results of a search, already complete when the
+    same or a broader search is cached.
+    """
+    query = make_query(name, type_, muscle, difficulty)
+    results = query_cache.get(query)
+    if results is not None:
+        return ExercisePager.from_results(query, results)
+    return ExercisePager(query, prefetch)
+
+
+def fetch_exercises(name=None, type_=None, muscle=None, difficulty=None):
+    """
+    Every API result of a search, reusing cached results of the same or a
+    broader search.
+
+    Returns:
+        List of exercise dictionaries, empty if the API can't be reached
+    """
+    pager = get_pager(name, type_, muscle, difficulty)
+    while not pager.exhausted:
+        pager.load(len(pager.exercises) + API_PAGE_SIZE)
+    return pager.exercises
@@ -0,0 +1,361 @@
+#############################################################################
+# exercise_api_test.py
+#
+# This file contains tests for exercise_api.py.
+#############################################################################
+import hashlib
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+import exercise_api
+from exercise_api import ExerciseApiClient, ExerciseQueryCache, contains, fetch_exercises, get_pager, make_query, stats_summary
+
+EXERCISES = [
+    {"name": "Barbell Bench Press", "type": "strength", "muscle": "chest", "difficulty": "intermediate"},
+    {"name": "Push-Up", "type": "strength", "muscle": "chest", "difficulty": "beginner"},
+    {"name": "Dumbbell Shoulder Press", "type": "strength", "muscle": "shoulders", "difficulty": "beginner"},
+    {"name": "Clean and Press", "type": "olympic_weightlifting", "muscle": "shoulders", "difficulty": "expert"},
+]
+
+
+class StubExerciseServer:
+    """
+    Local HTTP server that answers like the exercise API from a list of
+    exercises, with ETag and Last-Modified validators.
+
+    Set failures to make the next requests fail with a 503, and delay to
+    make every response that many seconds slow.
+    """
+
+    LAST_MODIFIED = "Wed, 16 Apr 2025 12:00:00 GMT"
+
+    def __init__(self, exercises):
+        self.exercises = exercises
+        self.requests = []
+        self.failures = 0
+        self.delay = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/exercises"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, request):
+        params = dict(parse_qsl(urlparse(request.path).query))
+        with self.lock:
+            self.requests.append((params, dict(request.headers)))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            failing = self.failures > 0
+            self.failures -= failing
+        try:
+            if self.delay:
+                threading.Event().wait(self.delay)
+            if failing:
+                request.send_response(503)
+                request.end_headers()
+                return
+
+            query = make_query(params.get("name"), params.get("type"), params.get("muscle"),
+                               [params["difficulty"]] if "difficulty" in params else None)
+            matching = [ex for ex in self.exercises if exercise_api.matches(query, ex)]
+            offset = int(params.get("offset", 0))
+            body = json.dumps(matching[offset:offset + exercise_api.API_PAGE_SIZE]).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+            if request.headers.get("If-None-Match") == etag:
+                request.send_response(304)
+                request.send_header("ETag", etag)
+                request.end_headers()
+                return
+            request.send_response(200)
+            request.send_header("Content-Type", "application/json")
+            request.send_header("Content-Length", str(len(body)))
+            request.send_header("ETag", etag)
+            request.send_header("Last-Modified", self.LAST_MODIFIED)
+            request.end_headers()
+            request.wfile.write(body)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestContainment(unittest.TestCase):
+
+    def test_contains(self):
+        """Tests which queries are narrower than others."""
+        self.assertTrue(contains(make_query(), make_query("press", "strength")))
+        self.assertTrue(contains(make_query("pre"), make_query("Press")))
+        self.assertTrue(contains(make_query(muscle="chest"), make_query("bench", muscle="chest")))
+        self.assertTrue(contains(make_query(difficulty=["beginner", "expert"]), make_query(difficulty=["expert"])))
+        self.assertFalse(contains(make_query("press"), make_query("pre")))
+        self.assertFalse(contains(make_query(muscle="chest"), make_query()))
+        self.assertFalse(contains(make_query(muscle="chest"), make_query(muscle="lats")))
+        self.assertFalse(contains(make_query(difficulty=["expert"]), make_query()))
+        self.assertFalse(contains(make_query(difficulty=["expert"]), make_query(difficulty=["expert", "beginner"])))
+
+    def test_make_query_normalizes(self):
+        """Tests that equivalent searches share one cache key."""
+        self.assertEqual(make_query(" Press ", "", None, ["expert", "beginner"]),
+                         make_query("press", None, None, ["beginner", "expert"]))
+        self.assertEqual(make_query("", difficulty=[]), make_query())
+
+
+class TestExerciseQueryCache(unittest.TestCase):
+
+    def test_narrowing_is_answered_locally(self):
+        """Tests exact, containment and missed lookups and the hit rate."""
+        cache = ExerciseQueryCache()
+        cache.put(make_query("pre"), [EXERCISES[0], EXERCISES[2], EXERCISES[3]], True)
+
+        self.assertEqual(cache.get(make_query("press", muscle="shoulders")), [EXERCISES[2], EXERCISES[3]])
+        self.assertEqual(cache.get(make_query("press", muscle="shoulders", difficulty=["expert"])), [EXERCISES[3]])
+        self.assertEqual(cache.get(make_query("pre")), [EXERCISES[0], EXERCISES[2], EXERCISES[3]])
+        self.assertIsNone(cache.get(make_query("push")))
+
+        self.assertEqual(cache.stats, {"exact_hits": 1, "containment_hits": 2, "misses": 1})
+        self.assertEqual(cache.hit_rate(), 0.75)
+
+    def test_incomplete_results_are_not_narrowed(self):
+        """Tests that a truncated page is only reused for the same query."""
+        cache = ExerciseQueryCache()
+        cache.put(make_query(muscle="chest"), EXERCISES[:1], False)
+        self.assertIsNone(cache.get(make_query("push", muscle="chest")))
+        self.assertEqual(cache.get(make_query(muscle="chest")), EXERCISES[:1])
+
+    def test_least_recently_used_is_evicted(self):
+        """Tests the entry limit."""
+        cache = ExerciseQueryCache(max_entries=2)
+        cache.put(make_query("a"), [], False)
+        cache.put(make_query("b"), [], False)
+        cache.get(make_query("a"))
+        cache.put(make_query("c"), [], False)
+        self.assertEqual(list(cache.entries), [make_query("a"), make_query("c")])
+
+
+    def test_concurrent_lookups(self):
+        """Tests that sessions sharing the cache can look up and store at once."""
+        cache = ExerciseQueryCache(max_entries=8)
+        cache.put(make_query("p"), EXERCISES, True)
+        names = ["pu", "pr", "pre", "press", "push", "bench", "curl", "row"]
+
+        def search(offset):
+            for i in range(300):
+                query = make_query(names[(i + offset) % len(names)], difficulty=["beginner", "expert"][i % 2:])
+                if cache.get(query) is None:
+                    cache.put(query, [], True)
+
+        threads = [threading.Thread(target=search, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(cache.stats.values()), 8 * 300)
+        self.assertLessEqual(len(cache.entries), 8)
+
+class TestExerciseApiClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubExerciseServer(EXERCISES).__enter__()
+        self.sleeps = []
+        self.client = ExerciseApiClient(url=self.server.url, api_key="key", timeout=2, sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.__exit__(None, None, None)
+
+    def test_revalidation(self):
+        """Tests that a repeated request is revalidated and answered by a 304."""
+        first = self.client.get({"muscle": "chest"})
+        second = self.client.get({"muscle": "chest"})
+
+        self.assertEqual(first, EXERCISES[:2])
+        self.assertEqual(second, first)
+        self.assertEqual(self.client.stats["downloaded"], 1)
+        self.assertEqual(self.client.stats["not_modified"], 1)
+        first_headers, second_headers = (headers for _, headers in self.server.requests)
+        self.assertEqual(first_headers["X-Api-Key"], "key")
+        self.assertNotIn("If-None-Match", first_headers)
+        self.assertTrue(second_headers["If-None-Match"].startswith('"'))
+        self.assertEqual(second_headers["If-Modified-Since"], StubExerciseServer.LAST_MODIFIED)
+
+    def test_changed_response_is_downloaded(self):
+        """Tests that a changed answer replaces the cached one."""
+        self.client.get({"muscle": "chest"})
+        self.server.exercises = EXERCISES[1:]
+        self.assertEqual(self.client.get({"muscle": "chest"}), [EXERCISES[1]])
+        self.assertEqual(self.client.stats["downloaded"], 2)
+
+    def test_retries_with_jittered_backoff(self):
+        """Tests retrying server errors, with growing randomized waits."""
+        self.server.failures = 2
+        self.assertEqual(self.client.get({"muscle": "shoulders"}), EXERCISES[2:])
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0.25 <= self.sleeps[0] <= 0.75)
+        self.assertTrue(0.5 <= self.sleeps[1] <= 1.5)
+
+    def test_gives_up_after_retries(self):
+        """Tests that a lasting failure is raised instead of dropped."""
+        self.server.failures = 10
+        with self.assertRaises(requests.HTTPError):
+            self.client.get({"muscle": "chest"})
+        self.assertEqual(len(self.server.requests), exercise_api.API_MAX_RETRIES + 1)
+
+    def test_timeouts_are_retried(self):
+        """Tests that a slow response times out and is retried."""
+        self.client.timeout = 0.05
+        self.server.delay = 0.3
+        with self.assertRaises(requests.Timeout):
+            self.client.get({"muscle": "chest"})
+        self.assertEqual(self.client.stats["retries"], exercise_api.API_MAX_RETRIES)
+
+    def test_get_many_runs_in_parallel(self):
+        """Tests that several requests are in flight at once, results in order."""
+        self.server.delay = 0.2
+        pages = self.client.get_many([{"difficulty": difficulty} for difficulty in ("expert", "beginner", "intermediate")])
+        self.assertEqual(pages, [[EXERCISES[3]], [EXERCISES[1], EXERCISES[2]], [EXERCISES[0]]])
+        self.assertEqual(self.server.max_active, 3)
+
+    def test_stats_from_parallel_requests(self):
+        """Tests that every parallel request is counted."""
+        params_list = [{"muscle": muscle} for muscle in ("chest", "shoulders")] * 16
+        self.client.get_many(params_list)
+        self.client.get_many(params_list)
+        self.assertEqual(self.client.stats["downloaded"] + self.client.stats["not_modified"], 64)
+        self.assertEqual(len(self.server.requests), 64)
+
+
+class TestFetchExercises(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubExerciseServer(EXERCISES).__enter__()
+        exercise_api._client = ExerciseApiClient(url=self.server.url, sleep=lambda seconds: None)
+        exercise_api.query_cache = ExerciseQueryCache()
+
+    def tearDown(self):
+        exercise_api._client.session.close()
+        exercise_api._client = None
+        exercise_api.query_cache = ExerciseQueryCache()
+        self.server.__exit__(None, None, None)
+
+    def test_narrower_search_makes_no_request(self):
+        """Tests that only the broad search goes to the API."""
+        self.assertEqual(len(fetch_exercises("pre", difficulty=["beginner", "expert"])), 2)
+        self.assertEqual(len(self.server.requests), 2)  # One request per difficulty
+
+        self.assertEqual(fetch_exercises("press", muscle="shoulders", difficulty=["expert"]), [EXERCISES[3]])
+        self.assertEqual(fetch_exercises("Pre", difficulty=["expert", "beginner"])[0], EXERCISES[2])
+        self.assertEqual(len(self.server.requests), 2)
+
+        fetch_exercises("press", difficulty=["intermediate"])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_api_error(self):
+        """Tests that failures return no exercises and are not cached."""
+        self.server.failures = 10
+        self.assertEqual(fetch_exercises("press"), [])
+        self.server.failures = 0
+        self.assertEqual(len(fetch_exercises("press")), 3)
+
+    def test_stats_summary(self):
+        """Tests the cache and API stats reported to operators."""
+        fetch_exercises("pre", difficulty=["beginner", "expert"])
+        fetch_exercises("press", muscle="shoulders", difficulty=["expert"])
+        fetch_exercises("pre", difficulty=["beginner", "expert"])
+        self.assertEqual(stats_summary(), "Query cache: 67% hit rate (1 exact, 1 narrowed, 1 missed); "
+                                          "API: 2 downloaded, 0 not modified, 0 retries")
+
+        # Reporting before any search doesn't open a client
+        client, exercise_api._client = exercise_api._client, None
+        self.assertTrue(stats_summary().endswith("API: 0 downloaded, 0 not modified, 0 retries"))
+        self.assertIsNone(exercise_api._client)
+        exercise_api._client = client
+
+
+class TestExercisePager(unittest.TestCase):
+
+    EXERCISES = [
+        {"name": f"Chest Exercise {i}", "type": "strength", "muscle": "chest", "difficulty": "beginner"}
+        for i in range(23)
+    ]
+
+    def setUp(self):
+        self.server = StubExerciseServer(self.EXERCISES).__enter__()
+        exercise_api._client = ExerciseApiClient(url=self.server.url)
+        exercise_api.query_cache = ExerciseQueryCache()
+
+    def tearDown(self):
+        exercise_api._client.session.close()
+        exercise_api._client = None
+        exercise_api.query_cache = ExerciseQueryCache()
+        self.server.__exit__(None, None, None)
+
+    def offsets(self):
+        return sorted(int(params["offset"]) for params, _ in self.server.requests)
+
+    def test_pages_load_on_demand(self):
+        """Tests that pages are requested only as more results are asked for."""
+        pager = get_pager(muscle="chest", prefetch=False)
+
+        self.assertEqual(pager.load(5), self.EXERCISES[:5])
+        self.assertEqual(self.offsets(), [0])
+        self.assertTrue(pager.has_more(5))
+
+        self.assertEqual(pager.load(15), self.EXERCISES[:15])
+        self.assertEqual(self.offsets(), [0, 10])
+
+        # The short last page ends the results without another request
+        self.assertEqual(pager.load(100), self.EXERCISES)
+        self.assertEqual(self.offsets(), [0, 10, 20])
+        self.assertFalse(pager.has_more(23))
+        self.assertTrue(pager.exhausted)
+
+    def test_complete_results_are_cached(self):
+        """Tests that a fully loaded search answers narrower ones."""
+        self.assertEqual(len(fetch_exercises(muscle="chest")), 23)
+        requests_made = len(self.server.requests)
+
+        pager = get_pager(name="exercise 1", muscle="chest")
+        self.assertTrue(pager.exhausted)
+        self.assertEqual(len(pager.load(100)), 11)  # 1 and 10 to 19
+        self.assertEqual(len(self.server.requests), requests_made)
+
+    def test_prefetch(self):
+        """Tests that the next page is requested before it is asked for."""
+        pager = get_pager(muscle="chest")
+        pager.load(5)
+        deadline = time.monotonic() + 5
+        while len(self.server.requests) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.offsets(), [0, 10])
+        self.assertEqual(pager.load(15), self.EXERCISES[:15])
+
+
+if __name__ == '__main__':
+    unittest.main()
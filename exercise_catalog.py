@@ -0,0 +1,301 @@
+#############################################################################
+# exercise_catalog.py
+#
+# This file contains the local exercise catalog. The api-ninjas exercise
+# list is snapshotted in bulk, stored on disk and refreshed periodically,
+# and indexed so any combination of the Exercises page filters is answered
+# in memory:
+#
+#   - one bitmap per type, muscle, equipment and difficulty value
+#   - a NameIndex (prefix trie and trigrams) over the exercise names
+#
+# Bitmaps are Python integers with bit i set for the i-th exercise, so a
+# filter combination is a handful of AND/OR operations.
+#
+# Pages never wait for the API: a stale snapshot keeps being served while a
+# background thread takes a new one. Refresh the snapshot by hand (e.g. from
+# a scheduled job) with:
+#
+#   $ python exercise_catalog.py --refresh
+#############################################################################
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import threading
+import requests
+from exercise_api import get_client
+from exercise_similarity import SimilarityIndex
+from name_index import NameIndex
+
+EXERCISE_TYPES = [
+    "cardio", "olympic_weightlifting", "plyometrics",
+    "powerlifting", "strength", "stretching", "strongman"
+]
+MUSCLES = [
+    "abdominals", "abductors", "adductors", "biceps", "calves", "chest",
+    "forearms", "glutes", "hamstrings", "lats", "lower_back", "middle_back",
+    "neck", "quadriceps", "traps", "triceps"
+]
+DIFFICULTIES = ["beginner", "intermediate", "expert"]
+
+FACETS = ["type", "muscle", "equipment", "difficulty"]
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "exercise_catalog.json")
+CATALOG_MAX_AGE = datetime.timedelta(days=1)
+CATALOG_RETRY_INTERVAL = datetime.timedelta(minutes=10)
+
+_catalog = None
+_retry_after = None
+_refresh_thread = None
+_lock = threading.Lock()
+
+
+def iter_bits(bitmap):
+    """Positions of the set bits of a bitmap, lowest first."""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+class ExerciseCatalog:
+    """
+    Exercises with bitmap indexes on every filter facet and a ranked name
+    index.
+    """
+
+    def __init__(self, exercises, fetched_at=None):
+        self.exercises = list(exercises)
+        self.fetched_at = fetched_at
+        self.all = (1 << len(self.exercises)) - 1
+        self.facets = {facet: {} for facet in FACETS}
+        self.names = NameIndex(exercise.get("name", "") for exercise in self.exercises)
+        self.positions = {exercise.get("name"): i for i, exercise in enumerate(self.exercises)}
+        self.similarity = None
+
+        for i, exercise in enumerate(self.exercises):
+            bit = 1 << i
+            for facet in FACETS:
+                value = (exercise.get(facet) or "").lower()
+                self.facets[facet][value] = self.facets[facet].get(value, 0) | bit
+
+    def __len__(self):
+        return len(self.exercises)
+
+    def values(self, facet):
+        """The distinct values of a facet, sorted."""
+        return sorted(value for value in self.facets[facet] if value)
+
+    def query_bitmap(self, type_=None, muscle=None, equipment=None, difficulty=None):
+        """
+        The bitmap of exercises matching a facet filter combination.
+
+        Args:
+            type_, muscle, equipment: Optional single facet values
+            difficulty: Optional list of difficulties (any of them matches)
+        """
+        bitmap = self.all
+        for facet, value in (("type", type_), ("muscle", muscle), ("equipment", equipment)):
+            if value:
+                bitmap &= self.facets[facet].get(value.lower(), 0)
+        if difficulty:
+            allowed = 0
+            for value in difficulty:
+                allowed |= self.facets["difficulty"].get(value.lower(), 0)
+            bitmap &= allowed
+        return bitmap
+
+    def query(self, name=None, type_=None, muscle=None, equipment=None, difficulty=None, limit=None):
+        """
+        Exercises matching a filter combination.
+
+        Args:
+            name: Optional name search; matches are ranked best first,
+                otherwise exercises are in catalog order
+            type_, muscle, equipment, difficulty: Facet filters (see query_bitmap)
+            limit: Optional maximum number of exercises
+
+        Returns:
+            List of exercise dictionaries in the api-ninjas format
+        """
+        bitmap = self.query_bitmap(type_, muscle, equipment, difficulty)
+        if name and name.strip():
+            ids = self.names.search(name, k=limit, allowed=bitmap)
+        else:
+            ids = itertools.islice(iter_bits(bitmap), limit)
+        return [self.exercises[i] for i in ids]
+
+    def build_similarity(self):
+        """Precompute every exercise's most similar exercises."""
+        self.similarity = SimilarityIndex.from_exercises(self.exercises)
+
+    def similar(self, exercise_name, k=None):
+        """
+        The exercises most similar to one in the catalog.
+
+        Returns:
+            List of exercise dictionaries, best first (empty for exercises
+            not in the catalog)
+        """
+        position = self.positions.get(exercise_name)
+        if position is None:
+            return []
+        if self.similarity is None:
+            self.build_similarity()
+        return [self.exercises[i] for i, _ in self.similarity.similar(position, k)]
+
+    def save(self, path=CATALOG_PATH):
+        """Write the snapshot to disk."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot = {
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "exercises": self.exercises,
+        }
+        # Write to a temporary file first so readers never see half a snapshot
+        with open(path + ".tmp", "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        """
+        Read a snapshot from disk.
+
+        Returns:
+            ExerciseCatalog, or None when there is no readable snapshot
+        """
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+        fetched_at = snapshot.get("fetched_at")
+        return cls(snapshot["exercises"], datetime.datetime.fromisoformat(fetched_at) if fetched_at else None)
+
+
+def fetch_muscle_exercises(muscle):
+    """Every exercise for one muscle, following the offset until a page is empty."""
+    client = get_client()
+    exercises = []
+    while True:
+        page = client.get({"muscle": muscle, "offset": len(exercises)})
+        if not page:
+            return exercises
+        exercises.extend(page)
+
+
+def fetch_all_exercises():
+    """
+    Download every exercise from the API, with the muscles fetched in
+    parallel.
+
+    Returns:
+        List of distinct exercise dictionaries
+    """
+    exercises = {}
+    for muscle_exercises in get_client().executor.map(fetch_muscle_exercises, MUSCLES):
+        for exercise in muscle_exercises:
+            exercises.setdefault(exercise["name"], exercise)
+    return list(exercises.values())
+
+
+def refresh_catalog(path=CATALOG_PATH, now=None):
+    """
+    Take a new snapshot from the API and store it on disk.
+
+    Returns:
+        ExerciseCatalog
+    """
+    catalog = ExerciseCatalog(fetch_all_exercises(), now or datetime.datetime.now())
+    catalog.build_similarity()
+    catalog.save(path)
+    return catalog
+
+
+def _refresh_in_background(path, now):
+    global _catalog, _retry_after
+    try:
+        catalog = refresh_catalog(path, now)
+    except (requests.RequestException, OSError, ValueError) as e:
+        print(f"Error refreshing the exercise catalog: {e}")
+        with _lock:
+            _retry_after = now + CATALOG_RETRY_INTERVAL
+        return
+    with _lock:
+        _catalog = catalog
+
+
+def get_catalog(path=CATALOG_PATH, now=None):
+    """
+    Get the exercise catalog, kept in memory once per process.
+
+    The snapshot on disk is loaded on the first call and served as is; when
+    it is older than CATALOG_MAX_AGE one background thread per process takes
+    a new one, which replaces it once stored. Until then (and when the API
+    can't be reached) the old snapshot is served, however old; without any
+    snapshot the catalog is empty. A failed refresh is not tried again for
+    CATALOG_RETRY_INTERVAL.
+
+    Args:
+        path: Snapshot file
+        now: Optional datetime to use instead of the current time
+
+    Returns:
+        ExerciseCatalog
+    """
+    global _catalog, _refresh_thread
+
+    if now is None:
+        now = datetime.datetime.now()
+
+    with _lock:
+        if _catalog is None:
+            _catalog = ExerciseCatalog.load(path)
+            if _catalog is None:
+                _catalog = ExerciseCatalog([], None)
+            else:
+                _catalog.build_similarity()
+
+        stale = _catalog.fetched_at is None or now - _catalog.fetched_at > CATALOG_MAX_AGE
+        refreshing = _refresh_thread is not None and _refresh_thread.is_alive()
+        if stale and not refreshing and (_retry_after is None or now >= _retry_after):
+            _refresh_thread = threading.Thread(target=_refresh_in_background, args=(path, now), daemon=True)
+            _refresh_thread.start()
+
+        return _catalog
+
+
+def wait_for_refresh(timeout=None):
+    """
+    Wait for a background refresh started by get_catalog to finish.
+
+    Args:
+        timeout: Maximum number of seconds to wait
+
+    Returns:
+        True if no refresh is running any more
+    """
+    thread = _refresh_thread
+    if thread is None:
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the local exercise catalog snapshot.")
+    parser.add_argument("--refresh", action="store_true", help="Take a new snapshot from the API")
+    args = parser.parse_args()
+
+    if args.refresh:
+        catalog = refresh_catalog()
+        print(f"Saved {len(catalog)} exercises to {CATALOG_PATH}.")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#############################################################################
+# exercise_catalog_test.py
+#
+# This file contains tests for exercise_catalog.py.
+#############################################################################
+import datetime
+import os
+import random
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import exercise_api
+import exercise_catalog
+from exercise_api import ExerciseApiClient
+from exercise_api_test import StubExerciseServer
+from exercise_catalog import ExerciseCatalog, get_catalog, wait_for_refresh
+
+EXERCISES = [
+    {"name": "Barbell Bench Press", "type": "strength", "muscle": "chest", "equipment": "barbell", "difficulty": "intermediate"},
+    {"name": "Push-Up", "type": "strength", "muscle": "chest", "equipment": "body_only", "difficulty": "beginner"},
+    {"name": "Dumbbell Shoulder Press", "type": "strength", "muscle": "shoulders", "equipment": "dumbbell", "difficulty": "beginner"},
+    {"name": "Jump Rope", "type": "cardio", "muscle": "calves", "equipment": "other", "difficulty": "beginner"},
+    {"name": "Clean and Press", "type": "olympic_weightlifting", "muscle": "shoulders", "equipment": "barbell", "difficulty": "expert"},
+]
+
+NOW = datetime.datetime(2025, 4, 16, 12, 0, 0)
+
+
+def scan(exercises, type_=None, muscle=None, equipment=None, difficulty=None):
+    """The facet filters applied one exercise at a time, to compare against."""
+    return [
+        ex for ex in exercises
+        if (not type_ or ex["type"] == type_)
+        and (not muscle or ex["muscle"] == muscle)
+        and (not equipment or ex["equipment"] == equipment)
+        and (not difficulty or ex["difficulty"] in difficulty)
+    ]
+
+
+class TestExerciseCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = ExerciseCatalog(EXERCISES, NOW)
+
+    def names(self, **filters):
+        return [ex["name"] for ex in self.catalog.query(**filters)]
+
+    def test_facet_filters(self):
+        """Tests single and combined facet filters, with difficulties ORed."""
+        self.assertEqual(len(self.catalog.query()), 5)
+        self.assertEqual(self.names(muscle="chest"), ["Barbell Bench Press", "Push-Up"])
+        self.assertEqual(self.names(equipment="barbell", muscle="shoulders"), ["Clean and Press"])
+        self.assertEqual(
+            self.names(difficulty=["beginner", "expert"], type_="strength"),
+            ["Push-Up", "Dumbbell Shoulder Press"]
+        )
+        self.assertEqual(self.names(type_="strongman"), [])
+        self.assertEqual(self.catalog.values("equipment"), ["barbell", "body_only", "dumbbell", "other"])
+
+    def test_name_search(self):
+        """Tests that name matches are ranked and combined with the facets."""
+        self.assertEqual(self.names(name="press"), ["Clean and Press", "Barbell Bench Press", "Dumbbell Shoulder Press"])
+        self.assertEqual(self.names(name="pre", limit=2), ["Clean and Press", "Barbell Bench Press"])
+        self.assertEqual(self.names(name="benhc press"), ["Barbell Bench Press"])
+        self.assertEqual(self.names(name="PUSH"), ["Push-Up"])
+        self.assertEqual(self.names(name="row"), [])
+        self.assertEqual(self.names(name="press", difficulty=["beginner"]), ["Dumbbell Shoulder Press"])
+        self.assertEqual(len(self.catalog.query(name="  ")), 5)
+
+    def test_facets_match_scan(self):
+        """Tests random facet combinations against a scan of the exercises."""
+        rng = random.Random(3)
+        for _ in range(200):
+            filters = {
+                "type_": rng.choice([None, "strength", "cardio"]),
+                "muscle": rng.choice([None, "chest", "shoulders"]),
+                "equipment": rng.choice([None, "barbell", "dumbbell"]),
+                "difficulty": rng.sample(exercise_catalog.DIFFICULTIES, rng.randint(0, 2)),
+            }
+            self.assertEqual(self.catalog.query(**filters), scan(EXERCISES, **filters))
+            self.assertEqual(self.catalog.query(limit=1, **filters), scan(EXERCISES, **filters)[:1])
+
+    def test_similar(self):
+        """Tests similar exercises by name."""
+        self.assertEqual(
+            [ex["name"] for ex in self.catalog.similar("Clean and Press", k=2)],
+            ["Dumbbell Shoulder Press", "Barbell Bench Press"]
+        )
+        self.assertEqual(self.catalog.similar("Deadlift"), [])
+
+    def test_save_and_load(self):
+        """Tests that a snapshot round-trips through disk."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshot", "catalog.json")
+            self.assertIsNone(ExerciseCatalog.load(path))
+            self.catalog.save(path)
+            loaded = ExerciseCatalog.load(path)
+        self.assertEqual(loaded.exercises, EXERCISES)
+        self.assertEqual(loaded.fetched_at, NOW)
+        self.assertEqual(loaded.query(muscle="calves"), [EXERCISES[3]])
+
+
+class TestGetCatalog(unittest.TestCase):
+
+    def setUp(self):
+        exercise_catalog._catalog = None
+        exercise_catalog._retry_after = None
+        exercise_catalog._refresh_thread = None
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "catalog.json")
+
+    def tearDown(self):
+        wait_for_refresh(5)
+        exercise_catalog._refresh_thread = None
+        exercise_catalog._catalog = None
+        exercise_catalog._retry_after = None
+        self.directory.cleanup()
+
+    def test_fetch_all_exercises(self):
+        """Tests paging through every muscle against a stub API."""
+        exercises = [
+            {"name": f"Exercise {i}", "type": "strength", "muscle": muscle, "equipment": "other", "difficulty": "beginner"}
+            for i, muscle in enumerate(["chest"] * 12 + ["lats", "chest"])
+        ]
+        with StubExerciseServer(exercises + exercises[:1]) as server:
+            exercise_api._client = ExerciseApiClient(url=server.url)
+            try:
+                fetched = exercise_catalog.fetch_all_exercises()
+            finally:
+                exercise_api._client.session.close()
+                exercise_api._client = None
+
+        self.assertEqual(sorted(fetched, key=lambda ex: int(ex["name"].split()[1])), exercises)
+        # Two full pages and an empty one for chest, one empty page for the other muscles but lats
+        self.assertEqual(len(server.requests), len(exercise_catalog.MUSCLES) + 3)
+
+    @patch('exercise_catalog.fetch_all_exercises')
+    def test_snapshot_is_reused_while_fresh(self, mock_fetch):
+        """Tests that a fresh snapshot is loaded from disk and kept in memory."""
+        ExerciseCatalog(EXERCISES, NOW).save(self.path)
+
+        catalog = get_catalog(self.path, NOW + datetime.timedelta(hours=1))
+        self.assertEqual(len(catalog), 5)
+        self.assertIs(get_catalog(self.path, NOW + datetime.timedelta(hours=2)), catalog)
+        mock_fetch.assert_not_called()
+
+    @patch('exercise_catalog.fetch_all_exercises')
+    def test_stale_snapshot_is_refreshed_in_background(self, mock_fetch):
+        """Tests that an old snapshot is served while a new one is taken and written back to disk."""
+        ExerciseCatalog(EXERCISES, NOW).save(self.path)
+        fetched = threading.Event()
+        mock_fetch.side_effect = lambda: fetched.wait(5) and EXERCISES[:1]
+        later = NOW + exercise_catalog.CATALOG_MAX_AGE + datetime.timedelta(minutes=1)
+
+        # The old snapshot is returned without waiting for the API
+        self.assertEqual(len(get_catalog(self.path, later)), 5)
+        self.assertEqual(len(get_catalog(self.path, later)), 5)
+        fetched.set()
+        self.assertTrue(wait_for_refresh(5))
+
+        self.assertEqual(get_catalog(self.path, later).exercises, EXERCISES[:1])
+        self.assertEqual(ExerciseCatalog.load(self.path).fetched_at, later)
+        # Only one refresh runs at a time
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    @patch('exercise_catalog.fetch_all_exercises')
+    def test_concurrent_first_calls_load_once(self, mock_fetch):
+        """Tests that sessions starting at the same time share one refresh."""
+        fetched = threading.Event()
+        mock_fetch.side_effect = lambda: fetched.wait(5) and EXERCISES
+        catalogs = []
+        threads = [
+            threading.Thread(target=lambda: catalogs.append(get_catalog(self.path, NOW)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(catalogs), 8)
+        self.assertEqual(len({id(catalog) for catalog in catalogs}), 1)
+        fetched.set()
+        self.assertTrue(wait_for_refresh(5))
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(len(get_catalog(self.path, NOW)), 5)
+
+    @patch('exercise_catalog.fetch_all_exercises')
+    def test_failed_refresh_keeps_old_snapshot(self, mock_fetch):
+        """Tests that the old snapshot is served when the API can't be reached."""
+        mock_fetch.side_effect = requests.ConnectionError("offline")
+        later = NOW + exercise_catalog.CATALOG_MAX_AGE * 2
+
+        self.assertEqual(len(get_catalog(self.path, later)), 0)
+        self.assertTrue(wait_for_refresh(5))
+        # Not retried on every page run while the API is down
+        self.assertEqual(len(get_catalog(self.path, later + datetime.timedelta(minutes=1))), 0)
+        self.assertTrue(wait_for_refresh(5))
+        self.assertEqual(mock_fetch.call_count, 1)
+
+        exercise_catalog._catalog = None
+        exercise_catalog._retry_after = None
+        ExerciseCatalog(EXERCISES, NOW).save(self.path)
+        self.assertEqual(len(get_catalog(self.path, later)), 5)
+
+if __name__ == '__main__':
+    unittest.main()
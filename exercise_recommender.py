@@ -0,0 +1,181 @@
+#############################################################################
+# exercise_recommender.py
+#
+# This file contains the "people who favorited this also favorited"
+# recommender. A batch job (recommendations_batch.py) builds a sparse
+# user x exercise matrix from every favorite, counts how often each pair of
+# exercises is favorited by the same user (the item-item co-occurrence
+# X^T X), and stores each exercise's best co-favorited exercises.
+#
+# The app loads the stored lists and answers lookups from memory. Favorites
+# added or removed in the app update the counts of the affected exercises in
+# place until the next batch run. Exercises are ranked by the cosine of
+# their favorite vectors, co_count / sqrt(count_a * count_b).
+#############################################################################
+
+import math
+import threading
+import numpy as np
+
+RECOMMENDATIONS_K = 5
+# Candidates stored per exercise, more than are shown so incremental
+# updates can promote an exercise without a rebuild
+STORED_CANDIDATES = 20
+
+
+def cooccurrence_counts(pairs):
+    """
+    Count co-favorites with a sparse user x exercise matrix.
+
+    Args:
+        pairs: Iterable of (user_id, exercise_name) favorites
+
+    Returns:
+        Tuple of (exercise names, favorite count per exercise, dictionary of
+        exercise position -> (co-favorited positions, counts) arrays)
+    """
+    pairs = list(set(pairs))
+    if not pairs:
+        return [], np.zeros(0, dtype=np.int64), {}
+    users, user_codes = np.unique([user for user, _ in pairs], return_inverse=True)
+    names, item_codes = np.unique([name for _, name in pairs], return_inverse=True)
+
+    # CSR rows per user and CSC columns per exercise of the binary matrix
+    by_user = np.lexsort((item_codes, user_codes))
+    user_items = item_codes[by_user]
+    user_ptr = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(user_codes, minlength=len(users)), out=user_ptr[1:])
+    by_item = np.lexsort((user_codes, item_codes))
+    item_users = user_codes[by_item]
+    item_ptr = np.zeros(len(names) + 1, dtype=np.int64)
+    item_counts = np.bincount(item_codes, minlength=len(names))
+    np.cumsum(item_counts, out=item_ptr[1:])
+
+    counts = {}
+    for item in range(len(names)):
+        users_of_item = item_users[item_ptr[item]:item_ptr[item + 1]]
+        # Row item of X^T X: every exercise favorited by those users
+        others = np.concatenate([user_items[user_ptr[user]:user_ptr[user + 1]] for user in users_of_item])
+        co_counts = np.bincount(others, minlength=len(names))
+        co_counts[item] = 0
+        found = np.flatnonzero(co_counts)
+        counts[item] = (found, co_counts[found])
+    return [str(name) for name in names], item_counts.astype(np.int64), counts
+
+
+class ItemRecommendations:
+    """
+    Co-favorite counts for each exercise's best candidates, with the
+    ranked lists they produce.
+    """
+
+    def __init__(self, item_counts=None, co_counts=None):
+        # Exercise name -> number of users who favorited it
+        self.item_counts = dict(item_counts or {})
+        # Exercise name -> {other exercise name: users who favorited both}
+        self.co_counts = {name: dict(others) for name, others in (co_counts or {}).items()}
+        self.ranked = {}
+        # Sessions update the counts from several threads
+        self.lock = threading.Lock()
+        for name in self.co_counts:
+            self._rerank(name)
+
+    @classmethod
+    def from_pairs(cls, pairs, stored=STORED_CANDIDATES):
+        """
+        Build the recommendations from every (user_id, exercise_name) favorite.
+
+        Returns:
+            ItemRecommendations
+        """
+        names, item_counts, counts = cooccurrence_counts(pairs)
+        recommendations = cls(dict(zip(names, item_counts.tolist())))
+        for item, (others, co_counts) in counts.items():
+            scores = co_counts / np.sqrt(item_counts[item] * item_counts[others])
+            best = np.lexsort((others, -scores))[:stored]
+            recommendations.co_counts[names[item]] = {names[other]: int(count) for other, count in zip(others[best], co_counts[best])}
+            recommendations._rerank(names[item])
+        return recommendations
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Load stored recommendations (see to_rows)."""
+        item_counts = {}
+        co_counts = {}
+        for row in rows:
+            item_counts[row['ExerciseName']] = row['ExerciseCount']
+            item_counts[row['Recommended']] = row['RecommendedCount']
+            co_counts.setdefault(row['ExerciseName'], {})[row['Recommended']] = row['CoCount']
+        return cls(item_counts, co_counts)
+
+    def to_rows(self):
+        """Rows for data_fetcher.replace_exercise_recommendations."""
+        return [
+            {
+                'ExerciseName': name,
+                'Rank': rank,
+                'Recommended': other,
+                'CoCount': self.co_counts[name][other],
+                'ExerciseCount': self.item_counts[name],
+                'RecommendedCount': self.item_counts[other],
+            }
+            for name, ranked in self.ranked.items()
+            for rank, (other, _) in enumerate(ranked, start=1)
+        ]
+
+    def score(self, name, other):
+        count = self.co_counts.get(name, {}).get(other, 0)
+        if count <= 0:
+            return 0.0
+        return count / math.sqrt(max(self.item_counts.get(name, 1), 1) * max(self.item_counts.get(other, 1), 1))
+
+    def _rerank(self, name):
+        candidates = [(other, self.score(name, other)) for other in self.co_counts.get(name, {})]
+        ranked = sorted((pair for pair in candidates if pair[1] > 0), key=lambda pair: (-pair[1], pair[0]))
+        self.ranked[name] = ranked[:STORED_CANDIDATES]
+
+    def recommend(self, name, k=RECOMMENDATIONS_K):
+        """
+        The exercises most often favorited together with one.
+
+        Returns:
+            List of (exercise name, score) tuples, best first
+        """
+        return self.ranked.get(name, [])[:k]
+
+    def add_favorite(self, other_favorites, name):
+        """
+        Count a new favorite by a user who already favorited other_favorites.
+
+        Only the lists of the exercises involved are re-ranked. A pair that
+        fell outside the stored candidates counts from zero until the next
+        rebuild.
+        """
+        self._update(other_favorites, name, 1)
+
+    def remove_favorite(self, other_favorites, name):
+        """Undo add_favorite when a user removes a favorite."""
+        self._update(other_favorites, name, -1)
+
+    def _update(self, other_favorites, name, delta):
+        with self.lock:
+            self._apply(other_favorites, name, delta)
+
+    def _apply(self, other_favorites, name, delta):
+        self.item_counts[name] = max(self.item_counts.get(name, 0) + delta, 0)
+        affected = {name}
+        for other in other_favorites:
+            if other == name:
+                continue
+            for a, b in ((name, other), (other, name)):
+                pairs = self.co_counts.setdefault(a, {})
+                count = pairs.get(b, 0) + delta
+                if count > 0:
+                    pairs[b] = count
+                else:
+                    pairs.pop(b, None)
+            affected.add(other)
+        # The scores of name's pairs changed with its count everywhere it appears
+        affected.update(self.co_counts.get(name, {}))
+        for exercise in affected:
+            self._rerank(exercise)
@@ -0,0 +1,97 @@
+#############################################################################
+# exercise_recommender_test.py
+#
+# This file contains tests for exercise_recommender.py.
+#############################################################################
+import itertools
+import math
+import random
+import unittest
+from exercise_recommender import ItemRecommendations, cooccurrence_counts
+
+PAIRS = [
+    ("user1", "Squat"), ("user1", "Deadlift"), ("user1", "Bench Press"),
+    ("user2", "Squat"), ("user2", "Deadlift"),
+    ("user3", "Squat"), ("user3", "Lunge"),
+    ("user4", "Bench Press"),
+    ("user4", "Bench Press"),  # Duplicates count once
+]
+
+
+def brute_force_scores(pairs):
+    """Cosine co-favorite scores from per-user sets, to compare against."""
+    favorites = {}
+    for user, name in set(pairs):
+        favorites.setdefault(user, set()).add(name)
+    counts = {}
+    co_counts = {}
+    for names in favorites.values():
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+        for a, b in itertools.permutations(names, 2):
+            co_counts[(a, b)] = co_counts.get((a, b), 0) + 1
+    return {pair: count / math.sqrt(counts[pair[0]] * counts[pair[1]]) for pair, count in co_counts.items()}
+
+
+class TestItemRecommendations(unittest.TestCase):
+
+    def test_cooccurrence_counts(self):
+        """Tests the item-item counts from the sparse matrix."""
+        names, item_counts, counts = cooccurrence_counts(PAIRS)
+        self.assertEqual(names, ["Bench Press", "Deadlift", "Lunge", "Squat"])
+        self.assertEqual(item_counts.tolist(), [2, 2, 1, 3])
+        others, co_counts = counts[names.index("Squat")]
+        self.assertEqual([names[i] for i in others], ["Bench Press", "Deadlift", "Lunge"])
+        self.assertEqual(co_counts.tolist(), [1, 2, 1])
+
+    def test_recommend(self):
+        """Tests ranking by cosine of the favorite vectors."""
+        recommendations = ItemRecommendations.from_pairs(PAIRS)
+        self.assertEqual(
+            [name for name, _ in recommendations.recommend("Squat")],
+            ["Deadlift", "Lunge", "Bench Press"]
+        )
+        self.assertAlmostEqual(recommendations.recommend("Squat")[0][1], 2 / math.sqrt(6))
+        self.assertEqual(recommendations.recommend("Squat", k=1)[0][0], "Deadlift")
+        self.assertEqual(recommendations.recommend("Plank"), [])
+
+    def test_matches_brute_force(self):
+        """Tests random favorites against counting per-user pairs."""
+        rng = random.Random(11)
+        names = [f"Exercise {i}" for i in range(15)]
+        pairs = [(f"user{rng.randrange(40)}", rng.choice(names)) for _ in range(200)]
+        expected = brute_force_scores(pairs)
+        recommendations = ItemRecommendations.from_pairs(pairs)
+        for name in names:
+            for other, score in recommendations.recommend(name, k=100):
+                self.assertAlmostEqual(score, expected[(name, other)])
+            self.assertEqual(len(recommendations.recommend(name, k=100)), len([pair for pair in expected if pair[0] == name]))
+
+    def test_rows_round_trip(self):
+        """Tests that stored rows load back to the same lists."""
+        recommendations = ItemRecommendations.from_pairs(PAIRS)
+        rows = recommendations.to_rows()
+        self.assertIn({'ExerciseName': 'Squat', 'Rank': 1, 'Recommended': 'Deadlift', 'CoCount': 2,
+                       'ExerciseCount': 3, 'RecommendedCount': 2}, rows)
+        loaded = ItemRecommendations.from_rows(rows)
+        for name in ["Squat", "Deadlift", "Bench Press", "Lunge"]:
+            self.assertEqual(loaded.recommend(name), recommendations.recommend(name))
+
+    def test_incremental_updates_match_rebuild(self):
+        """Tests that adding and removing favorites gives the rebuilt lists."""
+        recommendations = ItemRecommendations.from_pairs(PAIRS)
+        # user2 adds Lunge, then user4 adds Squat and removes it again
+        recommendations.add_favorite(["Squat", "Deadlift"], "Lunge")
+        recommendations.add_favorite(["Bench Press"], "Squat")
+        recommendations.remove_favorite(["Bench Press"], "Squat")
+
+        rebuilt = ItemRecommendations.from_pairs(PAIRS + [("user2", "Lunge")])
+        for name in ["Squat", "Deadlift", "Bench Press", "Lunge"]:
+            self.assertEqual(
+                [(other, round(score, 9)) for other, score in recommendations.recommend(name)],
+                [(other, round(score, 9)) for other, score in rebuilt.recommend(name)]
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
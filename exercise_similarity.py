@@ -0,0 +1,133 @@
+#############################################################################
+# exercise_similarity.py
+#
+# This file contains the "similar exercises" index. Every exercise becomes a
+# sparse feature vector (its muscle, type, equipment and difficulty, plus
+# the words of its name weighted by rarity), and the k most similar
+# exercises by cosine similarity are computed once when the catalog is
+# loaded. Looking up an exercise's neighbors is then a row of a table.
+#############################################################################
+
+import math
+import numpy as np
+from name_index import tokenize
+
+# How much sharing each facet counts; name words count 1 times their IDF
+FEATURE_WEIGHTS = {
+    "muscle": 3.0,
+    "type": 2.0,
+    "equipment": 1.5,
+    "difficulty": 1.0,
+}
+SIMILAR_EXERCISES_K = 5
+
+
+def exercise_features(exercises):
+    """
+    The weighted features of each exercise as CSR arrays.
+
+    Returns:
+        Tuple of (indptr, indices, data, number of features); the features of
+        exercise i are indices[indptr[i]:indptr[i + 1]] with weights in data
+    """
+    names = [set(tokenize(exercise.get("name", ""))) for exercise in exercises]
+    document_frequency = {}
+    for words in names:
+        for word in words:
+            document_frequency[word] = document_frequency.get(word, 0) + 1
+
+    feature_ids = {}
+    indptr = [0]
+    indices = []
+    data = []
+    for exercise, words in zip(exercises, names):
+        row = {}
+        for facet, weight in FEATURE_WEIGHTS.items():
+            value = (exercise.get(facet) or "").lower()
+            if value:
+                row[feature_ids.setdefault((facet, value), len(feature_ids))] = weight
+        for word in words:
+            # Words in every name ("press" among presses) say little
+            idf = math.log(len(exercises) / document_frequency[word])
+            if idf > 0:
+                row[feature_ids.setdefault(("name", word), len(feature_ids))] = idf
+        for feature in sorted(row):
+            indices.append(feature)
+            data.append(row[feature])
+        indptr.append(len(indices))
+
+    return (
+        np.array(indptr, dtype=np.int64),
+        np.array(indices, dtype=np.int64),
+        np.array(data, dtype=np.float64),
+        len(feature_ids),
+    )
+
+
+class SimilarityIndex:
+    """
+    The top k neighbors of every exercise, precomputed.
+
+    neighbors[i] holds the positions of the exercises most similar to
+    exercise i, best first, padded with -1 when fewer share any feature,
+    and scores[i] their cosine similarities.
+    """
+
+    def __init__(self, neighbors, scores):
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @classmethod
+    def from_exercises(cls, exercises, k=SIMILAR_EXERCISES_K):
+        """
+        Build the neighbor table with one sparse row-times-matrix product per
+        exercise.
+
+        Returns:
+            SimilarityIndex
+        """
+        count = len(exercises)
+        indptr, indices, data, num_features = exercise_features(exercises)
+        norms = np.sqrt(np.add.reduceat(data ** 2, indptr[:-1])) if count and len(data) else np.zeros(count)
+        norms[indptr[:-1] == indptr[1:]] = 0.0  # reduceat repeats a value for empty rows
+
+        # Transpose to CSC so the exercises having a feature are one slice
+        rows = np.repeat(np.arange(count), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        column_rows = rows[order]
+        column_data = data[order]
+        column_ptr = np.zeros(num_features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=num_features), out=column_ptr[1:])
+
+        neighbors = np.full((count, k), -1, dtype=np.int64)
+        scores = np.zeros((count, k), dtype=np.float64)
+        for i in range(count):
+            start, end = indptr[i], indptr[i + 1]
+            if start == end:
+                continue
+            # Every exercise sharing a feature with i, and the product term
+            spans = [slice(column_ptr[f], column_ptr[f + 1]) for f in indices[start:end]]
+            others = np.concatenate([column_rows[span] for span in spans])
+            products = np.concatenate([column_data[span] * weight for span, weight in zip(spans, data[start:end])])
+            similarity = np.bincount(others, weights=products, minlength=count) / (norms[i] * np.where(norms > 0, norms, 1))
+            similarity[i] = 0.0
+
+            candidates = np.flatnonzero(similarity > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-similarity[candidates], k - 1)[:k]]
+            # Best first, ties to the earlier exercise
+            best = candidates[np.lexsort((candidates, -similarity[candidates]))]
+            neighbors[i, :len(best)] = best
+            scores[i, :len(best)] = similarity[best]
+        return cls(neighbors, scores)
+
+    def similar(self, position, k=None):
+        """
+        The exercises most similar to the one at position.
+
+        Returns:
+            List of (position, similarity) tuples, best first
+        """
+        row = self.neighbors[position, :k]
+        found = row >= 0
+        return list(zip(row[found].tolist(), self.scores[position, :k][found].tolist()))
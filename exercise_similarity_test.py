@@ -0,0 +1,73 @@
+#############################################################################
+# exercise_similarity_test.py
+#
+# This file contains tests for exercise_similarity.py.
+#############################################################################
+import random
+import unittest
+import numpy as np
+from exercise_similarity import SimilarityIndex, exercise_features
+
+EXERCISES = [
+    {"name": "Barbell Bench Press", "type": "strength", "muscle": "chest", "equipment": "barbell", "difficulty": "intermediate"},
+    {"name": "Dumbbell Bench Press", "type": "strength", "muscle": "chest", "equipment": "dumbbell", "difficulty": "intermediate"},
+    {"name": "Push-Up", "type": "strength", "muscle": "chest", "equipment": "body_only", "difficulty": "beginner"},
+    {"name": "Barbell Curl", "type": "strength", "muscle": "biceps", "equipment": "barbell", "difficulty": "beginner"},
+    {"name": "Jump Rope", "type": "cardio", "muscle": "calves", "equipment": "other", "difficulty": "expert"},
+]
+
+
+def dense_similarity(exercises):
+    """Cosine similarities from the dense feature matrix, to compare against."""
+    indptr, indices, data, num_features = exercise_features(exercises)
+    matrix = np.zeros((len(exercises), num_features))
+    for i in range(len(exercises)):
+        matrix[i, indices[indptr[i]:indptr[i + 1]]] = data[indptr[i]:indptr[i + 1]]
+    norms = np.linalg.norm(matrix, axis=1)
+    return matrix @ matrix.T / np.outer(norms, norms)
+
+
+class TestSimilarityIndex(unittest.TestCase):
+
+    def test_ranking(self):
+        """Tests that shared muscle, equipment and name words rank neighbors."""
+        index = SimilarityIndex.from_exercises(EXERCISES, k=3)
+        self.assertEqual([i for i, _ in index.similar(0)], [1, 2, 3])
+        # Push-Up shares the difficulty as well as the type
+        self.assertEqual([i for i, _ in index.similar(3)], [0, 2, 1])
+        self.assertEqual([i for i, _ in index.similar(0, k=1)], [1])
+        scores = [score for _, score in index.similar(0)]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_unrelated_exercises_have_no_neighbors(self):
+        """Tests padding when fewer exercises share any feature."""
+        index = SimilarityIndex.from_exercises(EXERCISES, k=3)
+        self.assertEqual(index.similar(4), [])
+        self.assertEqual(SimilarityIndex.from_exercises([], k=3).neighbors.shape, (0, 3))
+
+    def test_matches_dense_computation(self):
+        """Tests the sparse build against dense cosine similarities."""
+        rng = random.Random(5)
+        exercises = [
+            {
+                "name": f"{rng.choice(['Cable', 'Band', 'Barbell'])} {rng.choice(['Row', 'Fly', 'Press'])}",
+                "type": rng.choice(["strength", "cardio"]),
+                "muscle": rng.choice(["chest", "lats", "traps"]),
+                "equipment": rng.choice(["cable", "bands", ""]),
+                "difficulty": rng.choice(["beginner", "expert"]),
+            }
+            for _ in range(60)
+        ]
+        index = SimilarityIndex.from_exercises(exercises, k=4)
+        expected = dense_similarity(exercises)
+        for i in range(len(exercises)):
+            row = expected[i].copy()
+            row[i] = 0
+            best_scores = sorted(row, reverse=True)[:4]
+            np.testing.assert_allclose([score for _, score in index.similar(i)], best_scores)
+            for j, score in index.similar(i):
+                self.assertAlmostEqual(expected[i, j], score)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,12 @@
 import streamlit as st
-import requests
-import os
-from data_fetcher import get_user_favorites, add_favorite, remove_favorite
+from data_fetcher import get_exercise_recommendations
+from exercise_api import get_pager, stats_summary
+from exercise_catalog import DIFFICULTIES, EXERCISE_TYPES, MUSCLES, ExerciseCatalog, get_catalog
+from favorites import get_favorites
+from user_session import get_user_id
 
-user_id = "user1"
-
-API_KEY = os.getenv("API_KEY")
-API_URL = "https://api.api-ninjas.com/v1/exercises"
+# Exercises shown at first and added by each "Load more" click
+RESULTS_PAGE_SIZE = 20
 
 st.title("🏋️ Exercise Explorer")
 
@@ -14,21 +14,20 @@ st.title("🏋️ Exercise Explorer")
 def format_label(s): return s.replace("_", " ").title()
 def unformat_label(s): return s.lower().replace(" ", "_")
 
-type_options_raw = [
-    "cardio", "olympic_weightlifting", "plyometrics",
-    "powerlifting", "strength", "stretching", "strongman"
-]
-muscle_options_raw = [
-    "abdominals", "abductors", "adductors", "biceps", "calves", "chest", 
-    "forearms", "glutes", "hamstrings", "lats", "lower_back", "middle_back", 
-    "neck", "quadriceps", "traps", "triceps"
-]
-difficulty_options_raw = ["beginner", "intermediate", "expert"]
+type_options_raw = EXERCISE_TYPES
+muscle_options_raw = MUSCLES
+difficulty_options_raw = DIFFICULTIES
+
+# Local snapshot of every exercise, indexed for the sidebar filters. Never
+# waits for the API: a missing or stale snapshot is refreshed in the background
+catalog = get_catalog()
+equipment_options_raw = catalog.values("equipment")
 
 # Display-friendly labels
 type_options = [format_label(t) for t in type_options_raw]
 muscle_options = [format_label(m) for m in muscle_options_raw]
 difficulty_options = [format_label(d) for d in difficulty_options_raw]
+equipment_options = [format_label(e) for e in equipment_options_raw]
 
 with st.sidebar:
     st.header("🔎 Filter Exercises")
@@ -36,6 +35,7 @@ with st.sidebar:
 
     selected_type_label = st.selectbox("Type", ["All"] + type_options)
     selected_muscle_label = st.selectbox("Muscle", ["All"] + muscle_options)
+    selected_equipment_label = st.selectbox("Equipment", ["All"] + equipment_options)
     selected_difficulty_labels = st.multiselect(
         "Difficulty", difficulty_options, default=[]
     )
@@ -43,57 +43,28 @@ with st.sidebar:
 # Convert labels back to raw values for API query
 selected_type = unformat_label(selected_type_label) if selected_type_label != "All" else None
 selected_muscle = unformat_label(selected_muscle_label) if selected_muscle_label != "All" else None
+selected_equipment = unformat_label(selected_equipment_label) if selected_equipment_label != "All" else None
 selected_difficulties = [unformat_label(d) for d in selected_difficulty_labels]
 
-@st.cache_data(show_spinner=True)
-def fetch_exercises(name=None, type_=None, muscle=None, difficulty=None):
-    params = {}
-    if name:
-        params["name"] = name
-    if type_:
-        params["type"] = type_
-    if muscle:
-        params["muscle"] = muscle
-    if difficulty:
-        results = []
-        for d in difficulty:
-            params["difficulty"] = d
-            response = requests.get(API_URL, headers={"X-Api-Key": API_KEY}, params=params)
-            if response.status_code == 200:
-                results.extend(response.json())
-        return results
-    else:
-        response = requests.get(API_URL, headers={"X-Api-Key": API_KEY}, params=params)
-        if response.status_code == 200:
-            return response.json()
-    return []
-
 def toggle_favorite(exercise):
-    """Toggle favorite status for a given exercise."""
-    favorites = get_user_favorites(user_id)
-    # Check if the exercise is already a favorite by name
-    if any(fav["name"] == exercise["name"] for fav in favorites):
-        remove_favorite(user_id, exercise["name"])
-    else:
-        add_favorite(user_id, exercise)
+    """Toggle favorite status for a given exercise (saved in the background)."""
+    get_favorites(get_user_id()).toggle(exercise)
     st.rerun()  # Refresh the page to update favorites
 
 def is_favorite(exercise_name):
-    """Check if a given exercise is a favorite."""
-    favorites = get_user_favorites(user_id)
-    return any(fav["name"] == exercise_name for fav in favorites)
-
-def filter_exercises(exercises, name_query, type_filter, muscle_filter, difficulty_filters):
-    filtered = exercises
-    if name_query:
-        filtered = [ex for ex in filtered if name_query.lower() in ex["name"].lower()]
-    if type_filter:
-        filtered = [ex for ex in filtered if type_filter.lower() == ex["type"].lower()]
-    if muscle_filter:
-        filtered = [ex for ex in filtered if muscle_filter.lower() == ex["muscle"].lower()]
-    if difficulty_filters:
-        filtered = [ex for ex in filtered if ex["difficulty"].lower() in difficulty_filters]
-    return filtered
+    """Check if a given exercise is a favorite, without a remote call."""
+    return exercise_name in get_favorites(get_user_id())
+
+def filter_exercises(exercises, name_query, type_filter, muscle_filter, difficulty_filters, equipment_filter=None, limit=None):
+    """Filter a list of exercises like the Search tab, ranking name matches."""
+    return ExerciseCatalog(exercises).query(
+        name=name_query,
+        type_=type_filter,
+        muscle=muscle_filter,
+        equipment=equipment_filter,
+        difficulty=difficulty_filters,
+        limit=limit
+    )
 
 def render_exercise_card(ex, index):
     cols = st.columns([0.9, 0.1])
@@ -103,6 +74,17 @@ def render_exercise_card(ex, index):
         st.markdown(f"**Equipment:** {format_label(ex['equipment'])} | **Difficulty:** {format_label(ex['difficulty'])}")
         with st.expander("📋 Instructions"):
             st.write(ex["instructions"])
+        # Precomputed when the catalog was loaded, so no API call
+        similar = catalog.similar(ex["name"])
+        if similar:
+            with st.expander("🔁 Similar exercises"):
+                for other in similar:
+                    st.markdown(f"- **{other['name']}** ({format_label(other['muscle'])}, {format_label(other['equipment'])}, {format_label(other['difficulty'])})")
+        also_favorited = get_exercise_recommendations().recommend(ex["name"])
+        if also_favorited:
+            with st.expander("👥 People who favorited this also favorited"):
+                for name, _ in also_favorited:
+                    st.markdown(f"- **{name}**")
     with cols[1]:
         is_fav = is_favorite(ex["name"])
         # Use a unique key for the button by including the index
@@ -110,35 +92,82 @@ def render_exercise_card(ex, index):
             toggle_favorite(ex)
     st.markdown("---")
 
+def shown_count(tab):
+    """
+    How many results to show, growing with each "Load more" click and
+    starting over when the tab or any filter changes.
+    """
+    search_key = (tab, search_query, selected_type, selected_muscle, selected_equipment, tuple(selected_difficulties))
+    if st.session_state.get("exercise_search_key") != search_key:
+        st.session_state.exercise_search_key = search_key
+        st.session_state.exercise_results_shown = RESULTS_PAGE_SIZE
+    return st.session_state.exercise_results_shown
+
+def load_more_button(has_more):
+    if has_more and st.button("Load more", key="load_more_exercises"):
+        st.session_state.exercise_results_shown += RESULTS_PAGE_SIZE
+        st.rerun()
+
 selected_tab = st.sidebar.radio("Choose a Tab", ["Search", "Favorites"])
 
+# Query cache and API revalidation counters for operators, as of the last rerun
+with st.sidebar.expander("Exercise API stats"):
+    st.caption(stats_summary())
+shown = shown_count(selected_tab)
+
 if selected_tab == "Search":
-    results = fetch_exercises(
-        name=search_query,
-        type_=selected_type,
-        muscle=selected_muscle,
-        difficulty=selected_difficulties
-    )
+    if len(catalog) > 0:
+        matches = catalog.query(
+            name=search_query,
+            type_=selected_type,
+            muscle=selected_muscle,
+            equipment=selected_equipment,
+            difficulty=selected_difficulties
+        )
+        results = matches[:shown]
+        has_more = len(matches) > shown
+        st.markdown(f"### Found {len(matches)} exercise(s)")
+    else:
+        # No snapshot has been taken yet, so page through the API results
+        # (narrower searches reuse cached results)
+        pager_key = (search_query, selected_type, selected_muscle, tuple(selected_difficulties))
+        if st.session_state.get("exercise_pager_key") != pager_key:
+            st.session_state.exercise_pager_key = pager_key
+            st.session_state.exercise_pager = get_pager(
+                name=search_query,
+                type_=selected_type,
+                muscle=selected_muscle,
+                difficulty=selected_difficulties
+            )
+        pager = st.session_state.exercise_pager
+        results = pager.load(shown)
+        has_more = pager.has_more(shown)
+        if pager.exhausted:
+            st.markdown(f"### Found {len(pager.exercises)} exercise(s)")
+        else:
+            st.markdown(f"### Showing {len(results)} exercise(s), more available")
 
-    st.markdown(f"### Found {len(results)} exercise(s)")
     for index, ex in enumerate(results):
         render_exercise_card(ex, index)
+    load_more_button(has_more)
 
 elif selected_tab == "Favorites":
-    favorites = get_user_favorites(user_id)
+    favorites = get_favorites(get_user_id()).list()
     filtered_favorites = filter_exercises(
         favorites,
         search_query,
         selected_type,
         selected_muscle,
-        selected_difficulties
+        selected_difficulties,
+        selected_equipment
     )
 
     st.markdown(f"### Found {len(filtered_favorites)} favorite(s)")
 
     if filtered_favorites:
-        for index, ex in enumerate(filtered_favorites):
+        for index, ex in enumerate(filtered_favorites[:shown]):
             render_exercise_card(ex, index)
+        load_more_button(len(filtered_favorites) > shown)
     else:
         if len(favorites) > 0:
-            st.info("No favorites match the filters yet. Try adjusting your filters!")
\ No newline at end of file
+            st.info("No favorites match the filters yet. Try adjusting your filters!")
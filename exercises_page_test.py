@@ -1,6 +1,15 @@
+import json
 import unittest
 from unittest.mock import patch, MagicMock
-from exercises_page import filter_exercises, is_favorite, toggle_favorite
+import streamlit as st
+from exercise_catalog import ExerciseCatalog
+from exercise_recommender import ItemRecommendations
+
+# Importing the page runs it, so keep it from loading the real catalog
+with patch('exercise_catalog.get_catalog', return_value=ExerciseCatalog([])):
+    from exercises_page import filter_exercises, is_favorite, toggle_favorite
+from favorites import get_favorites
+from user_session import set_user_id
 
 user_id = "user1"
 
@@ -8,9 +17,9 @@ class TestExercisePage(unittest.TestCase):
 
     def test_filter_exercises(self):
         exercises = [
-            {"name": "Push Up", "type": "strength", "muscle": "chest", "difficulty": "beginner"},
-            {"name": "Jogging", "type": "cardio", "muscle": "legs", "difficulty": "intermediate"},
-            {"name": "Deadlift", "type": "strength", "muscle": "back", "difficulty": "expert"}
+            {"name": "Push Up", "type": "strength", "muscle": "chest", "equipment": "body_only", "difficulty": "beginner"},
+            {"name": "Jogging", "type": "cardio", "muscle": "legs", "equipment": "body_only", "difficulty": "intermediate"},
+            {"name": "Deadlift", "type": "strength", "muscle": "back", "equipment": "barbell", "difficulty": "expert"}
         ]
 
         # Filter by name
@@ -37,37 +46,66 @@ class TestExercisePage(unittest.TestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0]['name'], "Deadlift")
 
-    @patch('exercises_page.get_user_favorites')
+        # Filter by equipment, as picked in the sidebar
+        result = filter_exercises(exercises, "", None, None, [], "barbell")
+        self.assertEqual([ex['name'] for ex in result], ["Deadlift"])
+        result = filter_exercises(exercises, "", "strength", None, [], "body_only")
+        self.assertEqual([ex['name'] for ex in result], ["Push Up"])
+
+    def setUp(self):
+        st.session_state.clear()
+        set_user_id(user_id)
+        patcher = patch('data_fetcher.get_exercise_recommendations', return_value=ItemRecommendations())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('data_fetcher.get_user_favorites')
     def test_is_favorite_true(self, mock_get_user_favorites):
         mock_get_user_favorites.return_value = [{"name": "Squat"}, {"name": "Push Up"}]
         self.assertTrue(is_favorite("Push Up"))
 
-    @patch('exercises_page.get_user_favorites')
+    @patch('data_fetcher.get_user_favorites')
     def test_is_favorite_false(self, mock_get_user_favorites):
         mock_get_user_favorites.return_value = [{"name": "Squat"}, {"name": "Bench Press"}]
         self.assertFalse(is_favorite("Deadlift"))
 
+    @patch('data_fetcher.get_user_favorites')
+    def test_is_favorite_loads_favorites_once(self, mock_get_user_favorites):
+        mock_get_user_favorites.return_value = [{"name": "Squat"}]
+        for name in ["Squat", "Push Up", "Deadlift"] * 5:
+            is_favorite(name)
+        mock_get_user_favorites.assert_called_once_with(user_id)
+
+    @patch('data_fetcher.get_user_favorites')
+    def test_is_favorite_uses_session_user(self, mock_get_user_favorites):
+        mock_get_user_favorites.return_value = []
+        set_user_id("user2")
+        self.assertFalse(is_favorite("Squat"))
+        mock_get_user_favorites.assert_called_once_with("user2")
+
     @patch('exercises_page.st.rerun')
-    @patch('exercises_page.remove_favorite')
-    @patch('exercises_page.add_favorite')
-    @patch('exercises_page.get_user_favorites')
-    def test_toggle_favorite_adds_new(self, mock_get_user_favorites, mock_add_favorite, mock_remove_favorite, mock_rerun):
+    @patch('data_fetcher.append_favorite_events')
+    @patch('data_fetcher.get_user_favorites')
+    def test_toggle_favorite_adds_new(self, mock_get_user_favorites, mock_append_favorite_events, mock_rerun):
         mock_get_user_favorites.return_value = [{"name": "Push Up"}]
         new_ex = {"name": "Squat"}
         toggle_favorite(new_ex)
-        mock_add_favorite.assert_called_once_with(user_id, new_ex)
-        mock_remove_favorite.assert_not_called()
+        self.assertTrue(is_favorite("Squat"))
+        get_favorites(user_id).flush(5)
+        (event,), = mock_append_favorite_events.call_args[0]
+        self.assertEqual((event["UserId"], event["Action"], json.loads(event["Exercise"])), (user_id, "add", new_ex))
         mock_rerun.assert_called_once()
 
     @patch('exercises_page.st.rerun')
-    @patch('exercises_page.remove_favorite')
-    @patch('exercises_page.add_favorite')
-    @patch('exercises_page.get_user_favorites')
-    def test_toggle_favorite_removes_existing(self, mock_get_user_favorites, mock_add_favorite, mock_remove_favorite, mock_rerun):
+    @patch('data_fetcher.append_favorite_events')
+    @patch('data_fetcher.get_user_favorites')
+    def test_toggle_favorite_removes_existing(self, mock_get_user_favorites, mock_append_favorite_events, mock_rerun):
         mock_get_user_favorites.return_value = [{"name": "Push Up"}]
         toggle_favorite({"name": "Push Up"})
-        mock_remove_favorite.assert_called_once_with(user_id, "Push Up")
-        mock_add_favorite.assert_not_called()
+        self.assertFalse(is_favorite("Push Up"))
+        get_favorites(user_id).flush(5)
+        (event,), = mock_append_favorite_events.call_args[0]
+        self.assertEqual((event["UserId"], event["Action"], event["ExerciseName"]), (user_id, "remove", "Push Up"))
         mock_rerun.assert_called_once()
 
 if __name__ == '__main__':
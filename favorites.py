@@ -0,0 +1,159 @@
+#############################################################################
+# favorites.py
+#
+# This file contains the current session's favorite exercises. They are
+# loaded once per session into a set keyed by exercise name, so checking
+# whether a card is a favorite makes no remote call. Toggling a favorite
+# updates the set right away and appends an add or remove event to a
+# process-wide buffer. The buffer is written to the FavoriteEvents log in
+# batches by one worker thread, so events land in the order they were made.
+# The in-memory "also favorited" counts are updated on the same thread, so a
+# toggle never waits for them to be loaded.
+#############################################################################
+
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import data_fetcher
+
+FAVORITES_KEY = "favorites"
+# Events are written at most this long after a toggle...
+FAVORITE_FLUSH_SECONDS = 2.0
+# ...or as soon as this many are waiting
+FAVORITE_BATCH_SIZE = 100
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="favorites-writer")
+
+
+class FavoriteEventBuffer:
+    """
+    Favorite events waiting to be written, flushed in batches.
+    """
+
+    def __init__(self, flush_seconds=FAVORITE_FLUSH_SECONDS, batch_size=FAVORITE_BATCH_SIZE):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.events = []
+        self.lock = threading.Lock()
+        self.scheduled = False
+
+    def append(self, event):
+        """Queue an event; the first event of a batch schedules its write."""
+        with self.lock:
+            self.events.append(event)
+            if len(self.events) >= self.batch_size:
+                _writer.submit(self.write_batch)
+            elif not self.scheduled:
+                self.scheduled = True
+                timer = threading.Timer(self.flush_seconds, self._timer_fired)
+                timer.daemon = True
+                timer.start()
+
+    def _timer_fired(self):
+        try:
+            _writer.submit(self.write_batch)
+        except RuntimeError:
+            # The interpreter is exiting; the atexit hook writes what is left
+            pass
+
+    def write_batch(self):
+        """Write every queued event in one insert (runs on the writer thread)."""
+        with self.lock:
+            batch, self.events = self.events, []
+            self.scheduled = False
+        if not batch:
+            return
+        try:
+            data_fetcher.append_favorite_events(batch)
+        except Exception as e:
+            print(f"Error saving {len(batch)} favorite events: {e}")
+
+    def flush(self, timeout=None):
+        """Write the queued events now and wait for every write so far."""
+        _writer.submit(self.write_batch).result(timeout)
+
+
+def _update_recommendations(action, other_favorites, exercise_name):
+    # Runs on the writer thread; the first call may load the recommendations
+    try:
+        recommendations = data_fetcher.get_exercise_recommendations()
+        if action == "add":
+            recommendations.add_favorite(other_favorites, exercise_name)
+        else:
+            recommendations.remove_favorite(other_favorites, exercise_name)
+    except Exception as e:
+        print(f"Error updating exercise recommendations: {e}")
+
+
+event_buffer = FavoriteEventBuffer()
+# Anything queued after the writer thread stopped is written on exit
+atexit.register(event_buffer.write_batch)
+
+
+class FavoritesSet:
+    """
+    A user's favorite exercises, keyed by name.
+    """
+
+    def __init__(self, user_id, favorites):
+        self.user_id = user_id
+        # Exercise name -> exercise dictionary, in the order they were added
+        self.exercises = {favorite["name"]: favorite for favorite in favorites}
+
+    def __contains__(self, exercise_name):
+        return exercise_name in self.exercises
+
+    def __len__(self):
+        return len(self.exercises)
+
+    def list(self):
+        """The favorite exercise dictionaries."""
+        return list(self.exercises.values())
+
+    def add(self, exercise):
+        if exercise["name"] in self.exercises:
+            return
+        _writer.submit(_update_recommendations, "add", list(self.exercises), exercise["name"])
+        self.exercises[exercise["name"]] = exercise
+        event_buffer.append(data_fetcher.favorite_event(self.user_id, exercise["name"], "add", exercise))
+
+    def remove(self, exercise_name):
+        if self.exercises.pop(exercise_name, None) is None:
+            return
+        _writer.submit(_update_recommendations, "remove", list(self.exercises), exercise_name)
+        event_buffer.append(data_fetcher.favorite_event(self.user_id, exercise_name, "remove"))
+
+    def toggle(self, exercise):
+        """
+        Add or remove a favorite.
+
+        Returns:
+            True if the exercise is now a favorite
+        """
+        if exercise["name"] in self.exercises:
+            self.remove(exercise["name"])
+            return False
+        self.add(exercise)
+        return True
+
+    def flush(self, timeout=None):
+        """Write the queued favorite events and recommendation updates and wait for them."""
+        event_buffer.flush(timeout)
+
+
+def get_favorites(user_id):
+    """
+    The session's favorites for a user, loaded on the first call.
+
+    Args:
+        user_id: The signed-in user's ID
+
+    Returns:
+        FavoritesSet kept in st.session_state
+    """
+    favorites = st.session_state.get(FAVORITES_KEY)
+    if favorites is None or favorites.user_id != user_id:
+        favorites = FavoritesSet(user_id, data_fetcher.get_user_favorites(user_id))
+        st.session_state[FAVORITES_KEY] = favorites
+    return favorites
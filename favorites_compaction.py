@@ -0,0 +1,40 @@
+#############################################################################
+# favorites_compaction.py
+#
+# This file contains the command that maintains the favorites event log.
+# Toggling a favorite appends an add or remove event to FavoriteEvents;
+# reads go through the FavoritesCurrent view, which combines the compacted
+# FavoritesSnapshot with the events since the last compaction. Compacting
+# regularly keeps the view's share of raw events small:
+#
+#   $ python favorites_compaction.py --create     # once, imports Favorites
+#   $ python favorites_compaction.py --compact    # e.g. every hour
+#############################################################################
+
+import argparse
+import datetime
+from data_fetcher import compact_favorites, create_favorites_log, FAVORITES_SNAPSHOT_TABLE, FAVORITES_VIEW
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the favorites event log.")
+    parser.add_argument("--create", action="store_true",
+                        help="Create the event log, snapshot and view, importing the Favorites table")
+    parser.add_argument("--compact", action="store_true",
+                        help="Fold old events into the snapshot and delete compacted events")
+    parser.add_argument("--margin-minutes", type=int, default=60,
+                        help="Only compact events at least this old")
+    args = parser.parse_args()
+
+    if args.create:
+        create_favorites_log()
+        print(f"Created the favorites event log; favorites are read from {FAVORITES_VIEW}.")
+    elif args.compact:
+        compact_favorites(datetime.timedelta(minutes=args.margin_minutes))
+        print(f"Compacted favorite events older than {args.margin_minutes} minutes into {FAVORITES_SNAPSHOT_TABLE}.")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#############################################################################
+# favorites_test.py
+#
+# This file contains tests for favorites.py.
+#############################################################################
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import streamlit as st
+import favorites
+from exercise_recommender import ItemRecommendations
+from favorites import FavoritesSet, get_favorites
+
+
+def written_events(mock_append):
+    """(action, exercise name) of every event written, in order."""
+    return [(event["Action"], event["ExerciseName"]) for call in mock_append.call_args_list for event in call[0][0]]
+
+
+@patch('data_fetcher.append_favorite_events')
+@patch('data_fetcher.get_user_favorites')
+class TestFavorites(unittest.TestCase):
+
+    def setUp(self):
+        st.session_state.clear()
+        favorites.event_buffer.flush_seconds = 0.05
+        self.recommendations = ItemRecommendations()
+        patcher = patch('data_fetcher.get_exercise_recommendations', return_value=self.recommendations)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        favorites.event_buffer.flush_seconds = favorites.FAVORITE_FLUSH_SECONDS
+
+    def test_loaded_once_per_session(self, mock_get_user_favorites, mock_append):
+        """Tests that membership checks reuse the favorites loaded first."""
+        mock_get_user_favorites.return_value = [{"name": "Squat"}, {"name": "Push Up"}]
+
+        for _ in range(10):
+            self.assertIn("Push Up", get_favorites("user1"))
+            self.assertNotIn("Deadlift", get_favorites("user1"))
+        mock_get_user_favorites.assert_called_once_with("user1")
+
+        # Another user is loaded separately
+        get_favorites("user2")
+        self.assertEqual(mock_get_user_favorites.call_count, 2)
+
+    def test_toggles_are_optimistic(self, mock_get_user_favorites, mock_append):
+        """Tests that toggles update the set at once and are written later, in order."""
+        mock_get_user_favorites.return_value = [{"name": "Push Up"}]
+        release = threading.Event()
+        mock_append.side_effect = lambda events: release.wait(5)
+
+        favorites_set = get_favorites("user1")
+        self.assertTrue(favorites_set.toggle({"name": "Squat"}))
+        self.assertFalse(favorites_set.toggle({"name": "Squat"}))
+        self.assertFalse(favorites_set.toggle({"name": "Push Up"}))
+
+        # The set changed before any write finished
+        self.assertEqual(favorites_set.list(), [])
+
+        release.set()
+        favorites_set.flush(5)
+        self.assertEqual(
+            written_events(mock_append),
+            [("add", "Squat"), ("remove", "Squat"), ("remove", "Push Up")]
+        )
+
+    def test_events_are_batched(self, mock_get_user_favorites, mock_append):
+        """Tests that quick toggles share one write and full batches go at once."""
+        favorites_set = FavoritesSet("user1", [])
+        for i in range(5):
+            favorites_set.add({"name": f"Exercise {i}"})
+        # Written by the timer, not by flush
+        deadline = time.monotonic() + 5
+        while not mock_append.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(mock_append.call_count, 1)
+        self.assertEqual(len(mock_append.call_args[0][0]), 5)
+
+        # A full batch is written without waiting for the timer
+        buffer = favorites.FavoriteEventBuffer(flush_seconds=60, batch_size=3)
+        for i in range(3):
+            buffer.append({"Action": "add", "ExerciseName": f"Exercise {i}"})
+        favorites._writer.submit(lambda: None).result(5)
+        self.assertEqual(mock_append.call_count, 2)
+        self.assertEqual(buffer.events, [])
+
+    def test_write_errors_are_reported(self, mock_get_user_favorites, mock_append):
+        """Tests that a failed batch is printed and later batches still go out."""
+        mock_append.side_effect = [RuntimeError("quota"), None]
+        favorites_set = FavoritesSet("user1", [])
+        with patch('builtins.print') as mock_print:
+            favorites_set.add({"name": "Squat"})
+            favorites_set.flush(5)
+        self.assertIn("quota", mock_print.call_args[0][0])
+
+        favorites_set.remove("Squat")
+        favorites_set.flush(5)
+        self.assertEqual(written_events(mock_append), [("add", "Squat"), ("remove", "Squat")])
+
+    def test_toggles_update_recommendations(self, mock_get_user_favorites, mock_append):
+        """Tests that toggles update the in-memory "also favorited" counts in the background."""
+        favorites_set = FavoritesSet("user1", [{"name": "Squat"}])
+        favorites_set.add({"name": "Lunge"})
+        favorites_set.flush(5)
+        self.assertEqual([name for name, _ in self.recommendations.recommend("Squat")], ["Lunge"])
+        favorites_set.remove("Squat")
+        favorites_set.flush(5)
+        self.assertEqual(self.recommendations.recommend("Lunge"), [])
+
+    def test_toggles_do_not_wait_for_recommendations(self, mock_get_user_favorites, mock_append):
+        """Tests that a toggle returns while the recommendations are still loading."""
+        loaded = threading.Event()
+        with patch('data_fetcher.get_exercise_recommendations', side_effect=lambda: loaded.wait(5) and self.recommendations):
+            favorites_set = FavoritesSet("user1", [{"name": "Squat"}])
+            self.assertTrue(favorites_set.toggle({"name": "Lunge"}))
+            self.assertIn("Lunge", favorites_set)
+            loaded.set()
+            favorites_set.flush(5)
+        self.assertEqual([name for name, _ in self.recommendations.recommend("Squat")], ["Lunge"])
+
+    def test_repeated_add_and_remove_write_nothing(self, mock_get_user_favorites, mock_append):
+        """Tests that adding a favorite twice or removing a missing one is a no-op."""
+        favorites_set = FavoritesSet("user1", [{"name": "Squat"}])
+        favorites_set.add({"name": "Squat"})
+        favorites_set.remove("Deadlift")
+        favorites_set.flush(5)
+        mock_append.assert_not_called()
+        self.assertEqual(len(favorites_set), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#############################################################################
+# friend_graph.py
+#
+# This file contains an in-memory index of the friend graph in compressed
+# sparse row (CSR) form, so friend lists, mutual friend counts and
+# friend suggestions don't need a query against the Friends table.
+#############################################################################
+
+import numpy as np
+
+
+class FriendGraph:
+    """
+    Undirected friend graph stored as CSR adjacency arrays.
+
+    Users are numbered 0..n-1 and the friends of user i are
+    indices[indptr[i]:indptr[i + 1]], kept sorted so mutual friends are a
+    sorted-array intersection. Friendships added or removed after the bulk
+    load go to a small overlay that is folded into the arrays once it grows
+    past compact_threshold changes.
+    """
+
+    def __init__(self, user_ids=(), indptr=None, indices=None, compact_threshold=1024):
+        self.user_ids = list(user_ids)
+        self._number = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self.indptr = indptr if indptr is not None else np.zeros(len(self.user_ids) + 1, dtype=np.int64)
+        self.indices = indices if indices is not None else np.zeros(0, dtype=np.int64)
+        self.compact_threshold = compact_threshold
+        self._added = {}
+        self._removed = {}
+        self._changes = 0
+
+    @classmethod
+    def from_pairs(cls, pairs, compact_threshold=1024):
+        """
+        Build the index from (UserId1, UserId2) friendship rows in bulk.
+
+        Self-friendships and duplicate rows (in either direction) are ignored.
+
+        Returns:
+            FriendGraph
+        """
+        user_ids = sorted({user_id for pair in pairs for user_id in pair})
+        number = {user_id: i for i, user_id in enumerate(user_ids)}
+
+        edges = np.array([(number[a], number[b]) for a, b in pairs if a != b], dtype=np.int64).reshape(-1, 2)
+        # Store both directions, then sort by (row, column) and drop duplicates
+        rows = np.concatenate([edges[:, 0], edges[:, 1]])
+        columns = np.concatenate([edges[:, 1], edges[:, 0]])
+        keys = np.unique(rows * max(len(user_ids), 1) + columns)
+        rows, columns = np.divmod(keys, max(len(user_ids), 1))
+
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(user_ids)), out=indptr[1:])
+        return cls(user_ids, indptr, columns.astype(np.int64), compact_threshold)
+
+    def __contains__(self, user_id):
+        return user_id in self._number
+
+    def _neighbors(self, number):
+        # Sorted friend numbers of one user, including overlay changes
+        if number < len(self.indptr) - 1:
+            neighbors = self.indices[self.indptr[number]:self.indptr[number + 1]]
+        else:
+            # Users first seen in the overlay have no row yet
+            neighbors = self.indices[:0]
+        added = self._added.get(number)
+        removed = self._removed.get(number)
+        if added:
+            neighbors = np.union1d(neighbors, np.fromiter(added, dtype=np.int64))
+        if removed:
+            neighbors = np.setdiff1d(neighbors, np.fromiter(removed, dtype=np.int64), assume_unique=True)
+        return neighbors
+
+    def _user_number(self, user_id, create=False):
+        if user_id not in self._number:
+            if not create:
+                return None
+            self._number[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return self._number[user_id]
+
+    def friends(self, user_id):
+        """
+        A user's friends.
+
+        Returns:
+            Sorted list of friend user_ids (empty for unknown users)
+        """
+        number = self._user_number(user_id)
+        if number is None:
+            return []
+        return sorted(self.user_ids[i] for i in self._neighbors(number))
+
+    def are_friends(self, user_id, other_id):
+        """Whether two users are friends."""
+        number, other = self._user_number(user_id), self._user_number(other_id)
+        if number is None or other is None:
+            return False
+        neighbors = self._neighbors(number)
+        position = np.searchsorted(neighbors, other)
+        return bool(position < len(neighbors) and neighbors[position] == other)
+
+    def mutual_friends_count(self, user_id, other_id):
+        """Number of friends two users have in common."""
+        number, other = self._user_number(user_id), self._user_number(other_id)
+        if number is None or other is None:
+            return 0
+        return len(np.intersect1d(self._neighbors(number), self._neighbors(other), assume_unique=True))
+
+    def suggestions(self, user_id, k=5):
+        """
+        Friends of friends ranked by how many mutual friends they share.
+
+        Args:
+            user_id: The user to suggest friends for
+            k: Maximum number of suggestions
+
+        Returns:
+            List of (user_id, mutual friends) tuples, most mutual friends
+            first and ties by user_id
+        """
+        number = self._user_number(user_id)
+        if number is None:
+            return []
+        friends = self._neighbors(number)
+        if len(friends) == 0:
+            return []
+
+        # Count how often each user appears among the friends' friends
+        reached = np.concatenate([self._neighbors(friend) for friend in friends])
+        counts = np.bincount(reached, minlength=len(self.user_ids))
+        counts[number] = 0
+        counts[friends] = 0
+
+        candidates = np.flatnonzero(counts)
+        ranked = sorted(candidates, key=lambda i: (-counts[i], self.user_ids[i]))[:k]
+        return [(self.user_ids[i], int(counts[i])) for i in ranked]
+
+    def _in_arrays(self, number, other):
+        # Whether the bulk-loaded arrays (ignoring the overlay) hold the friendship
+        if number >= len(self.indptr) - 1:
+            return False
+        row = self.indices[self.indptr[number]:self.indptr[number + 1]]
+        position = np.searchsorted(row, other)
+        return bool(position < len(row) and row[position] == other)
+
+    def add_friendship(self, user_id, other_id):
+        """Add a friendship without rebuilding the arrays."""
+        if user_id == other_id:
+            return
+        number, other = self._user_number(user_id, create=True), self._user_number(other_id, create=True)
+        # The overlay only records differences from the arrays
+        for a, b in ((number, other), (other, number)):
+            if self._in_arrays(a, b):
+                self._removed.get(a, set()).discard(b)
+            else:
+                self._added.setdefault(a, set()).add(b)
+        self._record_change()
+
+    def remove_friendship(self, user_id, other_id):
+        """Remove a friendship without rebuilding the arrays."""
+        number, other = self._user_number(user_id), self._user_number(other_id)
+        if number is None or other is None:
+            return
+        for a, b in ((number, other), (other, number)):
+            if self._in_arrays(a, b):
+                self._removed.setdefault(a, set()).add(b)
+            else:
+                self._added.get(a, set()).discard(b)
+        self._record_change()
+
+    def _record_change(self):
+        self._changes += 1
+        if self._changes >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """Fold the overlay of added and removed friendships into the arrays."""
+        neighbors = [self._neighbors(number) for number in range(len(self.user_ids))]
+        indptr = np.zeros(len(self.user_ids) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in neighbors], out=indptr[1:])
+        self.indptr = indptr
+        self.indices = np.concatenate(neighbors).astype(np.int64) if neighbors else np.zeros(0, dtype=np.int64)
+        self._added.clear()
+        self._removed.clear()
+        self._changes = 0
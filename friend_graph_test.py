@@ -0,0 +1,100 @@
+#############################################################################
+# friend_graph_test.py
+#
+# This file contains tests for friend_graph.py.
+#############################################################################
+import random
+import unittest
+from friend_graph import FriendGraph
+
+PAIRS = [
+    ('user1', 'user2'), ('user1', 'user3'), ('user2', 'user3'), ('user2', 'user4'),
+    ('user3', 'user4'), ('user4', 'user5'), ('user3', 'user1'), ('user6', 'user6'),
+]
+
+
+class TestFriendGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = FriendGraph.from_pairs(PAIRS)
+
+    def test_friends(self):
+        """Tests friend lists, with duplicates and self-friendships dropped."""
+        self.assertEqual(self.graph.friends('user1'), ['user2', 'user3'])
+        self.assertEqual(self.graph.friends('user4'), ['user2', 'user3', 'user5'])
+        self.assertEqual(self.graph.friends('user6'), [])
+        self.assertEqual(self.graph.friends('nobody'), [])
+        self.assertTrue(self.graph.are_friends('user5', 'user4'))
+        self.assertFalse(self.graph.are_friends('user1', 'user4'))
+
+    def test_mutual_friends_and_suggestions(self):
+        """Tests mutual friend counts and friends-of-friends suggestions."""
+        self.assertEqual(self.graph.mutual_friends_count('user1', 'user4'), 2)
+        self.assertEqual(self.graph.mutual_friends_count('user1', 'user5'), 0)
+        self.assertEqual(self.graph.suggestions('user1'), [('user4', 2)])
+        self.assertEqual(self.graph.suggestions('user5'), [('user2', 1), ('user3', 1)])
+        self.assertEqual(self.graph.suggestions('user5', k=1), [('user2', 1)])
+        self.assertEqual(self.graph.suggestions('user6'), [])
+
+    def test_incremental_changes(self):
+        """Tests adding and removing friendships before and after compaction."""
+        self.graph.add_friendship('user1', 'user5')
+        self.graph.add_friendship('user7', 'user1')
+        self.graph.remove_friendship('user2', 'user3')
+        self.assertEqual(self.graph.friends('user1'), ['user2', 'user3', 'user5', 'user7'])
+        self.assertEqual(self.graph.friends('user7'), ['user1'])
+        self.assertEqual(self.graph.friends('user2'), ['user1', 'user4'])
+
+        self.graph.compact()
+        self.assertEqual(self.graph.friends('user1'), ['user2', 'user3', 'user5', 'user7'])
+        self.assertEqual(self.graph.friends('user3'), ['user1', 'user4'])
+        self.assertEqual(self.graph.suggestions('user7'), [('user2', 1), ('user3', 1), ('user5', 1)])
+
+    def test_add_then_remove_existing_friendship(self):
+        """Tests that re-adding a loaded friendship and then removing it ends the friendship."""
+        self.graph.add_friendship('user1', 'user2')
+        self.graph.remove_friendship('user1', 'user2')
+        self.assertFalse(self.graph.are_friends('user1', 'user2'))
+        self.assertEqual(self.graph.friends('user2'), ['user3', 'user4'])
+        self.graph.compact()
+        self.assertFalse(self.graph.are_friends('user2', 'user1'))
+
+    def test_remove_then_add_missing_friendship(self):
+        """Tests that removing a friendship that doesn't exist and then adding it makes them friends."""
+        self.graph.remove_friendship('user1', 'user4')
+        self.graph.add_friendship('user1', 'user4')
+        self.assertTrue(self.graph.are_friends('user1', 'user4'))
+        self.assertEqual(self.graph.friends('user4'), ['user1', 'user2', 'user3', 'user5'])
+        self.graph.compact()
+        self.assertTrue(self.graph.are_friends('user4', 'user1'))
+
+    def test_matches_set_based_graph(self):
+        """Tests random graphs and changes against plain Python sets."""
+        rng = random.Random(11)
+        users = [f"user{i}" for i in range(40)]
+        pairs = [tuple(rng.sample(users, 2)) for _ in range(150)]
+        graph = FriendGraph.from_pairs(pairs, compact_threshold=16)
+        expected = {user: set() for user in users}
+        for a, b in pairs:
+            expected[a].add(b)
+            expected[b].add(a)
+
+        for _ in range(200):
+            # Half of the changes repeat a loaded friendship, to exercise the overlay
+            a, b = rng.choice(pairs) if rng.random() < 0.5 else rng.sample(users, 2)
+            if rng.random() < 0.5:
+                graph.add_friendship(a, b)
+                expected[a].add(b)
+                expected[b].add(a)
+            else:
+                graph.remove_friendship(a, b)
+                expected[a].discard(b)
+                expected[b].discard(a)
+
+        for user in users:
+            self.assertEqual(graph.friends(user), sorted(expected[user]))
+        self.assertEqual(graph.mutual_friends_count('user0', 'user1'), len(expected['user0'] & expected['user1']))
+
+
+if __name__ == '__main__':
+    unittest.main()
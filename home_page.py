@@ -1,24 +1,24 @@
 import streamlit as st
 from modules import display_post, display_genai_advice, display_activity_summary, display_recent_workouts
-from data_fetcher import get_user_posts, get_genai_advice, get_user_profile, get_user_sensor_data, get_user_workouts, users
-import random
+from session_data import get_advice, get_posts, get_profile, get_workouts
+from user_session import get_user_id
 
-userId = random.choice(list(users.keys()))
-workout_data = get_user_workouts(userId)
+userId = get_user_id()
+workout_data = get_workouts(userId)
 st.title('Welcome to ISE!')
 col1, col2, col3 = st.columns(3, gap="small")
 with col1:
-    advice_data = get_genai_advice(userId)
+    advice_data = get_advice(userId)
     display_genai_advice(advice_data['timestamp'], advice_data['content'], advice_data['image'])
 
 with col2:
-    posts_data = get_user_posts(userId)
+    posts_data = get_posts(userId)
 
     if not posts_data:
         st.info("No posts available.")
     else:
         for post in posts_data:
-            user_profile = get_user_profile(post['user_id'])  # Fetch user details
+            user_profile = get_profile(post['user_id'])  # Fetch user details
 
             if user_profile:  # Ensure user profile exists
                 display_post(
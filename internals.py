@@ -4,10 +4,24 @@
 # This file contains internals for component templating. You do not need
 # to understand this file, but are welcome to read through it if you want.
 #
+# Each template is read and split into literal text and {{KEY}} placeholders
+# once, then cached until the file changes on disk, so rendering is a
+# single join of the pieces instead of one replace over the whole page per
+# key.
 #############################################################################
 
+import os
+import re
 import streamlit.components.v1 as components
 
+PLACEHOLDER = re.compile(r"\{\{(.*?)\}\}", re.DOTALL)
+
+# Quotes and backslashes are escaped with a backslash
+_ESCAPES = str.maketrans({"'": "\\'", '"': '\\"', '\\': '\\\\'})
+
+# Template path -> (modification time, CompiledTemplate)
+_templates = {}
+
 
 def load_html_file(file_path):
     # Read an html file
@@ -17,18 +31,68 @@ def load_html_file(file_path):
 
 def safe_string(string):
     # Make the string "safe" by escaping quotes and a backslash character
-    return ''.join(['\\' + c if c in ["'", '"', '\\'] else c for c in string])
+    return string.translate(_ESCAPES)
 
 
-def create_component(data, component_name, height=None, width=None, scrolling=False):
-    # Read the HTML content from the file
-    component_html = load_html_file(f'custom_components/{component_name}.html')
+class CompiledTemplate:
+    """
+    A template split into literal text and placeholder keys.
+
+    literals has one more entry than keys: the text before the first
+    placeholder, between each pair, and after the last.
+    """
+
+    def __init__(self, html):
+        pieces = PLACEHOLDER.split(html)
+        self.literals = pieces[0::2]
+        self.keys = pieces[1::2]
+
+    def render(self, data):
+        """
+        Fill the placeholders with escaped values from data. Placeholders
+        without a value are left as they are.
+        """
+        values = {str(key): safe_string(str(value)) for key, value in data.items()}
+        parts = [self.literals[0]]
+        for key, literal in zip(self.keys, self.literals[1:]):
+            parts.append(values[key] if key in values else "{{" + key + "}}")
+            parts.append(literal)
+        return ''.join(parts)
+
+
+def get_template(component_name):
+    """
+    The compiled template of a component, reloaded when its file changes.
+    """
+    file_path = f'custom_components/{component_name}.html'
+    modified = os.stat(file_path).st_mtime_ns
+    cached = _templates.get(file_path)
+    if cached is None or cached[0] != modified:
+        cached = (modified, CompiledTemplate(load_html_file(file_path)))
+        _templates[file_path] = cached
+    return cached[1]
 
-    # Replace the templates with the specified data
-    for key in data:
-        data_placeholder = "{{" + str(key) + "}}"
-        component_html = component_html.replace(
-            data_placeholder, safe_string(str(data[key])))
+
+def render_component(data, component_name):
+    """The HTML of one component instance."""
+    return get_template(component_name).render(data)
+
+
+def render_components(data_list, component_name):
+    """The HTML of many instances of a component, looking the template up once."""
+    template = get_template(component_name)
+    return [template.render(data) for data in data_list]
+
+
+def create_component(data, component_name, height=None, width=None, scrolling=False):
+    # Fill the cached template with the specified data
+    component_html = render_component(data, component_name)
 
     # Have streamlit render the component
     components.html(component_html, width, height, scrolling)
+
+
+def create_components(data_list, component_name, height=None, width=None, scrolling=False):
+    # Render every instance into one block of HTML, shown in a single frame
+    component_html = ''.join(render_components(data_list, component_name))
+    components.html(component_html, width, height, scrolling)
@@ -0,0 +1,46 @@
+#############################################################################
+# internals_benchmark.py
+#
+# This file compares rendering a component by reading the template and
+# running one replace per key (the original create_component) with the
+# cached, pre-split templates in internals.py:
+#
+#   $ python internals_benchmark.py --instances 10000
+#############################################################################
+
+import argparse
+
+import internals
+from benchmark_utils import best_of, legacy_render
+from internals import render_component, render_components
+
+COMPONENT = 'my_custom_component'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the original component templating against cached templates.")
+    parser.add_argument("--instances", type=int, default=10000, help="Number of component instances rendered")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per renderer (the best is reported)")
+    args = parser.parse_args()
+
+    rows = [{"NAME": f"User \"{i}\" O'Brien \\ {i}"} for i in range(args.instances)]
+    path = f'custom_components/{COMPONENT}.html'
+
+    legacy_time, legacy_html = best_of(
+        args.repeats,
+        lambda: [legacy_render(internals.load_html_file(path), row) for row in rows]
+    )
+    cached_time, cached_html = best_of(args.repeats, lambda: [render_component(row, COMPONENT) for row in rows])
+    batch_time, batch_html = best_of(args.repeats, lambda: render_components(rows, COMPONENT))
+
+    if not legacy_html == cached_html == batch_html:
+        raise SystemExit("Rendered HTML differs")
+
+    print(f"{args.instances} instances of {COMPONENT}")
+    print(f"  read + replace per key: {legacy_time * 1000:.1f} ms")
+    print(f"  cached template:        {cached_time * 1000:.1f} ms ({legacy_time / cached_time:.1f}x)")
+    print(f"  batch render:           {batch_time * 1000:.1f} ms ({legacy_time / batch_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
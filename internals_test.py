@@ -0,0 +1,77 @@
+#############################################################################
+# internals_test.py
+#
+# This file contains tests for internals.py.
+#############################################################################
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import internals
+from benchmark_utils import legacy_render
+from internals import CompiledTemplate, render_component, render_components, safe_string
+
+TEMPLATE = "<p>{{NAME}} said \"{{QUOTE}}\"</p><span>{{MISSING}}</span>"
+
+
+class TestTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        os.mkdir('custom_components')
+        self.write(TEMPLATE)
+        internals._templates.clear()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+        internals._templates.clear()
+
+    def write(self, html, mtime=None):
+        path = 'custom_components/card.html'
+        with open(path, 'w') as file:
+            file.write(html)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def test_safe_string(self):
+        """Tests escaping quotes and backslashes."""
+        self.assertEqual(safe_string('It\'s "ok" \\ fine'), 'It\\\'s \\"ok\\" \\\\ fine')
+        self.assertEqual(safe_string(''), '')
+
+    def test_render_matches_legacy(self):
+        """Tests rendering against the original replace loop."""
+        data = {"NAME": "Remi", "QUOTE": 'I\'m "fast"', "UNUSED": 1}
+        self.assertEqual(render_component(data, 'card'), legacy_render(TEMPLATE, data))
+        self.assertIn("{{MISSING}}", render_component(data, 'card'))
+
+        template = CompiledTemplate("{{A}}{{A}} and {{ B }}")
+        self.assertEqual(template.keys, ["A", "A", " B "])
+        self.assertEqual(template.render({"A": 1, " B ": 2.5}), "11 and 2.5")
+        self.assertEqual(CompiledTemplate("plain").render({"A": 1}), "plain")
+
+    def test_template_is_read_once(self):
+        """Tests that the template file is only read again after it changes."""
+        with patch('internals.load_html_file', wraps=internals.load_html_file) as mock_load:
+            self.assertEqual(render_components([{"NAME": "A"}, {"NAME": "B"}], 'card')[1][:9], "<p>B said")
+            render_component({"NAME": "C"}, 'card')
+            self.assertEqual(mock_load.call_count, 1)
+
+            self.write("<b>{{NAME}}</b>", mtime=os.stat('custom_components/card.html').st_mtime_ns + 10 ** 9)
+            self.assertEqual(render_component({"NAME": "D"}, 'card'), "<b>D</b>")
+            self.assertEqual(mock_load.call_count, 2)
+
+    @patch('internals.components.html')
+    def test_create_components(self, mock_html):
+        """Tests that a batch is shown in one frame."""
+        internals.create_components([{"NAME": "A"}, {"NAME": "B"}], 'card', height=200)
+        mock_html.assert_called_once()
+        html, width, height, scrolling = mock_html.call_args[0]
+        self.assertEqual(html.count("<p>"), 2)
+        self.assertEqual((width, height, scrolling), (None, 200, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
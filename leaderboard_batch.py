@@ -0,0 +1,189 @@
+#############################################################################
+# leaderboard_batch.py
+#
+# This file contains the batch command that recomputes every user's points
+# for the day, week, month and year leaderboards and writes a versioned
+# snapshot that get_user_rankings can serve.
+#
+# Users are split into shards that are scored in parallel worker processes:
+#
+#   $ python leaderboard_batch.py --shards 16 --workers 8 --top-k 100
+#############################################################################
+
+import argparse
+import datetime
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data_fetcher import create_leaderboard_snapshots_table, get_workouts_for_scoring, save_leaderboard_snapshot
+from scoring import get_period_boundaries, score_periods_by_user
+from scoring_rules import SCORABLE_FIELDS
+
+PERIODS = ["day", "week", "month", "year"]
+
+
+def _ranking_key(entry):
+    # Highest points first, ties broken by user_id like the live leaderboard
+    user_id, points = entry
+    return -points, user_id
+
+
+def score_shard(shard):
+    """
+    Score every user in a shard for all periods with vectorized arithmetic.
+
+    Runs in a worker process.
+
+    Args:
+        shard: Dictionary with numpy arrays user_id, start_timestamp
+            (datetime64) and the scored workout fields, plus boundaries
+            (datetime64 start of each of PERIODS) and top_k
+
+    Returns:
+        Dictionary of period -> list of the shard's top_k (user_id, points)
+        tuples, highest first
+    """
+    user_ids, codes = np.unique(shard['user_id'], return_inverse=True)
+    period_totals = score_periods_by_user(codes, len(user_ids), shard, shard['boundaries'])
+
+    tops = {}
+    for column, period in enumerate(PERIODS):
+        totals = period_totals[:, column]
+        earners = np.flatnonzero(totals > 0)
+        tops[period] = heapq.nsmallest(
+            shard['top_k'],
+            ((str(user_ids[i]), int(totals[i])) for i in earners),
+            key=_ranking_key
+        )
+    return tops
+
+
+def partition(columns, boundaries, num_shards, top_k):
+    """
+    Split the workouts into shards so every user's workouts land in one shard.
+
+    Args:
+        columns: Dictionary of lists from data_fetcher.get_workouts_for_scoring
+        boundaries: datetime64 array with the start of each of PERIODS
+        num_shards: Number of shards
+        top_k: Number of top users each shard keeps per period
+
+    Returns:
+        List of shard dictionaries for score_shard
+    """
+    user_id = np.asarray(columns['user_id'], dtype=object)
+    start_timestamp = np.asarray(columns['start_timestamp'], dtype='datetime64[s]')
+    # Every workout field the scoring rules can use that the query returned
+    fields = {
+        field: np.asarray(columns[field], dtype=np.float64)
+        for field in SCORABLE_FIELDS if field in columns
+    }
+
+    _, codes = np.unique(user_id, return_inverse=True)
+    shard_of_row = codes % num_shards
+
+    shards = []
+    for shard_number in range(num_shards):
+        rows = shard_of_row == shard_number
+        shard = {field: values[rows] for field, values in fields.items()}
+        shard.update({
+            'user_id': user_id[rows],
+            'start_timestamp': start_timestamp[rows],
+            'boundaries': boundaries,
+            'top_k': top_k,
+        })
+        shards.append(shard)
+    return shards
+
+
+def merge_tops(shard_tops, top_k):
+    """
+    Merge the per-shard top lists into the global top_k for each period.
+
+    Returns:
+        Dictionary of period -> list of (rank, user_id, points) tuples
+    """
+    rankings = {}
+    for period in PERIODS:
+        merged = heapq.merge(*(tops[period] for tops in shard_tops), key=_ranking_key)
+        rankings[period] = [
+            (rank, user_id, points)
+            for rank, (user_id, points) in enumerate(itertools.islice(merged, top_k), start=1)
+        ]
+    return rankings
+
+
+def recompute_leaderboards(num_shards=8, workers=None, top_k=100, now=None):
+    """
+    Recompute the top_k of every period from the Workouts table.
+
+    Args:
+        num_shards: Number of user shards
+        workers: Number of worker processes (defaults to the CPU count)
+        top_k: Number of users kept per period
+        now: Optional datetime to use instead of the current time
+
+    Returns:
+        Tuple of (period_starts, rankings) where rankings is the output of
+        merge_tops
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    boundaries = get_period_boundaries(PERIODS, now)
+    period_starts = {period: boundary.astype(datetime.datetime) for period, boundary in zip(PERIODS, boundaries)}
+
+    # One bulk read that covers the longest period (a week can start last year)
+    columns = get_workouts_for_scoring(min(period_starts.values()))
+    shards = partition(columns, boundaries, num_shards, top_k)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shard_tops = list(executor.map(score_shard, shards))
+
+    return period_starts, merge_tops(shard_tops, top_k)
+
+
+def snapshot_rows(version, period_starts, rankings):
+    """Rows for data_fetcher.save_leaderboard_snapshot."""
+    return [
+        {
+            'Version': version.isoformat(sep=' ', timespec='seconds'),
+            'Period': period,
+            'PeriodStart': period_starts[period].date().isoformat(),
+            'Rank': rank,
+            'UserId': user_id,
+            'Points': points,
+        }
+        for period in PERIODS
+        for rank, user_id, points in rankings[period]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the leaderboards and write a snapshot.")
+    parser.add_argument("--shards", type=int, default=8, help="Number of user shards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--top-k", type=int, default=100, help="Number of users kept per period")
+    parser.add_argument("--dry-run", action="store_true", help="Print the rankings instead of saving them")
+    args = parser.parse_args()
+
+    version = datetime.datetime.now()
+    started = time.perf_counter()
+    period_starts, rankings = recompute_leaderboards(args.shards, args.workers, args.top_k, version)
+    print(f"Scored {args.shards} shards with {args.workers} workers in {time.perf_counter() - started:.2f}s")
+
+    if args.dry_run:
+        for period in PERIODS:
+            print(f"{period}: {rankings[period][:10]}")
+    else:
+        create_leaderboard_snapshots_table()
+        save_leaderboard_snapshot(snapshot_rows(version, period_starts, rankings))
+        print(f"Saved leaderboard snapshot version {version.isoformat(sep=' ', timespec='seconds')}")
+
+
+if __name__ == '__main__':
+    main()
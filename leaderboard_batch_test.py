@@ -0,0 +1,59 @@
+#############################################################################
+# leaderboard_batch_test.py
+#
+# This file contains tests for leaderboard_batch.py.
+#############################################################################
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from leaderboard_batch import recompute_leaderboards, snapshot_rows, PERIODS
+from leaderboard_utils import calculate_workout_points, get_period_start
+
+NOW = datetime(2025, 3, 20, 18, 0, 0)
+
+
+def random_workouts(count, users, seed):
+    rng = random.Random(seed)
+    columns = {'user_id': [], 'start_timestamp': [], 'calories_burned': [], 'distance': []}
+    for _ in range(count):
+        columns['user_id'].append(f"user{rng.randrange(users)}")
+        columns['start_timestamp'].append(NOW - timedelta(minutes=rng.randrange(60 * 24 * 90)))
+        columns['calories_burned'].append(rng.randrange(600))
+        columns['distance'].append(round(rng.uniform(0, 15), 2))
+    return columns
+
+
+class TestLeaderboardBatch(unittest.TestCase):
+
+    @patch('leaderboard_batch.get_workouts_for_scoring')
+    def test_recompute_matches_per_user_scoring(self, mock_get_workouts_for_scoring):
+        """Tests sharded scoring against scoring each workout one at a time."""
+        columns = random_workouts(3000, 120, seed=5)
+        mock_get_workouts_for_scoring.return_value = columns
+
+        period_starts, rankings = recompute_leaderboards(num_shards=4, workers=2, top_k=10, now=NOW)
+
+        for period in PERIODS:
+            expected = {}
+            for i, user_id in enumerate(columns['user_id']):
+                if columns['start_timestamp'][i] >= get_period_start(period, NOW):
+                    workout = {'calories_burned': columns['calories_burned'][i], 'distance': columns['distance'][i]}
+                    expected[user_id] = expected.get(user_id, 0) + calculate_workout_points(workout)
+            top = sorted((user_id for user_id in expected if expected[user_id] > 0), key=lambda u: (-expected[u], u))[:10]
+            self.assertEqual(rankings[period], [(rank, user_id, expected[user_id]) for rank, user_id in enumerate(top, start=1)])
+
+        rows = snapshot_rows(NOW, period_starts, rankings)
+        self.assertEqual(rows[0]['Version'], '2025-03-20 18:00:00')
+        self.assertEqual({row['PeriodStart'] for row in rows if row['Period'] == 'week'}, {'2025-03-17'})
+
+    @patch('leaderboard_batch.get_workouts_for_scoring')
+    def test_recompute_without_workouts(self, mock_get_workouts_for_scoring):
+        """Tests an empty Workouts table."""
+        mock_get_workouts_for_scoring.return_value = {'user_id': [], 'start_timestamp': [], 'calories_burned': [], 'distance': []}
+        _, rankings = recompute_leaderboards(num_shards=2, workers=1, now=NOW)
+        self.assertEqual(rankings, {period: [] for period in PERIODS})
+
+
+if __name__ == '__main__':
+    unittest.main()
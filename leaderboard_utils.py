@@ -5,161 +5,515 @@
 # the leaderboard functionality.
 #############################################################################
 
-from data_fetcher import get_user_workouts, get_user_profile, users
+from data_fetcher import (
+    get_points_leaderboard, get_user_rollup_totals, create_user_workout,
+    get_daily_points, get_friend_graph, get_latest_leaderboard_snapshot, get_badge_state, save_badge_state,
+    get_user_workout_points, ROLLUP_GRANULARITIES
+)
+from badges import BadgeState
+from event_bus import EventBus
+from points_rollup import DailyPrefixSums
+from ranking_index import RankingIndex
+from scoring_rules import get_rules
 import datetime
+import re
 
-def calculate_user_points(user_id, time_period="day"):
+# Longest rolling window ("last N days") the leaderboard can answer
+MAX_ROLLING_WINDOW_DAYS = 365
+
+# Most recent workouts listed in the points summary, and km -> miles for its Miles column
+ACTIVITY_METRICS_LIMIT = 100
+KM_TO_MILES = 0.621371
+
+# Daily prefix sums for rolling windows, loaded once per process and refreshed periodically
+DAILY_INDEX_TTL = datetime.timedelta(minutes=10)
+_daily_index = None
+_daily_index_loaded_at = None
+
+# Ranking indexes for calendar periods: time_period -> (rollup period, index, loaded_at)
+RANKING_INDEX_TTL = datetime.timedelta(minutes=10)
+_ranking_indexes = {}
+_user_names = {}
+
+# Batch leaderboard snapshots (see leaderboard_batch.py): time_period -> (fetched_at, snapshot).
+# A snapshot is served while it is recent and no newer workout was recorded in this process.
+SNAPSHOT_TTL = datetime.timedelta(minutes=10)
+SNAPSHOT_MAX_AGE = datetime.timedelta(minutes=30)
+_snapshots = {}
+_rankings_updated_at = {}
+
+# Running badge states (see badges.py): user_id -> BadgeState, and badges
+# earned by recorded workouts that haven't been shown yet: user_id -> [badge_id]
+_badge_states = {}
+_new_badges = {}
+
+# Recorded workouts publish their points here so open leaderboards can refresh
+POINTS_TOPIC = "points"
+event_bus = EventBus()
+
+def get_period_start(time_period="day", now=None):
     """
-    Calculate total points for a user based on their workouts.
+    Get the first moment of the current leaderboard period.
     
     Args:
-        user_id: The user's ID
-        time_period: "day", "week", "month", or "year"
+        time_period: "day", "week", "month", or "year" (anything else is all time)
+        now: Optional datetime to use instead of the current time
         
     Returns:
-        Integer representing total points
+        datetime at midnight on the first day of the period
     """
-    # Get user's workouts
-    workouts = get_user_workouts(user_id)
-    
-    if not workouts:
-        return 0
-    
-    # Calculate date range for filtering
-    now = datetime.datetime.now()
+    if now is None:
+        now = datetime.datetime.now()
     
     if time_period == "day":
-        start_date = datetime.datetime(now.year, now.month, now.day, 0, 0, 0)
+        return datetime.datetime(now.year, now.month, now.day, 0, 0, 0)
     elif time_period == "week":
         # Calculate start of week (Monday)
         start_date = now - datetime.timedelta(days=now.weekday())
-        start_date = datetime.datetime(start_date.year, start_date.month, start_date.day, 0, 0, 0)
+        return datetime.datetime(start_date.year, start_date.month, start_date.day, 0, 0, 0)
     elif time_period == "month":
-        start_date = datetime.datetime(now.year, now.month, 1, 0, 0, 0)
+        return datetime.datetime(now.year, now.month, 1, 0, 0, 0)
     elif time_period == "year":
-        start_date = datetime.datetime(now.year, 1, 1, 0, 0, 0)
+        return datetime.datetime(now.year, 1, 1, 0, 0, 0)
     else:
         # Default to all time
-        start_date = datetime.datetime(1970, 1, 1, 0, 0, 0)
+        return datetime.datetime(1970, 1, 1, 0, 0, 0)
+
+def get_rollup_period(time_period="day", now=None):
+    """
+    Map a leaderboard time period to the rollup rows that cover it.
     
-    # Filter workouts by time period
-    filtered_workouts = []
-    for workout in workouts:
-        try:
-            workout_time = datetime.datetime.strptime(workout['start_timestamp'], '%Y-%m-%d %H:%M:%S')
-            if workout_time >= start_date:
-                filtered_workouts.append(workout)
-        except:
-            # Skip workouts with invalid timestamps
-            continue
+    Args:
+        time_period: "day", "week", "month", or "year" (anything else is all time)
+        now: Optional datetime to use instead of the current time
+        
+    Returns:
+        Tuple of (granularity, period_start date) for the PointsRollup table
+    """
+    if time_period in ROLLUP_GRANULARITIES:
+        return time_period, get_period_start(time_period, now).date()
     
-    # Calculate points based on the formula:
-    # 1 calorie = 1 point
-    # 1 mile = 5 points
-    total_points = 0
+    # All time is the sum of every yearly rollup
+    return "year", get_period_start("all", now).date()
+
+def get_rolling_window_days(time_period):
+    """
+    Get the length of a rolling window period such as "last 7 days".
     
-    for workout in filtered_workouts:
-        # Points from calories
-        calories_points = workout.get('calories_burned', 0)
+    Args:
+        time_period: Period name
         
-        # Points from distance (convert km to miles)
-        distance_km = workout.get('distance', 0)
-        distance_miles = distance_km * 0.621371  # Convert km to miles
-        distance_points = int(distance_miles * 5)
+    Returns:
+        Number of days in the window, or None for calendar periods
+    """
+    match = re.fullmatch(r"last (\d+) days?", str(time_period).strip().lower())
+    if match and 0 < int(match.group(1)) <= MAX_ROLLING_WINDOW_DAYS:
+        return int(match.group(1))
+    return None
+
+def get_daily_index(now=None):
+    """
+    Get the in-memory daily prefix sums used to answer rolling windows.
+    
+    The index is loaded from the day rollups with a single query and reused
+    until it expires or no longer covers today.
+    
+    Args:
+        now: Optional datetime to use instead of the current time
         
-        # Sum points for this workout (no bonus points)
-        workout_points = calories_points + distance_points
-        total_points += workout_points
+    Returns:
+        DailyPrefixSums covering the last MAX_ROLLING_WINDOW_DAYS days
+    """
+    global _daily_index, _daily_index_loaded_at
+    
+    if now is None:
+        now = datetime.datetime.now()
+    today = now.date()
+    
+    if (_daily_index is None or not _daily_index.covers(today)
+            or now - _daily_index_loaded_at > DAILY_INDEX_TTL):
+        first_day = today - datetime.timedelta(days=MAX_ROLLING_WINDOW_DAYS - 1)
+        # Cover a couple of days ahead so the index stays valid past midnight
+        _daily_index = DailyPrefixSums.from_rows(get_daily_points(first_day), first_day, MAX_ROLLING_WINDOW_DAYS + 2)
+        _daily_index_loaded_at = now
     
-    return total_points
+    return _daily_index
 
-def get_user_rankings(time_period="day"):
+def get_ranking_index(time_period, now=None):
     """
-    Generate rankings of all users based on points.
+    Get the in-memory ranking index for a calendar period.
+    
+    Every user's points for the period are loaded with one aggregate query
+    over the rollups; after that ranks and top-k slices are answered in
+    memory and new workouts update the index in O(log n).
+    
+    Args:
+        time_period: "day", "week", "month", "year", or "all"
+        now: Optional datetime to use instead of the current time
+        
+    Returns:
+        RankingIndex for the current period
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    period = get_rollup_period(time_period, now)
+    
+    cached = _ranking_indexes.get(time_period)
+    # Reload when the period has rolled over (e.g. a new day) or the index expired
+    if cached is None or cached[0] != period or now - cached[2] > RANKING_INDEX_TTL:
+        leaderboard = get_points_leaderboard(*period, limit=None)
+        for row in leaderboard:
+            _user_names[row["user_id"]] = (row["name"], row["profile_image"])
+        
+        cached = (period, RankingIndex.from_points({row["user_id"]: row["points"] for row in leaderboard}), now)
+        _ranking_indexes[time_period] = cached
+    
+    return cached[1]
+
+def get_leaderboard_snapshot(time_period, now=None):
+    """
+    Get the newest batch snapshot for a calendar period, when it can be served.
     
     Args:
         time_period: "day", "week", "month", or "year"
+        now: Optional datetime to use instead of the current time
+        
+    Returns:
+        Snapshot dictionary (see data_fetcher.get_latest_leaderboard_snapshot),
+        or None when there is no snapshot, it is too old, or this process has
+        recorded a workout for the period since it was written
+    """
+    if time_period not in ROLLUP_GRANULARITIES:
+        return None
+    if now is None:
+        now = datetime.datetime.now()
+    
+    cached = _snapshots.get(time_period)
+    if cached is None or now - cached[0] > SNAPSHOT_TTL:
+        cached = (now, get_latest_leaderboard_snapshot(*get_rollup_period(time_period, now)))
+        _snapshots[time_period] = cached
+    
+    snapshot = cached[1]
+    if snapshot is None or now - snapshot["version"] > SNAPSHOT_MAX_AGE:
+        return None
+    if _rankings_updated_at.get(time_period, snapshot["version"]) > snapshot["version"]:
+        return None
+    return snapshot
+
+def get_user_percentile(user_id, time_period="day"):
+    """
+    Get a user's standing as "top X%" of everyone with points in a period.
+    
+    Counted exactly from the same in-memory indexes as the ranks, so a new
+    workout moves the user's standing right away.
+    
+    Args:
+        user_id: The user's ID
+        time_period: "day", "week", "month", "year", or "last N days"
+        
+    Returns:
+        Integer percent from 1 to 100 (100 for users without points)
+    """
+    window_days = get_rolling_window_days(time_period)
+    if window_days:
+        return get_daily_index().top_percent(user_id, datetime.date.today(), window_days)
+    return get_ranking_index(time_period).top_percent(user_id)
+
+def get_badge_state_for(user_id):
+    """
+    Get a user's running badge state, loading it once per process.
+    
+    Returns:
+        BadgeState (empty for users without a stored state)
+    """
+    if user_id not in _badge_states:
+        row = get_badge_state(user_id)
+        _badge_states[user_id] = BadgeState.from_row(row) if row else BadgeState()
+    return _badge_states[user_id]
+
+def get_user_badges(user_id):
+    """
+    Get the badges a user has earned, in display order.
+    
+    Returns:
+        List of badge IDs (see badges.BADGES)
+    """
+    return get_badge_state_for(user_id).badges()
+
+def pop_new_badges(user_id):
+    """
+    Get the badges earned by a user's recorded workouts since the last call.
+    
+    Returns:
+        List of badge IDs
+    """
+    return _new_badges.pop(user_id, [])
+
+def coalesce_point_deltas(pending, event):
+    """
+    Fold a published points event into a subscriber's pending update.
+    
+    Returns:
+        Dictionary with deltas (user_id -> points added) and workouts (count)
+    """
+    if pending is None:
+        pending = {'deltas': {}, 'workouts': 0}
+    pending['deltas'][event['user_id']] = pending['deltas'].get(event['user_id'], 0) + event['points']
+    pending['workouts'] += 1
+    return pending
+
+def subscribe_to_points(min_interval):
+    """
+    Subscribe to the points earned by recorded workouts.
+    
+    Args:
+        min_interval: Minimum seconds between two updates
+        
+    Returns:
+        event_bus.Subscription whose updates come from coalesce_point_deltas
+    """
+    return event_bus.subscribe(POINTS_TOPIC, min_interval, coalesce_point_deltas)
+
+def get_points_lookup(time_period):
+    """
+    Get a function returning any user's points for a period in O(1).
+    
+    Calendar periods read the ranking index and rolling windows read the
+    daily prefix sums, so looking up many users makes no extra queries.
+    
+    Args:
+        time_period: "day", "week", "month", "year", "all", or "last N days"
+        
+    Returns:
+        Function of user_id -> integer points
+    """
+    window_days = get_rolling_window_days(time_period)
+    if window_days:
+        index = get_daily_index()
+        today = datetime.date.today()
+        return lambda lookup_user_id: index.window_points(lookup_user_id, today, window_days)
+    
+    return get_ranking_index(time_period).points
+
+def get_user_display(user_id):
+    """
+    Get the name and profile image shown for a user on the leaderboard.
+    
+    Returns:
+        Tuple of (name, profile_image), falling back to (user_id, "")
+    """
+    if user_id in _user_names:
+        return _user_names[user_id]
+    if _daily_index is not None and user_id in _daily_index.names:
+        return _daily_index.names[user_id], _daily_index.profile_images.get(user_id, "")
+    return user_id, ""
+
+def calculate_workout_points(workout):
+    """
+    Calculate the points earned by a single workout.
+    
+    Args:
+        workout: Workout dictionary with calories_burned and distance (km)
+        
+    Returns:
+        Integer points for the workout
+    """
+    # Points follow the active scoring rules (scoring_rules.json)
+    return get_rules().score_workout(workout)
+
+def record_workout(user_id, workout):
+    """
+    Store a newly arrived workout, add its points to the user's rollups and
+    update their badges.
+    
+    Args:
+        user_id: The user's ID
+        workout: Workout dictionary in the format returned by get_user_workouts
+        
+    Returns:
+        Integer points earned by the workout
+    """
+    rules = get_rules()
+    points = rules.score_workout(workout)
+    create_user_workout(user_id, workout, points, rules.version)
+    
+    # Keep the in-memory rolling windows and rankings current without reloading them
+    start = datetime.datetime.strptime(workout['start_timestamp'], '%Y-%m-%d %H:%M:%S')
+    if _daily_index is not None:
+        _daily_index.add(user_id, start.date(), points)
+    for time_period, ((granularity, period_start), index, _) in _ranking_indexes.items():
+        if get_period_start(granularity, start).date() >= period_start:
+            index.add(user_id, points)
+            _rankings_updated_at[time_period] = datetime.datetime.now()
+    
+    # Badges only need the user's running state, never their workout history
+    state = get_badge_state_for(user_id)
+    earned = state.update_from_workout(workout)
+    save_badge_state(state.to_row(user_id))
+    if earned:
+        _new_badges.setdefault(user_id, []).extend(earned)
+    
+    event_bus.publish(POINTS_TOPIC, {'user_id': user_id, 'points': points, 'start_timestamp': workout['start_timestamp']})
+    
+    return points
+
+def calculate_user_points(user_id, time_period="day"):
+    """
+    Calculate total points for a user based on their workouts.
+    
+    Points are read from the user's rollup rows for the period rather than
+    re-scoring every workout. Rolling windows ("last 7 days") are answered
+    from the in-memory daily prefix sums.
+    
+    Args:
+        user_id: The user's ID
+        time_period: "day", "week", "month", "year", or "last N days"
+        
+    Returns:
+        Integer representing total points
+    """
+    window_days = get_rolling_window_days(time_period)
+    if window_days:
+        return get_daily_index().window_points(user_id, datetime.date.today(), window_days)
+    
+    granularity, period_start = get_rollup_period(time_period)
+    return get_user_rollup_totals(user_id, granularity, period_start)["points"]
+
+def get_user_totals(user_id, time_period="all"):
+    """
+    Get a user's workout totals (points, calories, distance, steps, duration
+    and workout count) for a time period from the rollups.
+    
+    Args:
+        user_id: The user's ID
+        time_period: "day", "week", "month", "year", or "all"
+        
+    Returns:
+        Dictionary of totals, see data_fetcher.get_user_rollup_totals
+    """
+    granularity, period_start = get_rollup_period(time_period)
+    return get_user_rollup_totals(user_id, granularity, period_start)
+
+def get_user_rankings(time_period="day", limit=5):
+    """
+    Generate rankings of all users based on points.
+    
+    Calendar periods are served from the latest batch snapshot when it is
+    current (see get_leaderboard_snapshot), otherwise from an in-memory
+    ranking index that is loaded by a single aggregate query over the points
+    rollups (see get_ranking_index).
+    
+    Rolling windows ("last 7 days") are ranked from the in-memory daily
+    prefix sums without querying BigQuery.
+    
+    Args:
+        time_period: "day", "week", "month", "year", or "last N days"
+        limit: Number of top users to return
         
     Returns:
         List of dictionaries with user rankings, sorted by points
     """
-    # For more realistic data, let's create mock rankings with adjustments for time periods
-    if time_period == "day":
-        rankings = [
-            {"rank": 1, "user_id": "user1", "name": "Alot B.", "points": 301, "profile_image": ""},
-            {"rank": 2, "user_id": "user2", "name": "Blake S.", "points": 278, "profile_image": ""},
-            {"rank": 3, "user_id": "user3", "name": "Amelia J.", "points": 257, "profile_image": ""},
-            {"rank": 4, "user_id": "user4", "name": "Emmanuel K.", "points": 199, "profile_image": ""},
-            {"rank": 5, "user_id": "user5", "name": "Lisa C.", "points": 168, "profile_image": ""}
-        ]
-    elif time_period == "week":
-        rankings = [
-            {"rank": 1, "user_id": "user2", "name": "Blake S.", "points": 1204, "profile_image": ""},
-            {"rank": 2, "user_id": "user1", "name": "Alot B.", "points": 987, "profile_image": ""},
-            {"rank": 3, "user_id": "user5", "name": "Lisa C.", "points": 856, "profile_image": ""},
-            {"rank": 4, "user_id": "user3", "name": "Amelia J.", "points": 722, "profile_image": ""},
-            {"rank": 5, "user_id": "user4", "name": "Emmanuel K.", "points": 651, "profile_image": ""}
-        ]
-    elif time_period == "month":
-        rankings = [
-            {"rank": 1, "user_id": "user4", "name": "Emmanuel K.", "points": 4532, "profile_image": ""},
-            {"rank": 2, "user_id": "user2", "name": "Blake S.", "points": 3987, "profile_image": ""},
-            {"rank": 3, "user_id": "user5", "name": "Lisa C.", "points": 3624, "profile_image": ""},
-            {"rank": 4, "user_id": "user1", "name": "Alot B.", "points": 3219, "profile_image": ""},
-            {"rank": 5, "user_id": "user3", "name": "Amelia J.", "points": 2755, "profile_image": ""}
-        ]
-    else:  # year
-        rankings = [
-            {"rank": 1, "user_id": "user2", "name": "Blake S.", "points": 25432, "profile_image": ""},
-            {"rank": 2, "user_id": "user4", "name": "Emmanuel K.", "points": 21987, "profile_image": ""},
-            {"rank": 3, "user_id": "user3", "name": "Amelia J.", "points": 19624, "profile_image": ""},
-            {"rank": 4, "user_id": "user5", "name": "Lisa C.", "points": 18219, "profile_image": ""},
-            {"rank": 5, "user_id": "user1", "name": "Alot B.", "points": 17755, "profile_image": ""}
+    window_days = get_rolling_window_days(time_period)
+    if window_days:
+        index = get_daily_index()
+        return [
+            {
+                "rank": rank,
+                "user_id": ranked_user_id,
+                "name": index.names.get(ranked_user_id, ranked_user_id),
+                "points": points,
+                "profile_image": index.profile_images.get(ranked_user_id, "")
+            }
+            for rank, (ranked_user_id, points) in enumerate(index.top(datetime.date.today(), window_days, limit), start=1)
         ]
     
-    return rankings
+    snapshot = get_leaderboard_snapshot(time_period)
+    if snapshot is not None and len(snapshot["rankings"]) >= limit:
+        return snapshot["rankings"][:limit]
+    
+    top = get_ranking_index(time_period).top(limit)
+    
+    return [
+        {
+            "rank": rank,
+            "user_id": ranked_user_id,
+            "name": get_user_display(ranked_user_id)[0],
+            "points": points,
+            "profile_image": get_user_display(ranked_user_id)[1]
+        }
+        for rank, (ranked_user_id, points) in enumerate(top, start=1)
+    ]
+
+def get_friends_leaderboard(user_id, time_period="day"):
+    """
+    Rank a user among their friends.
+    
+    Friends come from the in-memory friend graph and points from the ranking
+    indexes, so a user with hundreds of friends costs no query per friend.
+    
+    Args:
+        user_id: The user's ID
+        time_period: "day", "week", "month", "year", or "last N days"
+        
+    Returns:
+        Dictionary with:
+        - friend_rank: The user's position among themselves and their friends
+        - rankings: The ranked list (including the user), in the same format
+          as get_user_rankings
+    """
+    points_of = get_points_lookup(time_period)
+    members = set(get_friend_graph().friends(user_id)) | {user_id}
+    
+    ranked = sorted(((points_of(member), member) for member in members), key=lambda entry: (-entry[0], entry[1]))
+    rankings = [
+        {
+            "rank": rank,
+            "user_id": member,
+            "name": get_user_display(member)[0],
+            "points": points,
+            "profile_image": get_user_display(member)[1]
+        }
+        for rank, (points, member) in enumerate(ranked, start=1)
+    ]
+    
+    return {
+        "friend_rank": next(row["rank"] for row in rankings if row["user_id"] == user_id),
+        "rankings": rankings
+    }
 
-def get_user_activity_metrics(user_id, time_period="day"):
+def get_user_activity_metrics(user_id, time_period="day", limit=ACTIVITY_METRICS_LIMIT):
     """
     Get workout metrics and points for a user.
     
+    Workouts are read with the points stored when they were recorded, so
+    nothing is re-scored, and only the most recent `limit` workouts of the
+    period are fetched.
+    
     Args:
         user_id: The user's ID
-        time_period: "day", "week", "month", or "year"
+        time_period: "day", "week", "month", "year", "all", or "last N days"
+        limit: Maximum number of workouts returned
         
     Returns:
-        List of workout metrics with points, sorted by timestamp
+        List of workout metrics with points, sorted by timestamp (newest first)
     """
-    # Create mock data with realistic values for different time periods
-    if time_period == "day":
-        return [
-            {"workout": 2, "kcals": 90, "miles": 1.8, "points": 188},
-            {"workout": 1, "kcals": 28, "miles": 0.7, "points": 102}
-        ]
-    elif time_period == "week":
-        return [
-            {"workout": 5, "kcals": 320, "miles": 6.2, "points": 651},
-            {"workout": 4, "kcals": 180, "miles": 3.5, "points": 355},
-            {"workout": 3, "kcals": 250, "miles": 4.8, "points": 490},
-            {"workout": 2, "kcals": 90, "miles": 1.8, "points": 188},
-            {"workout": 1, "kcals": 28, "miles": 0.7, "points": 102}
-        ]
-    elif time_period == "month":
-        return [
-            {"workout": 15, "kcals": 420, "miles": 8.1, "points": 865},
-            {"workout": 14, "kcals": 380, "miles": 7.4, "points": 797},
-            {"workout": 13, "kcals": 310, "miles": 6.0, "points": 640},
-            {"workout": 12, "kcals": 275, "miles": 5.3, "points": 550},
-            {"workout": 11, "kcals": 190, "miles": 3.7, "points": 395}
-        ]
-    else:  # year
-        return [
-            {"workout": 52, "kcals": 510, "miles": 10.2, "points": 1060},
-            {"workout": 51, "kcals": 480, "miles": 9.5, "points": 1027},
-            {"workout": 50, "kcals": 425, "miles": 8.3, "points": 866},
-            {"workout": 49, "kcals": 390, "miles": 7.6, "points": 828},
-            {"workout": 48, "kcals": 350, "miles": 6.8, "points": 740}
-        ]
+    window_days = get_rolling_window_days(time_period)
+    if window_days:
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        since = today - datetime.timedelta(days=window_days - 1)
+    else:
+        since = get_period_start(time_period)
+    
+    return [
+        {
+            "workout": workout['number'],
+            "timestamp": workout['start_timestamp'],
+            "kcals": int(workout['calories_burned']),
+            "miles": round(float(workout['distance']) * KM_TO_MILES, 1),
+            "points": workout['points']
+        }
+        for workout in get_user_workout_points(user_id, since, limit)
+    ]
 
 def get_user_stats(user_id, time_period="day"):
     """
@@ -167,36 +521,26 @@ def get_user_stats(user_id, time_period="day"):
     
     Args:
         user_id: The user's ID
-        time_period: "day", "week", "month", or "year"
+        time_period: "day", "week", "month", "year", or "last N days"
         
     Returns:
         Dictionary with stats
     """
-    if time_period == "day":
-        return {
-            "total_points": 301,
-            "global_rank": 42,
-            "friend_rank": 1,
-            "badges": 5
-        }
-    elif time_period == "week":
-        return {
-            "total_points": 987,
-            "global_rank": 12,
-            "friend_rank": 2,
-            "badges": 5
-        }
-    elif time_period == "month":
-        return {
-            "total_points": 3219,
-            "global_rank": 4,
-            "friend_rank": 1,
-            "badges": 5
-        }
-    else:  # year
-        return {
-            "total_points": 17755,
-            "global_rank": 5,
-            "friend_rank": 3,
-            "badges": 5
-        }
\ No newline at end of file
+    window_days = get_rolling_window_days(time_period)
+    if window_days:
+        index = get_daily_index()
+        today = datetime.date.today()
+        total_points = index.window_points(user_id, today, window_days)
+        global_rank, _ = index.rank(user_id, today, window_days)
+    else:
+        index = get_ranking_index(time_period)
+        total_points = index.points(user_id)
+        global_rank = index.rank(user_id)
+    
+    return {
+        "total_points": total_points,
+        "global_rank": global_rank,
+        "friend_rank": get_friends_leaderboard(user_id, time_period)["friend_rank"],
+        "top_percent": get_user_percentile(user_id, time_period),
+        "badges": len(get_user_badges(user_id))
+    }
@@ -0,0 +1,174 @@
+#############################################################################
+# name_index.py
+#
+# This file contains the search-as-you-type index for exercise names. Every
+# word of a name is put in a prefix trie, for the word being typed, and in a
+# trigram index, for typos ("benhc" still finds "Bench Press") and for text
+# inside a word ("bell" still finds "Barbell Curl", as the old substring
+# filter did). A search
+# scores each name by how well it matches every word of the query and
+# returns the best k, looking at a bounded number of candidate words per
+# keystroke however large the catalog is.
+#############################################################################
+
+import heapq
+import re
+
+# Smallest trigram similarity (Dice coefficient) that counts as a typo match
+FUZZY_THRESHOLD = 0.4
+# Most indexed words a query word is compared with for typo matching
+MAX_FUZZY_CANDIDATES = 50
+# Score of a word that is exactly a word of the name (a prefix scores 1)
+EXACT_BONUS = 0.25
+# Score of a word found inside a word of the name, ranked below prefixes
+INFIX_SCORE = 0.9
+
+
+def tokenize(text):
+    """Lowercase word tokens of an exercise name or search query."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def trigrams(word):
+    """The trigrams of a word padded with $ at both ends."""
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        # Every name with a word starting with the prefix of this node
+        self.ids = set()
+
+
+class NameIndex:
+    """
+    Prefix trie and trigram index over a list of names.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.root = _TrieNode()
+        # Word -> ids of the names containing it
+        self.words = {}
+        # Trigram -> words containing it
+        self.trigram_words = {}
+
+        for i, name in enumerate(self.names):
+            for word in set(tokenize(name)):
+                self.words.setdefault(word, set()).add(i)
+                node = self.root
+                for char in word:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.ids.add(i)
+
+        for word in self.words:
+            for trigram in trigrams(word):
+                self.trigram_words.setdefault(trigram, []).append(word)
+
+    def prefix_ids(self, prefix):
+        """Ids of the names with a word starting with prefix."""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def fuzzy_words(self, word):
+        """
+        Indexed words similar to word, with their trigram similarity.
+
+        Returns:
+            List of (word, similarity) tuples at or above FUZZY_THRESHOLD
+        """
+        query_trigrams = trigrams(word)
+        shared = {}
+        for trigram in query_trigrams:
+            for candidate in self.trigram_words.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        matches = []
+        for candidate, count in heapq.nlargest(MAX_FUZZY_CANDIDATES, shared.items(), key=lambda item: item[1]):
+            similarity = 2 * count / (len(query_trigrams) + len(trigrams(candidate)))
+            if similarity >= FUZZY_THRESHOLD:
+                matches.append((candidate, similarity))
+        return matches
+
+    def infix_words(self, word):
+        """
+        Indexed words that contain word anywhere, not only at the start.
+
+        Words of three or more letters are looked up through the trigram
+        index; shorter ones are compared with every indexed word.
+        """
+        if len(word) < 3:
+            return [candidate for candidate in self.words if word in candidate]
+        candidates = None
+        for i in range(len(word) - 2):
+            containing = set(self.trigram_words.get(word[i:i + 3], ()))
+            candidates = containing if candidates is None else candidates & containing
+            if not candidates:
+                return []
+        return [candidate for candidate in candidates if word in candidate]
+
+    def word_scores(self, word):
+        """
+        Score of every name that matches one query word.
+
+        Returns:
+            Dictionary of name id -> score, 1 + EXACT_BONUS for the exact
+            word, 1 for a prefix, INFIX_SCORE for a word containing it and
+            the similarity for a typo match
+        """
+        scores = {}
+        matches = self.fuzzy_words(word) + [(candidate, INFIX_SCORE) for candidate in self.infix_words(word)]
+        for candidate, similarity in matches:
+            for i in self.words[candidate]:
+                if similarity > scores.get(i, 0):
+                    scores[i] = similarity
+        for i in self.prefix_ids(word):
+            scores[i] = 1.0
+        for i in self.words.get(word, ()):
+            scores[i] = 1.0 + EXACT_BONUS
+        return scores
+
+    def search(self, query, k=None, allowed=None):
+        """
+        The names that best match every word of a query.
+
+        Args:
+            query: Search text, possibly with a partly typed last word
+            k: Number of results (all matches when None)
+            allowed: Optional bitmap of the name ids that may be returned
+
+        Returns:
+            List of name ids, best match first; ties go to the shorter name
+        """
+        query_words = tokenize(query)
+        if not query_words:
+            return []
+
+        totals = None
+        for word in query_words:
+            scores = self.word_scores(word)
+            if totals is None:
+                totals = scores
+            else:
+                # Every word has to match
+                totals = {i: total + scores[i] for i, total in totals.items() if i in scores}
+            if not totals:
+                return []
+
+        if allowed is not None:
+            totals = {i: total for i, total in totals.items() if allowed >> i & 1}
+
+        def rank(i):
+            return -totals[i], len(self.names[i]), self.names[i]
+
+        if k is None:
+            return sorted(totals, key=rank)
+        return heapq.nsmallest(k, totals, key=rank)
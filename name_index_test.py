@@ -0,0 +1,77 @@
+#############################################################################
+# name_index_test.py
+#
+# This file contains tests for name_index.py.
+#############################################################################
+import unittest
+from name_index import NameIndex, tokenize, trigrams
+
+NAMES = [
+    "Barbell Bench Press",
+    "Incline Dumbbell Press",
+    "Bench Dips",
+    "Push-Up",
+    "Dumbbell Bicep Curl",
+    "Press Sit-Up",
+]
+
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NameIndex(NAMES)
+
+    def names(self, query, **kwargs):
+        return [NAMES[i] for i in self.index.search(query, **kwargs)]
+
+    def test_helpers(self):
+        """Tests tokenizing and padded trigrams."""
+        self.assertEqual(tokenize("Push-Up  (Wide)"), ["push", "up", "wide"])
+        self.assertEqual(trigrams("up"), {"$up", "up$"})
+        self.assertEqual(trigrams("a"), {"$a$"})
+
+    def test_prefix_search(self):
+        """Tests the word being typed matching as a prefix."""
+        # Names with a word starting with b come first, then b inside a word
+        self.assertEqual(self.names("b"), ["Bench Dips", "Barbell Bench Press", "Dumbbell Bicep Curl", "Incline Dumbbell Press"])
+        self.assertEqual(self.index.prefix_ids("dumb"), {1, 4})
+        self.assertEqual(self.index.prefix_ids("dumbo"), set())
+
+    def test_every_word_must_match(self):
+        """Tests multi-word queries, with exact words ranked above prefixes."""
+        self.assertEqual(self.names("bench pr"), ["Barbell Bench Press"])
+        self.assertEqual(self.names("press"), ["Press Sit-Up", "Barbell Bench Press", "Incline Dumbbell Press"])
+        self.assertEqual(self.names("up"), ["Push-Up", "Press Sit-Up"])
+        self.assertEqual(self.names("bench squat"), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_text_inside_words(self):
+        """Tests that text inside a word matches, like the old substring filter."""
+        self.assertEqual(self.names("bell"), ["Barbell Bench Press", "Dumbbell Bicep Curl", "Incline Dumbbell Press"])
+        self.assertEqual(self.names("ench"), ["Bench Dips", "Barbell Bench Press"])
+        self.assertEqual(self.names("ch pre"), ["Barbell Bench Press"])
+        self.assertEqual(sorted(self.index.infix_words("us")), ["push"])
+        # Every name containing the query still matches, at any position
+        for name in NAMES:
+            for start in range(len(name)):
+                for end in range(start + 1, len(name) + 1):
+                    query = name[start:end]
+                    if tokenize(query):
+                        self.assertIn(name, self.names(query), query)
+
+    def test_typos(self):
+        """Tests that misspelled words still match, below correct ones."""
+        self.assertEqual(self.names("dumbel"), ["Dumbbell Bicep Curl", "Incline Dumbbell Press"])
+        self.assertEqual(self.names("benhc"), ["Bench Dips", "Barbell Bench Press"])
+        self.assertEqual(self.names("preses"), ["Press Sit-Up", "Barbell Bench Press", "Incline Dumbbell Press"])
+        self.assertEqual(self.names("xyz"), [])
+
+    def test_top_k_and_allowed(self):
+        """Tests limiting the results and restricting them to a bitmap."""
+        self.assertEqual(self.names("press", k=1), ["Press Sit-Up"])
+        allowed = (1 << 0) | (1 << 1)
+        self.assertEqual(self.names("press", allowed=allowed), ["Barbell Bench Press", "Incline Dumbbell Press"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+#############################################################################
+# points_rollup.py
+#
+# This file contains the command to maintain the per-user points rollups
+# (day, week, month and year) used by the leaderboard, and the in-memory
+# daily prefix sums that answer rolling windows ("last 7 days").
+#
+# New workouts are added to the rollups incrementally by
+# leaderboard_utils.record_workout. Run this file to rebuild the rollups
+# from every stored workout, e.g. for a backfill or after the scoring rules
+# change:
+#
+#   $ python points_rollup.py --rebuild
+#   $ python points_rollup.py --check    # rows scored with older rules
+#############################################################################
+
+import argparse
+import numpy as np
+from data_fetcher import rebuild_points_rollup, get_rollup_rules_versions, cluster_workouts_by_user, ROLLUP_TABLE
+from ranking_index import top_percent
+from scoring_rules import get_rules
+
+
+class DailyPrefixSums:
+    """
+    Cumulative daily points for every user over a fixed range of days.
+
+    Row r of the matrix belongs to one user and column i holds the points the
+    user earned on the days before first_day + i, so the points in any window
+    of days are the difference of two columns: O(1) per user, and one
+    vectorized subtraction for the whole leaderboard.
+    """
+
+    def __init__(self, first_day, num_days):
+        self.first_day = first_day
+        self.num_days = num_days
+        self.user_ids = []
+        self.names = {}
+        self.profile_images = {}
+        self._rows = {}
+        self._cumulative = np.zeros((0, num_days + 1), dtype=np.int64)
+
+    @classmethod
+    def from_rows(cls, rows, first_day, num_days):
+        """
+        Build the prefix sums from day rollup rows.
+
+        Args:
+            rows: Dictionaries with user_id, day and points (plus optional
+                name and profile_image), e.g. from data_fetcher.get_daily_points
+            first_day: First day covered by the index
+            num_days: Number of days covered by the index
+
+        Returns:
+            DailyPrefixSums
+        """
+        index = cls(first_day, num_days)
+        rows = [row for row in rows if index.covers(row['day'])]
+        for row in rows:
+            index._row_for(row['user_id'], row.get('name'), row.get('profile_image'))
+
+        # Scatter the daily points into a users x days matrix and accumulate once
+        daily = np.zeros((len(index.user_ids), num_days + 1), dtype=np.int64)
+        if rows:
+            user_rows = np.array([index._rows[row['user_id']] for row in rows])
+            day_columns = np.array([(row['day'] - first_day).days + 1 for row in rows])
+            np.add.at(daily, (user_rows, day_columns), np.array([row['points'] for row in rows], dtype=np.int64))
+        index._cumulative = np.cumsum(daily, axis=1)
+        return index
+
+    def covers(self, day):
+        """Whether a day falls inside the range of the index."""
+        return 0 <= (day - self.first_day).days < self.num_days
+
+    def _row_for(self, user_id, name=None, profile_image=None):
+        # Return the matrix row of a user, adding a row for unseen users
+        if name:
+            self.names[user_id] = name
+        if profile_image:
+            self.profile_images[user_id] = profile_image
+        if user_id not in self._rows:
+            self._rows[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            if len(self.user_ids) > self._cumulative.shape[0]:
+                # Grow the matrix by doubling so adding users stays amortized O(days)
+                grown = np.zeros((max(1, 2 * len(self.user_ids)), self.num_days + 1), dtype=np.int64)
+                grown[:self._cumulative.shape[0]] = self._cumulative
+                self._cumulative = grown
+        return self._rows[user_id]
+
+    def add(self, user_id, day, points):
+        """
+        Add the points of a new workout on a day.
+
+        Args:
+            user_id: The user's ID
+            day: date of the workout (ignored when outside the index range)
+            points: Points earned by the workout
+        """
+        if not self.covers(day):
+            return
+        row = self._row_for(user_id)
+        self._cumulative[row, (day - self.first_day).days + 1:] += points
+
+    def _window_columns(self, end_day, days):
+        # Columns bounding the window of `days` days ending on end_day (inclusive)
+        end = (end_day - self.first_day).days + 1
+        start = end - days
+        return min(max(start, 0), self.num_days), min(max(end, 0), self.num_days)
+
+    def window_points(self, user_id, end_day, days):
+        """
+        Points a user earned in the `days` days ending on end_day.
+
+        Returns:
+            Integer points (0 for users without workouts)
+        """
+        if user_id not in self._rows:
+            return 0
+        start, end = self._window_columns(end_day, days)
+        row = self._cumulative[self._rows[user_id]]
+        return int(row[end] - row[start])
+
+    def all_window_points(self, end_day, days):
+        """
+        Points every user earned in the `days` days ending on end_day.
+
+        Returns:
+            numpy array aligned with self.user_ids
+        """
+        start, end = self._window_columns(end_day, days)
+        count = len(self.user_ids)
+        return self._cumulative[:count, end] - self._cumulative[:count, start]
+
+    def top(self, end_day, days, limit=5):
+        """
+        The top earners of a rolling window.
+
+        Returns:
+            List of (user_id, points) tuples with points > 0, highest first
+        """
+        points = self.all_window_points(end_day, days)
+        order = sorted(np.flatnonzero(points > 0), key=lambda i: (-points[i], self.user_ids[i]))
+        return [(self.user_ids[i], int(points[i])) for i in order[:limit]]
+
+    def rank(self, user_id, end_day, days):
+        """
+        A user's position among everyone with points in a rolling window.
+
+        Returns:
+            Tuple of (rank, number of users with points in the window)
+        """
+        points = self.all_window_points(end_day, days)
+        user_points = self.window_points(user_id, end_day, days)
+        ranked_users = int(np.count_nonzero(points > 0))
+        if user_points <= 0:
+            return ranked_users + 1, ranked_users
+        higher = int(np.count_nonzero(points > user_points))
+        # Ties are broken by user_id, matching the leaderboard order
+        tied = [self.user_ids[i] for i in np.flatnonzero(points == user_points)]
+        return higher + sum(1 for other in tied if other < user_id) + 1, ranked_users
+
+    def top_percent(self, user_id, end_day, days):
+        """
+        A user's standing as "top X%" of everyone with points in a rolling window.
+
+        Returns:
+            Integer percent from 1 to 100 (100 for users without points)
+        """
+        user_points = self.window_points(user_id, end_day, days)
+        if user_points <= 0:
+            return 100
+        points = self.all_window_points(end_day, days)
+        return top_percent(int(np.count_nonzero(points >= user_points)), int(np.count_nonzero(points > 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the leaderboard points rollups.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild every rollup row from the Workouts table")
+    parser.add_argument("--rules-version", type=int, default=None,
+                        help="Scoring rules version to rebuild with (defaults to the active version)")
+    parser.add_argument("--check", action="store_true",
+                        help="Report rollup rows scored with a different rules version than the active one")
+    args = parser.parse_args()
+
+    rules = get_rules(args.rules_version)
+    if args.rebuild:
+        # Compile the rules before touching any table: the Workouts table has no
+        # activity column, so rules with activity multipliers can't be rebuilt
+        try:
+            points_expression = rules.to_sql()
+        except ValueError as error:
+            parser.error(f"{error}, but the Workouts table has none. "
+                         f"Remove activity_multipliers from version {rules.version} to rebuild with it.")
+        cluster_workouts_by_user()
+        rebuild_points_rollup(points_expression, rules.version)
+        print(f"Rescored all workouts and rebuilt {ROLLUP_TABLE} with scoring rules version {rules.version}.")
+    elif args.check:
+        versions = get_rollup_rules_versions()
+        stale = sum(count for version, count in versions.items() if version != rules.version)
+        print(f"Rollup rows by scoring rules version: {versions}")
+        if stale:
+            print(f"{stale} rows were not scored with version {rules.version}; run with --rebuild.")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#############################################################################
+# points_rollup_test.py
+#
+# This file contains tests for points_rollup.py.
+#############################################################################
+import unittest
+from datetime import date
+from unittest.mock import patch
+from points_rollup import DailyPrefixSums, main
+from scoring_rules import ScoringRules
+
+FIRST_DAY = date(2025, 3, 1)
+
+# Daily rollup rows: user1 works out every day, user2 only early in the month
+daily_rows = [
+    {'user_id': 'user1', 'day': date(2025, 3, day), 'points': 10, 'name': 'Remi', 'profile_image': 'remi.jpg'}
+    for day in range(1, 31)
+] + [
+    {'user_id': 'user2', 'day': date(2025, 3, 2), 'points': 200, 'name': 'Blake', 'profile_image': None},
+    {'user_id': 'user2', 'day': date(2025, 3, 3), 'points': 50, 'name': 'Blake', 'profile_image': None},
+    # Outside the index range, ignored
+    {'user_id': 'user3', 'day': date(2025, 2, 1), 'points': 999, 'name': 'Jordan', 'profile_image': None},
+]
+
+
+class TestDailyPrefixSums(unittest.TestCase):
+
+    def setUp(self):
+        self.index = DailyPrefixSums.from_rows(daily_rows, FIRST_DAY, 32)
+
+    def test_window_points(self):
+        """Tests rolling window sums against the daily rows."""
+        self.assertEqual(self.index.window_points('user1', date(2025, 3, 30), 7), 70)
+        self.assertEqual(self.index.window_points('user1', date(2025, 3, 30), 30), 300)
+        self.assertEqual(self.index.window_points('user2', date(2025, 3, 30), 7), 0)
+        self.assertEqual(self.index.window_points('user2', date(2025, 3, 9), 7), 50)
+        self.assertEqual(self.index.window_points('user3', date(2025, 3, 30), 30), 0)
+        # Windows reaching before the first day are clipped to it
+        self.assertEqual(self.index.window_points('user2', date(2025, 3, 3), 30), 250)
+
+    def test_top_and_rank(self):
+        """Tests ranking users over a rolling window."""
+        self.assertEqual(self.index.top(date(2025, 3, 5), 7), [('user2', 250), ('user1', 50)])
+        self.assertEqual(self.index.top(date(2025, 3, 30), 7), [('user1', 70)])
+        self.assertEqual(self.index.rank('user1', date(2025, 3, 5), 7), (2, 2))
+        self.assertEqual(self.index.rank('user2', date(2025, 3, 30), 7), (2, 1))
+        self.assertEqual(self.index.names['user1'], 'Remi')
+
+    def test_add(self):
+        """Tests adding new workouts, including from unseen users."""
+        self.index.add('user2', date(2025, 3, 29), 100)
+        self.index.add('user4', date(2025, 3, 30), 80)
+        self.index.add('user4', date(2025, 1, 1), 80)  # Outside the range, ignored
+        self.assertEqual(self.index.window_points('user2', date(2025, 3, 30), 7), 100)
+        self.assertEqual(self.index.top(date(2025, 3, 30), 7), [('user2', 100), ('user4', 80), ('user1', 70)])
+        self.assertEqual(self.index.rank('user4', date(2025, 3, 30), 7), (2, 3))
+
+    def test_top_percent(self):
+        """Tests "top X%" over a rolling window, following new workouts."""
+        self.assertEqual(self.index.top_percent('user2', date(2025, 3, 5), 7), 50)
+        self.assertEqual(self.index.top_percent('user1', date(2025, 3, 5), 7), 100)
+        self.assertEqual(self.index.top_percent('user2', date(2025, 3, 30), 7), 100)
+        self.index.add('user1', date(2025, 3, 5), 500)
+        self.assertEqual(self.index.top_percent('user1', date(2025, 3, 5), 7), 50)
+
+
+class TestMain(unittest.TestCase):
+
+    @patch('points_rollup.rebuild_points_rollup')
+    @patch('points_rollup.cluster_workouts_by_user')
+    @patch('points_rollup.get_rules')
+    def test_rebuild_with_activity_multipliers(self, mock_get_rules, mock_cluster, mock_rebuild):
+        """Tests that rules the Workouts table can't score stop the rebuild before any query runs."""
+        mock_get_rules.return_value = ScoringRules({
+            'version': 3,
+            'terms': [{'field': 'calories_burned', 'weight': 1}],
+            'activity_multipliers': {'run': 1.5},
+        })
+        with patch('sys.argv', ['points_rollup.py', '--rebuild']), patch('sys.stderr'):
+            with self.assertRaises(SystemExit):
+                main()
+        mock_cluster.assert_not_called()
+        mock_rebuild.assert_not_called()
+
+    @patch('points_rollup.rebuild_points_rollup')
+    @patch('points_rollup.cluster_workouts_by_user')
+    def test_rebuild(self, mock_cluster, mock_rebuild):
+        """Tests rebuilding with the active rules."""
+        with patch('sys.argv', ['points_rollup.py', '--rebuild']), patch('sys.stdout'):
+            main()
+        mock_cluster.assert_called_once()
+        mock_rebuild.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
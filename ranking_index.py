@@ -0,0 +1,188 @@
+#############################################################################
+# ranking_index.py
+#
+# This file contains an in-memory order-statistic index of users' points
+# for one leaderboard period, so ranks and top-k slices don't require
+# sorting every user.
+#############################################################################
+
+import bisect
+import math
+
+
+def top_percent(at_or_above, ranked):
+    """
+    "Top X%" of a user with at_or_above of the ranked users scoring at least
+    as much as they do.
+
+    Returns:
+        Integer percent from 1 to 100 (100 when nobody is ranked)
+    """
+    if ranked == 0:
+        return 100
+    return min(100, max(1, int(math.ceil(100 * at_or_above / ranked))))
+
+
+class RankingIndex:
+    """
+    Ranks users by points with a Fenwick (binary indexed) tree over point values.
+
+    The tree counts how many users have each point value, so the number of
+    users above a score is a prefix sum: O(log P) for updates and rank
+    lookups, where P is the highest point value. Users with the same points
+    are kept sorted by user_id, matching the leaderboard's tie order. Users
+    with 0 points are not ranked.
+    """
+
+    def __init__(self, capacity=1024):
+        self._capacity = capacity
+        self._tree = [0] * (capacity + 1)
+        self._points = {}
+        self._buckets = {}
+
+    @classmethod
+    def from_points(cls, points_by_user):
+        """
+        Build an index from a dictionary of user_id -> points.
+
+        Returns:
+            RankingIndex
+        """
+        highest = max(points_by_user.values(), default=0)
+        capacity = 1024
+        while capacity <= highest:
+            capacity *= 2
+
+        index = cls(capacity)
+        for user_id, points in points_by_user.items():
+            if points > 0:
+                index._points[user_id] = points
+                index._buckets.setdefault(points, []).append(user_id)
+
+        for members in index._buckets.values():
+            members.sort()
+        index._rebuild_tree()
+        return index
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, user_id):
+        return user_id in self._points
+
+    def _rebuild_tree(self):
+        # Build the tree in O(P) from the bucket sizes instead of one update per user
+        self._tree = [0] * (self._capacity + 1)
+        for points, members in self._buckets.items():
+            self._tree[points + 1] += len(members)
+        for i in range(1, self._capacity + 1):
+            parent = i + (i & -i)
+            if parent <= self._capacity:
+                self._tree[parent] += self._tree[i]
+
+    def _add_count(self, points, delta):
+        # Fenwick update at point value `points` (tree positions are 1-based)
+        i = points + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_up_to(self, points):
+        # Number of ranked users with at most `points` points
+        i = min(points + 1, self._capacity)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _find_by_order(self, order):
+        # Smallest point value v such that `order` users have at most v points
+        position = 0
+        step = 1 << (self._capacity.bit_length() - 1)
+        while step:
+            candidate = position + step
+            if candidate <= self._capacity and self._tree[candidate] < order:
+                position = candidate
+                order -= self._tree[candidate]
+            step >>= 1
+        return position
+
+    def _grow(self, points):
+        # Double the capacity until `points` fits
+        while self._capacity <= points:
+            self._capacity *= 2
+        self._rebuild_tree()
+
+    def points(self, user_id):
+        """A user's points (0 when the user isn't ranked)."""
+        return self._points.get(user_id, 0)
+
+    def update(self, user_id, points):
+        """
+        Set a user's points in O(log P).
+
+        Args:
+            user_id: The user's ID
+            points: New total points (0 removes the user from the ranking)
+        """
+        old_points = self._points.pop(user_id, 0)
+        if old_points > 0:
+            members = self._buckets[old_points]
+            members.pop(bisect.bisect_left(members, user_id))
+            if not members:
+                del self._buckets[old_points]
+            self._add_count(old_points, -1)
+
+        if points > 0:
+            if points >= self._capacity:
+                self._grow(points)
+            self._points[user_id] = points
+            bisect.insort(self._buckets.setdefault(points, []), user_id)
+            self._add_count(points, 1)
+
+    def add(self, user_id, delta):
+        """Add points to a user's total, e.g. for a new workout."""
+        self.update(user_id, self.points(user_id) + delta)
+
+    def rank(self, user_id):
+        """
+        A user's position on the leaderboard in O(log P).
+
+        Returns:
+            Integer rank (1 is the top earner). Users without points rank
+            after everyone who has some.
+        """
+        points = self._points.get(user_id, 0)
+        if points <= 0:
+            return len(self._points) + 1
+        higher = len(self._points) - self._count_up_to(points)
+        return higher + bisect.bisect_left(self._buckets[points], user_id) + 1
+
+    def top_percent(self, user_id):
+        """
+        A user's standing as "top X%" of the ranked users in O(log P).
+
+        Returns:
+            Integer percent from 1 to 100 (100 for users without points)
+        """
+        points = self._points.get(user_id, 0)
+        if points <= 0:
+            return 100
+        return top_percent(len(self._points) - self._count_up_to(points - 1), len(self._points))
+
+    def top(self, k):
+        """
+        The k highest ranked users, walking down the occupied point values.
+
+        Returns:
+            List of (user_id, points) tuples, highest first
+        """
+        results = []
+        remaining = len(self._points)
+        while remaining > 0 and len(results) < k:
+            points = self._find_by_order(remaining)
+            members = self._buckets[points]
+            results.extend((user_id, points) for user_id in members[:k - len(results)])
+            remaining -= len(members)
+        return results
@@ -0,0 +1,76 @@
+#############################################################################
+# ranking_index_test.py
+#
+# This file contains tests for ranking_index.py.
+#############################################################################
+import random
+import unittest
+from ranking_index import RankingIndex, top_percent
+
+
+class TestRankingIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = RankingIndex.from_points({'user1': 300, 'user2': 500, 'user3': 300, 'user4': 0, 'user5': 120})
+
+    def test_rank(self):
+        """Tests ranks, with ties ordered by user_id."""
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.rank('user2'), 1)
+        self.assertEqual(self.index.rank('user1'), 2)
+        self.assertEqual(self.index.rank('user3'), 3)
+        self.assertEqual(self.index.rank('user5'), 4)
+        # Users without points rank after everyone who has some
+        self.assertEqual(self.index.rank('user4'), 5)
+        self.assertEqual(self.index.rank('user9'), 5)
+
+    def test_top(self):
+        """Tests top-k slices."""
+        self.assertEqual(self.index.top(2), [('user2', 500), ('user1', 300)])
+        self.assertEqual(self.index.top(10), [('user2', 500), ('user1', 300), ('user3', 300), ('user5', 120)])
+        self.assertEqual(RankingIndex().top(5), [])
+
+    def test_update(self):
+        """Tests updating, adding to and removing users' points."""
+        self.index.add('user5', 400)
+        self.assertEqual(self.index.points('user5'), 520)
+        self.assertEqual(self.index.rank('user5'), 1)
+        self.index.update('user2', 0)
+        self.assertNotIn('user2', self.index)
+        self.assertEqual(self.index.top(3), [('user5', 520), ('user1', 300), ('user3', 300)])
+        # Points beyond the initial capacity grow the tree
+        self.index.add('user4', 50000)
+        self.assertEqual(self.index.top(1), [('user4', 50000)])
+        self.assertEqual(self.index.rank('user3'), 4)
+
+    def test_top_percent(self):
+        """Tests "top X%" counted from the tree, ties sharing the better standing."""
+        self.assertEqual(self.index.top_percent('user2'), 25)
+        self.assertEqual(self.index.top_percent('user1'), 75)
+        self.assertEqual(self.index.top_percent('user3'), 75)
+        self.assertEqual(self.index.top_percent('user5'), 100)
+        self.assertEqual(self.index.top_percent('user4'), 100)
+        self.index.add('user5', 1000)
+        self.assertEqual(self.index.top_percent('user5'), 25)
+        self.assertEqual(self.index.top_percent('user2'), 50)
+
+    def test_matches_sorting(self):
+        """Tests ranks against sorting every user after random updates."""
+        rng = random.Random(7)
+        index = RankingIndex()
+        points = {}
+        for _ in range(2000):
+            user_id = f"user{rng.randrange(200)}"
+            points[user_id] = rng.choice([0, rng.randrange(1, 5000)])
+            index.update(user_id, points[user_id])
+
+        ranked = sorted((user_id for user_id in points if points[user_id] > 0), key=lambda u: (-points[u], u))
+        self.assertEqual(index.top(25), [(user_id, points[user_id]) for user_id in ranked[:25]])
+        for position, user_id in enumerate(ranked, start=1):
+            self.assertEqual(index.rank(user_id), position)
+            at_or_above = sum(1 for other in ranked if points[other] >= points[user_id])
+            self.assertEqual(index.top_percent(user_id), top_percent(at_or_above, len(ranked)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+#############################################################################
+# recommendations_batch.py
+#
+# This file contains the batch command that recomputes the "people who
+# favorited this also favorited" lists from every current favorite and
+# replaces the ExerciseRecommendations table the app serves them from.
+# Schedule it, e.g. nightly:
+#
+#   $ python recommendations_batch.py
+#############################################################################
+
+import argparse
+import time
+from data_fetcher import get_favorite_pairs, replace_exercise_recommendations, EXERCISE_RECOMMENDATIONS_TABLE
+from exercise_recommender import ItemRecommendations, RECOMMENDATIONS_K
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the exercise recommendations.")
+    parser.add_argument("--dry-run", action="store_true", help="Print some lists instead of saving them")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    pairs = get_favorite_pairs()
+    recommendations = ItemRecommendations.from_pairs(pairs)
+    rows = recommendations.to_rows()
+    print(f"Scored {len(recommendations.ranked)} exercises from {len(pairs)} favorites in {time.perf_counter() - started:.2f}s")
+
+    if args.dry_run:
+        for name in sorted(recommendations.ranked)[:10]:
+            print(f"{name}: {recommendations.recommend(name, RECOMMENDATIONS_K)}")
+    else:
+        replace_exercise_recommendations(rows)
+        print(f"Saved {len(rows)} rows to {EXERCISE_RECOMMENDATIONS_TABLE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#############################################################################
+# scoring.py
+#
+# This file contains vectorized points scoring. Workouts are converted to
+# arrays once and scored for every leaderboard period in a single pass,
+# instead of parsing and looping over each workout per period.
+#############################################################################
+
+import datetime
+import numpy as np
+from leaderboard_utils import get_period_start
+from scoring_rules import get_rules
+
+SCORING_PERIODS = ["day", "week", "month", "year", "all"]
+
+
+def workouts_to_arrays(workouts):
+    """
+    Convert workouts to numpy arrays.
+
+    Args:
+        workouts: List of workout dictionaries in the format returned by
+            data_fetcher.get_user_workouts
+
+    Returns:
+        Dictionary of arrays start_timestamp (datetime64, NaT for invalid
+        timestamps), calories_burned, distance (km), steps, duration_seconds
+        and activity
+    """
+    start_timestamp = _to_datetime64([workout.get('start_timestamp') for workout in workouts])
+    end_timestamp = _to_datetime64([workout.get('end_timestamp') for workout in workouts])
+    duration = end_timestamp - start_timestamp
+
+    return {
+        'start_timestamp': start_timestamp,
+        'calories_burned': np.array([workout.get('calories_burned', 0) for workout in workouts], dtype=np.float64),
+        'distance': np.array([workout.get('distance', 0) for workout in workouts], dtype=np.float64),
+        'steps': np.array([workout.get('steps', 0) for workout in workouts], dtype=np.float64),
+        'duration_seconds': np.where(np.isnat(duration), 0, duration.astype(np.int64)).astype(np.float64),
+        'activity': np.array([workout.get('activity', '') for workout in workouts], dtype=object),
+    }
+
+
+def _to_datetime64(timestamps):
+    try:
+        return np.array(timestamps, dtype='datetime64[s]')
+    except ValueError:
+        # Invalid timestamps never fall inside a period, like skipping them
+        return np.array([_parse_timestamp(timestamp) for timestamp in timestamps], dtype='datetime64[s]')
+
+
+def _parse_timestamp(timestamp):
+    try:
+        return np.datetime64(datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S'), 's')
+    except (TypeError, ValueError):
+        return np.datetime64('NaT')
+
+
+def score_workouts(arrays, rules=None):
+    """
+    Points for each workout under the scoring rules.
+
+    Args:
+        arrays: Dictionary of workout arrays (see workouts_to_arrays)
+        rules: ScoringRules to use (defaults to the active rules)
+
+    Returns:
+        int64 array of points per workout
+    """
+    return (rules or get_rules()).score(arrays)
+
+
+def get_period_boundaries(periods=SCORING_PERIODS, now=None):
+    """
+    The start of each period as a datetime64 array, in the order of periods.
+    """
+    return np.array([get_period_start(period, now) for period in periods], dtype='datetime64[s]')
+
+
+def period_masks(start_timestamp, boundaries):
+    """
+    Boolean matrix with one row per workout and one column per period,
+    True where the workout started inside the period.
+    """
+    return start_timestamp[:, np.newaxis] >= boundaries[np.newaxis, :]
+
+
+def score_periods_by_user(codes, num_users, arrays, boundaries):
+    """
+    Total points in every period for many users' workouts, in one pass.
+
+    Args:
+        codes: Array with the user index (0 to num_users - 1) of each workout
+        num_users: Number of users
+        arrays: Dictionary of workout arrays like workouts_to_arrays returns
+        boundaries: datetime64 array of period starts
+
+    Returns:
+        int64 matrix with one row per user and one column per period
+    """
+    points = score_workouts(arrays)
+    masks = period_masks(arrays['start_timestamp'], boundaries)
+    return np.stack(
+        [np.bincount(codes, weights=np.where(masks[:, column], points, 0), minlength=num_users)
+         for column in range(len(boundaries))],
+        axis=1
+    ).astype(np.int64)
+
+
+def calculate_points_by_period(workouts, now=None, periods=SCORING_PERIODS):
+    """
+    Points for every period from one user's workouts, in one pass.
+
+    The workouts are converted to arrays once and scored like the batch job
+    scores a shard of users.
+
+    Args:
+        workouts: List of workout dictionaries (see workouts_to_arrays)
+        now: Optional datetime to use instead of the current time
+        periods: Periods to score (anything but day/week/month/year is all time)
+
+    Returns:
+        Dictionary of period -> integer points
+    """
+    totals = score_periods_by_user(
+        np.zeros(len(workouts), dtype=np.int64), 1, workouts_to_arrays(workouts), get_period_boundaries(periods, now)
+    )
+    return {period: int(total) for period, total in zip(periods, totals[0])}
@@ -0,0 +1,44 @@
+#############################################################################
+# scoring_benchmark.py
+#
+# This file compares scoring every leaderboard period one workout at a time
+# (parsing each timestamp once per period) with the vectorized scorer in
+# scoring.py:
+#
+#   $ python scoring_benchmark.py --workouts 100000
+#############################################################################
+
+import argparse
+import datetime
+
+from benchmark_utils import best_of, legacy_points, random_workouts
+from scoring import calculate_points_by_period, SCORING_PERIODS
+
+NOW = datetime.datetime(2025, 3, 12, 15, 30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-period scoring loops against vectorized scoring.")
+    parser.add_argument("--workouts", type=int, default=100000, help="Number of generated workouts")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per scorer (the best is reported)")
+    args = parser.parse_args()
+
+    workouts = random_workouts(args.workouts, NOW)
+
+    loop_time, loop_points = best_of(
+        args.repeats,
+        lambda: {period: legacy_points(workouts, period, NOW) for period in SCORING_PERIODS}
+    )
+    vectorized_time, batch_points = best_of(args.repeats, lambda: calculate_points_by_period(workouts, NOW))
+
+    if loop_points != batch_points:
+        raise SystemExit(f"Scores differ: {loop_points} != {batch_points}")
+
+    print(f"{args.workouts} workouts, {len(SCORING_PERIODS)} periods")
+    print(f"  per-period loop: {loop_time * 1000:.1f} ms")
+    print(f"  vectorized:      {vectorized_time * 1000:.1f} ms")
+    print(f"  speedup:         {loop_time / vectorized_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#############################################################################
+# scoring_rules.py
+#
+# This file contains the points scoring rules. Rules are defined in
+# scoring_rules.json as weighted terms over workout fields, with optional
+# caps and per-activity multipliers, and are compiled once into an
+# evaluator that scores whole workout arrays (and a matching BigQuery
+# expression for rebuilding the rollups).
+#
+# Every rule set has a version. To change how points are scored, add a new
+# version, make it active and rebuild the rollups with it:
+#
+#   $ python points_rollup.py --rebuild
+#############################################################################
+
+import datetime
+import json
+import os
+import numpy as np
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_rules.json")
+
+# Workout fields a term can score, and the Workouts table expression for each
+SCORABLE_FIELDS = {
+    'calories_burned': "IFNULL(CaloriesBurned, 0)",
+    'distance': "IFNULL(TotalDistance, 0)",
+    'steps': "IFNULL(TotalSteps, 0)",
+    'duration_seconds': "IFNULL(DATETIME_DIFF(CAST(EndTimestamp AS DATETIME), CAST(StartTimestamp AS DATETIME), SECOND), 0)",
+}
+
+# How one unit of each field reads in the points explanation, unless a term names its own unit
+FIELD_UNITS = {
+    'calories_burned': "calorie burned",
+    'distance': "km traveled",
+    'steps': "step",
+    'duration_seconds': "second of exercise",
+}
+
+_rule_sets = None
+_active_version = None
+
+
+class ScoringRules:
+    """
+    One compiled version of the scoring rules.
+
+    A workout's points are the sum of its terms, each truncated to an
+    integer: field * scale * weight, limited to the term's cap. The sum is
+    multiplied by the workout's activity multiplier, truncated again and
+    limited to max_points_per_workout.
+    """
+
+    def __init__(self, spec):
+        self.version = spec['version']
+        self.description = spec.get('description', '')
+        self.terms = []
+        self.units = []
+        for term in spec['terms']:
+            if term['field'] not in SCORABLE_FIELDS:
+                raise ValueError(f"Scoring rules version {self.version}: unknown field {term['field']!r}")
+            # Multiply scale first so results match int(km * KM_TO_MILES * 5)
+            self.terms.append((term['field'], float(term.get('scale', 1)), float(term['weight']), term.get('cap')))
+            self.units.append(term.get('unit', FIELD_UNITS[term['field']]))
+        self.activity_multipliers = {
+            activity: float(multiplier) for activity, multiplier in spec.get('activity_multipliers', {}).items()
+        }
+        self.default_multiplier = float(spec.get('default_multiplier', 1))
+        self.max_points_per_workout = spec.get('max_points_per_workout')
+
+    def score(self, arrays):
+        """
+        Points for every workout in one pass.
+
+        Args:
+            arrays: Dictionary of equally long arrays keyed by workout field
+                (missing fields count as 0), plus an optional activity array
+
+        Returns:
+            int64 array of points per workout
+        """
+        length = next((len(arrays[field]) for field in SCORABLE_FIELDS if field in arrays), 0)
+        total = np.zeros(length, dtype=np.float64)
+        for field, scale, weight, cap in self.terms:
+            if field not in arrays:
+                continue
+            values = np.asarray(arrays[field], dtype=np.float64) * scale * weight
+            if cap is not None:
+                values = np.minimum(values, cap)
+            total += np.trunc(values)
+
+        if self.activity_multipliers and 'activity' in arrays:
+            multipliers = np.full(length, self.default_multiplier)
+            activities = np.asarray(arrays['activity'], dtype=object)
+            for activity, multiplier in self.activity_multipliers.items():
+                multipliers[activities == activity] = multiplier
+            total = np.trunc(total * multipliers)
+        elif self.default_multiplier != 1:
+            total = np.trunc(total * self.default_multiplier)
+
+        if self.max_points_per_workout is not None:
+            total = np.minimum(total, self.max_points_per_workout)
+        return total.astype(np.int64)
+
+    def score_workout(self, workout):
+        """
+        Points for a single workout dictionary.
+
+        duration_seconds is taken from the start and end timestamps when the
+        workout doesn't have it, like the rollup rebuild computes it.
+        """
+        arrays = {field: [workout.get(field) or 0] for field in SCORABLE_FIELDS}
+        if 'duration_seconds' not in workout:
+            arrays['duration_seconds'] = [workout_duration_seconds(workout)]
+        if 'activity' in workout:
+            arrays['activity'] = [workout['activity']]
+        return int(self.score(arrays)[0])
+
+    def describe(self):
+        """
+        The rules as short lines for explaining points to users,
+        e.g. "1 calorie burned = 1 point".
+        """
+        lines = []
+        for (field, scale, weight, cap), unit in zip(self.terms, self.units):
+            line = f"1 {unit} = {weight:g} point{'' if weight == 1 else 's'}"
+            if cap is not None:
+                line += f" (up to {cap:g} per workout)"
+            lines.append(line)
+        for activity, multiplier in self.activity_multipliers.items():
+            lines.append(f"{activity.capitalize()} workouts earn {multiplier:g}x points")
+        if self.max_points_per_workout is not None:
+            lines.append(f"At most {self.max_points_per_workout:g} points per workout")
+        return lines
+
+    def to_sql(self, activity_column=None):
+        """
+        The same rules as a BigQuery expression over the Workouts table.
+
+        Args:
+            activity_column: Column holding the activity type, required when
+                the rules have per-activity multipliers
+
+        Returns:
+            SQL expression string for one workout's points
+        """
+        terms = []
+        for field, scale, weight, cap in self.terms:
+            value = f"{SCORABLE_FIELDS[field]} * {scale!r} * {weight!r}"
+            if cap is not None:
+                value = f"LEAST({value}, {float(cap)!r})"
+            terms.append(f"TRUNC({value})")
+        expression = " + ".join(terms) or "0"
+
+        if self.activity_multipliers:
+            if activity_column is None:
+                raise ValueError(f"Scoring rules version {self.version} need an activity column")
+            cases = " ".join(
+                f"WHEN '{activity}' THEN {multiplier!r}" for activity, multiplier in self.activity_multipliers.items()
+            )
+            expression = f"TRUNC(({expression}) * CASE {activity_column} {cases} ELSE {self.default_multiplier!r} END)"
+        elif self.default_multiplier != 1:
+            expression = f"TRUNC(({expression}) * {self.default_multiplier!r})"
+
+        if self.max_points_per_workout is not None:
+            expression = f"LEAST({expression}, {self.max_points_per_workout})"
+        return f"CAST({expression} AS INT64)"
+
+
+def workout_duration_seconds(workout):
+    """
+    Seconds between a workout's start and end timestamps, 0 when either is
+    missing or invalid.
+    """
+    def parse(timestamp):
+        if isinstance(timestamp, str):
+            return datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+        return timestamp
+
+    try:
+        return (parse(workout['end_timestamp']) - parse(workout['start_timestamp'])).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def load_rules(path=RULES_FILE):
+    """
+    Load and compile every version in a rules file.
+
+    Returns:
+        Tuple of (dictionary of version -> ScoringRules, active version)
+    """
+    with open(path) as rules_file:
+        config = json.load(rules_file)
+    rule_sets = {spec['version']: ScoringRules(spec) for spec in config['versions']}
+    if config['active_version'] not in rule_sets:
+        raise ValueError(f"Active scoring rules version {config['active_version']} is not defined")
+    return rule_sets, config['active_version']
+
+
+def get_rules(version=None):
+    """
+    The compiled rules for a version (the active version by default).
+
+    The rules file is read and compiled once per process.
+    """
+    global _rule_sets, _active_version
+    if _rule_sets is None:
+        _rule_sets, _active_version = load_rules()
+    return _rule_sets[_active_version if version is None else version]
@@ -0,0 +1,124 @@
+#############################################################################
+# scoring_rules_test.py
+#
+# This file contains tests for scoring_rules.py.
+#############################################################################
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from scoring_rules import ScoringRules, load_rules, get_rules, SCORABLE_FIELDS
+from scoring import workouts_to_arrays
+
+RUN_RULES = {
+    'version': 2,
+    'terms': [
+        {'field': 'calories_burned', 'weight': 1, 'cap': 500},
+        {'field': 'distance', 'scale': 0.621371, 'weight': 50},
+    ],
+    'activity_multipliers': {'run': 1.5, 'walk': 0.5},
+    'default_multiplier': 1,
+    'max_points_per_workout': 1000,
+}
+
+DURATION_RULES = {
+    'version': 3,
+    'terms': [
+        {'field': 'calories_burned', 'weight': 1},
+        {'field': 'duration_seconds', 'scale': 1 / 60, 'weight': 2, 'cap': 120, 'unit': "minute of exercise"},
+    ],
+}
+
+
+class TestScoringRules(unittest.TestCase):
+
+    def test_active_rules_match_original_formula(self):
+        """Tests that the active rules score 1 point per calorie plus int(miles * 5)."""
+        rules = get_rules()
+        for calories, distance in [(300, 10.0), (0, 0.0), (250, 3.3), (17, 0.33)]:
+            expected = calories + int(distance * 0.621371 * 5)
+            self.assertEqual(rules.score_workout({'calories_burned': calories, 'distance': distance}), expected)
+        self.assertEqual(rules.score_workout({}), 0)
+
+    def test_caps_and_multipliers(self):
+        """Tests term caps, activity multipliers and the per-workout cap."""
+        rules = ScoringRules(RUN_RULES)
+        arrays = {
+            'calories_burned': np.array([800, 100, 100, 100, 900]),
+            'distance': np.array([0.0, 1.0, 1.0, 1.0, 40.0]),
+            'activity': np.array(['cycle', 'run', 'walk', 'swim', 'run'], dtype=object),
+        }
+        # 1 km is int(31.06855) = 31 points
+        self.assertEqual(list(rules.score(arrays)), [500, 196, 65, 131, 1000])
+        self.assertEqual(rules.score_workout({'calories_burned': 100, 'distance': 1.0, 'activity': 'run'}), 196)
+
+    def test_score_workout_matches_batch_scoring(self):
+        """Tests that scoring a workout on ingest matches scoring it in bulk, including its duration."""
+        rules = ScoringRules(DURATION_RULES)
+        workouts = [
+            {'start_timestamp': '2025-03-12 08:00:00', 'end_timestamp': '2025-03-12 08:45:30', 'calories_burned': 300},
+            {'start_timestamp': '2025-03-12 08:00:00', 'end_timestamp': '2025-03-12 10:00:00', 'calories_burned': 10},
+            {'start_timestamp': '2025-03-12 08:00:00', 'end_timestamp': None, 'calories_burned': 50},
+            {'start_timestamp': 'not a date', 'end_timestamp': '2025-03-12 10:00:00', 'calories_burned': 50},
+        ]
+        batch_points = rules.score(workouts_to_arrays(workouts))
+        self.assertEqual([rules.score_workout(workout) for workout in workouts], list(batch_points))
+        self.assertEqual(list(batch_points), [391, 130, 50, 50])
+        # The rollup rebuild scores the same field from the Workouts timestamps
+        self.assertIn(SCORABLE_FIELDS['duration_seconds'], rules.to_sql())
+
+    def test_describe(self):
+        """Tests the explanation of the rules shown to users."""
+        self.assertEqual(get_rules().describe(), ["1 calorie burned = 1 point", "1 mile traveled = 5 points"])
+        self.assertEqual(ScoringRules(RUN_RULES).describe(), [
+            "1 calorie burned = 1 point (up to 500 per workout)",
+            "1 km traveled = 50 points",
+            "Run workouts earn 1.5x points",
+            "Walk workouts earn 0.5x points",
+            "At most 1000 points per workout",
+        ])
+
+    def test_to_sql(self):
+        """Tests the BigQuery expression compiled from the rules."""
+        sql = ScoringRules(RUN_RULES).to_sql(activity_column='Activity')
+        self.assertIn("LEAST(IFNULL(CaloriesBurned, 0) * 1.0 * 1.0, 500.0)", sql)
+        self.assertIn("WHEN 'run' THEN 1.5", sql)
+        self.assertIn("LEAST(", sql)
+        self.assertTrue(sql.startswith("CAST("))
+        # Multipliers can't be applied without an activity column
+        with self.assertRaises(ValueError):
+            ScoringRules(RUN_RULES).to_sql()
+
+    def test_unknown_field(self):
+        """Tests that rules over fields workouts don't have are rejected."""
+        with self.assertRaises(ValueError):
+            ScoringRules({'version': 3, 'terms': [{'field': 'heart_rate', 'weight': 1}]})
+
+    def test_load_rules_versions(self):
+        """Tests loading several rule versions from a file."""
+        config = {
+            'active_version': 2,
+            'versions': [
+                {'version': 1, 'terms': [{'field': 'calories_burned', 'weight': 1}]},
+                RUN_RULES,
+            ],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rules.json')
+            with open(path, 'w') as rules_file:
+                json.dump(config, rules_file)
+            rule_sets, active_version = load_rules(path)
+
+            self.assertEqual(active_version, 2)
+            self.assertEqual(sorted(rule_sets), [1, 2])
+
+            config['active_version'] = 5
+            with open(path, 'w') as rules_file:
+                json.dump(config, rules_file)
+            with self.assertRaises(ValueError):
+                load_rules(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
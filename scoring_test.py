@@ -0,0 +1,56 @@
+#############################################################################
+# scoring_test.py
+#
+# This file contains tests for scoring.py.
+#############################################################################
+import datetime
+import unittest
+import numpy as np
+import benchmark_utils
+from benchmark_utils import legacy_points
+from scoring import calculate_points_by_period, score_periods_by_user, get_period_boundaries, workouts_to_arrays, SCORING_PERIODS
+
+NOW = datetime.datetime(2025, 3, 12, 15, 30)  # a Wednesday
+
+
+def random_workouts(count, seed=7):
+    return benchmark_utils.random_workouts(count, NOW, seed)
+
+
+class TestScoring(unittest.TestCase):
+
+    def test_matches_per_period_loop(self):
+        """Tests that every period matches scoring one workout at a time."""
+        workouts = random_workouts(500)
+        points = calculate_points_by_period(workouts, NOW)
+        for period in SCORING_PERIODS:
+            self.assertEqual(points[period], legacy_points(workouts, period, NOW), period)
+
+    def test_invalid_timestamps_are_skipped(self):
+        """Tests that workouts with unparseable timestamps earn no points."""
+        workouts = [
+            {'start_timestamp': '2025-03-12 08:00:00', 'calories_burned': 100, 'distance': 1.0},
+            {'start_timestamp': 'not a date', 'calories_burned': 999, 'distance': 50.0},
+            {'start_timestamp': None, 'calories_burned': 999, 'distance': 50.0},
+        ]
+        points = calculate_points_by_period(workouts, NOW)
+        self.assertEqual(points, {period: 103 for period in SCORING_PERIODS})
+
+    def test_no_workouts(self):
+        """Tests that an empty workout list scores 0 for every period."""
+        self.assertEqual(calculate_points_by_period([], NOW), {period: 0 for period in SCORING_PERIODS})
+
+    def test_score_periods_by_user(self):
+        """Tests per-user totals against scoring each user separately."""
+        workouts = random_workouts(300, seed=3)
+        codes = np.array([i % 4 for i in range(len(workouts))])
+        totals = score_periods_by_user(codes, 4, workouts_to_arrays(workouts), get_period_boundaries(SCORING_PERIODS, NOW))
+
+        self.assertEqual(totals.shape, (4, len(SCORING_PERIODS)))
+        for user in range(4):
+            expected = calculate_points_by_period(workouts[user::4], NOW)
+            self.assertEqual(list(totals[user]), [expected[period] for period in SCORING_PERIODS])
+
+
+if __name__ == '__main__':
+    unittest.main()
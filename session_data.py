@@ -0,0 +1,141 @@
+#############################################################################
+# session_data.py
+#
+# This file contains the per-session data context. Entities a page loads
+# for the session (profiles, workouts, all-time totals, posts, GenAI
+# advice) are kept in
+# st.session_state, so moving between pages reuses them instead of
+# fetching them again.
+#
+# Every entity has a version. Writes made through this file (or reported
+# with invalidate) bump the version in a process-wide registry, and any
+# session holding an older copy reloads it on its next read.
+#############################################################################
+
+import threading
+import streamlit as st
+import data_fetcher
+import leaderboard_utils
+
+CONTEXT_KEY = "data_context"
+
+# Process-wide write versions: (kind, key) -> version
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _loaders():
+    # Looked up at call time so tests can patch data_fetcher
+    return {
+        'profile': data_fetcher.get_user_profile,
+        'workouts': data_fetcher.get_user_workouts,
+        'totals': leaderboard_utils.get_user_totals,
+        'posts': data_fetcher.get_user_posts,
+        'advice': data_fetcher.get_genai_advice,
+    }
+
+
+def get_version(kind, key):
+    """The current version of an entity (0 until it is first written)."""
+    return _versions.get((kind, key), 0)
+
+
+def invalidate(kind, key):
+    """
+    Record that an entity changed, so every session reloads it.
+
+    Args:
+        kind: "profile", "workouts", "totals", "posts" or "advice"
+        key: The entity's key, e.g. a user ID
+
+    Returns:
+        The entity's new version
+    """
+    with _versions_lock:
+        _versions[(kind, key)] = _versions.get((kind, key), 0) + 1
+        return _versions[(kind, key)]
+
+
+def get_context():
+    """
+    The current session's loaded entities.
+
+    Returns:
+        Dictionary of (kind, key) -> (version, value) in st.session_state
+    """
+    if CONTEXT_KEY not in st.session_state:
+        st.session_state[CONTEXT_KEY] = {}
+    return st.session_state[CONTEXT_KEY]
+
+
+def get_entity(kind, key):
+    """
+    Get an entity from the session, loading it only when it is missing or
+    was written since it was loaded.
+
+    Args:
+        kind: "profile", "workouts", "totals", "posts" or "advice"
+        key: The entity's key, e.g. a user ID
+
+    Returns:
+        The value returned by the matching data_fetcher function
+    """
+    context = get_context()
+    version = get_version(kind, key)
+    cached = context.get((kind, key))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    value = _loaders()[kind](key)
+    context[(kind, key)] = (version, value)
+    return value
+
+
+def get_profile(user_id):
+    """A user's profile (see data_fetcher.get_user_profile)."""
+    return get_entity('profile', user_id)
+
+
+def get_workouts(user_id):
+    """A user's workouts (see data_fetcher.get_user_workouts)."""
+    return get_entity('workouts', user_id)
+
+
+def get_totals(user_id):
+    """A user's all-time totals (see leaderboard_utils.get_user_totals)."""
+    return get_entity('totals', user_id)
+
+
+def get_posts(user_id):
+    """A user's posts (see data_fetcher.get_user_posts)."""
+    return get_entity('posts', user_id)
+
+
+def get_advice(user_id):
+    """GenAI advice for a user, generated once per session (see data_fetcher.get_genai_advice)."""
+    return get_entity('advice', user_id)
+
+
+def create_post(user_id, content, image=None):
+    """
+    Store a new post and invalidate the author's posts.
+
+    Returns:
+        The new post (see data_fetcher.create_user_post)
+    """
+    post = data_fetcher.create_user_post(user_id, content, image)
+    invalidate('posts', user_id)
+    return post
+
+
+def record_workout(user_id, workout):
+    """
+    Store a new workout and invalidate the user's workouts and totals.
+
+    Returns:
+        Integer points earned by the workout (see leaderboard_utils.record_workout)
+    """
+    points = leaderboard_utils.record_workout(user_id, workout)
+    invalidate('workouts', user_id)
+    invalidate('totals', user_id)
+    return points
@@ -0,0 +1,75 @@
+#############################################################################
+# session_data_test.py
+#
+# This file contains tests for session_data.py.
+#############################################################################
+import unittest
+from unittest.mock import patch
+import streamlit as st
+import session_data
+
+
+@patch('data_fetcher.get_user_workouts')
+@patch('data_fetcher.get_user_profile')
+class TestSessionData(unittest.TestCase):
+
+    def setUp(self):
+        st.session_state.clear()
+        session_data._versions.clear()
+
+    def test_loads_once_per_session(self, mock_get_user_profile, mock_get_user_workouts):
+        """Tests that repeated reads in a session reuse the loaded entity."""
+        mock_get_user_profile.return_value = {'full_name': 'Remi'}
+        mock_get_user_workouts.return_value = [{'workout_id': 'w1'}]
+
+        for _ in range(3):
+            self.assertEqual(session_data.get_profile('user1'), {'full_name': 'Remi'})
+            self.assertEqual(session_data.get_workouts('user1'), [{'workout_id': 'w1'}])
+        mock_get_user_profile.assert_called_once_with('user1')
+        mock_get_user_workouts.assert_called_once_with('user1')
+
+        # Other users are separate entities
+        session_data.get_profile('user2')
+        self.assertEqual(mock_get_user_profile.call_count, 2)
+
+    def test_invalidation_reloads_in_every_session(self, mock_get_user_profile, mock_get_user_workouts):
+        """Tests that a write makes every session reload the entity once."""
+        mock_get_user_workouts.return_value = []
+        session_data.get_workouts('user1')
+        first_session = {session_data.CONTEXT_KEY: dict(session_data.get_context())}
+
+        self.assertEqual(session_data.invalidate('workouts', 'user1'), 1)
+        self.assertEqual(session_data.get_version('workouts', 'user1'), 1)
+        session_data.get_workouts('user1')
+        session_data.get_workouts('user1')
+        self.assertEqual(mock_get_user_workouts.call_count, 2)
+
+        # Another session that loaded before the write also reloads
+        st.session_state.clear()
+        st.session_state.update(first_session)
+        session_data.get_workouts('user1')
+        self.assertEqual(mock_get_user_workouts.call_count, 3)
+
+    @patch('data_fetcher.get_user_posts')
+    @patch('data_fetcher.create_user_post')
+    def test_create_post_invalidates_posts(self, mock_create_user_post, mock_get_user_posts, mock_get_user_profile, mock_get_user_workouts):
+        """Tests that sharing a post refreshes the author's posts."""
+        mock_get_user_posts.return_value = []
+        session_data.get_posts('user1')
+        session_data.create_post('user1', "Ran 5 miles!")
+        mock_create_user_post.assert_called_once_with('user1', "Ran 5 miles!", None)
+
+        mock_get_user_posts.return_value = [{'post_id': 'p1'}]
+        self.assertEqual(session_data.get_posts('user1'), [{'post_id': 'p1'}])
+
+    @patch('leaderboard_utils.record_workout', return_value=120)
+    def test_record_workout_invalidates_workouts(self, mock_record_workout, mock_get_user_profile, mock_get_user_workouts):
+        """Tests that recording a workout refreshes the user's workouts."""
+        session_data.get_workouts('user1')
+        self.assertEqual(session_data.record_workout('user1', {'workout_id': 'w2'}), 120)
+        session_data.get_workouts('user1')
+        self.assertEqual(mock_get_user_workouts.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
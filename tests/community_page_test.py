@@ -13,7 +13,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from community_page import toggle_view, set_time_period
 from leaderboard_utils import (
     calculate_user_points, 
+    calculate_workout_points,
+    record_workout,
+    get_rollup_period,
+    get_rolling_window_days,
     get_user_rankings, 
+    get_friends_leaderboard,
+    get_user_percentile,
     get_user_activity_metrics, 
     get_user_stats
 )
@@ -25,6 +31,28 @@ from leaderboard_utils import (
 class TestLeaderboardUtils(unittest.TestCase):
     """Test cases for the leaderboard utility functions."""
 
+    def setUp(self):
+        """Start every test with empty in-memory leaderboard indexes."""
+        import data_fetcher
+        import leaderboard_utils
+        leaderboard_utils._daily_index = None
+        leaderboard_utils._ranking_indexes.clear()
+        data_fetcher._friend_graph = None
+        
+        leaderboard_utils._snapshots.clear()
+        leaderboard_utils._rankings_updated_at.clear()
+        leaderboard_utils._badge_states.clear()
+        leaderboard_utils._new_badges.clear()
+        
+        # Nobody has friends, batch snapshots or badge states unless a test says otherwise
+        patcher = patch('data_fetcher.get_friendships', return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ['get_latest_leaderboard_snapshot', 'get_badge_state', 'save_badge_state']:
+            patcher = patch(f'leaderboard_utils.{name}', return_value=None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     def test_calculate_user_points(self, mock_gen_model, mock_vertex_init, mock_bq_client):
         """Test the calculation of user points based on workouts."""
         # Simply verify the function returns a valid result for each time period
@@ -43,9 +71,78 @@ class TestLeaderboardUtils(unittest.TestCase):
         self.assertGreaterEqual(week_points, day_points)
         self.assertGreaterEqual(month_points, week_points)
         self.assertGreaterEqual(year_points, month_points)
+        
+        # Each period is one rollup lookup, not a scan of the workout history
+        self.assertEqual(mock_bq_client.return_value.query.call_count, 4)
+    
+    def test_calculate_workout_points(self, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test the points formula for a single workout."""
+        # 300 calories + int(10 km * 0.621371 * 5) = 300 + 31
+        self.assertEqual(calculate_workout_points({'calories_burned': 300, 'distance': 10.0}), 331)
+        self.assertEqual(calculate_workout_points({}), 0)
+    
+    def test_get_rollup_period(self, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that time periods map onto the rollup granularities."""
+        import datetime
+        now = datetime.datetime(2025, 3, 20, 15, 30)  # A Thursday
+        self.assertEqual(get_rollup_period('day', now), ('day', datetime.date(2025, 3, 20)))
+        self.assertEqual(get_rollup_period('week', now), ('week', datetime.date(2025, 3, 17)))
+        self.assertEqual(get_rollup_period('month', now), ('month', datetime.date(2025, 3, 1)))
+        self.assertEqual(get_rollup_period('year', now), ('year', datetime.date(2025, 1, 1)))
+        self.assertEqual(get_rollup_period('all', now), ('year', datetime.date(1970, 1, 1)))
+    
+    @patch('leaderboard_utils.create_user_workout')
+    def test_record_workout(self, mock_create_user_workout, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that a new workout is stored together with its points."""
+        workout = {'workout_id': 'workout9', 'start_timestamp': '2025-03-20 12:00:00', 'calories_burned': 100, 'distance': 2.0}
+        self.assertEqual(record_workout('user1', workout), 106)
+        mock_create_user_workout.assert_called_once_with('user1', workout, 106, 1)
+    
+    @patch('leaderboard_utils.create_user_workout')
+    def test_record_workout_updates_badges(self, mock_create_user_workout, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that recorded workouts update the stored badge state and emit new badges."""
+        import leaderboard_utils
+        first = {'workout_id': 'w1', 'start_timestamp': '2025-03-20 12:00:00', 'end_timestamp': '2025-03-20 12:30:00', 'calories_burned': 100, 'distance': 0.0}
+        second = {'workout_id': 'w2', 'start_timestamp': '2025-03-21 12:00:00', 'end_timestamp': '2025-03-21 12:20:00', 'calories_burned': 150, 'distance': 0.0}
+        record_workout('user1', first)
+        record_workout('user1', second)
+        
+        self.assertEqual(leaderboard_utils.pop_new_badges('user1'), ['calorie_record'])
+        self.assertEqual(leaderboard_utils.pop_new_badges('user1'), [])
+        self.assertEqual(leaderboard_utils.get_user_badges('user1'), ['calorie_record'])
+        
+        # The state was loaded once and saved after every workout
+        leaderboard_utils.get_badge_state.assert_called_once_with('user1')
+        self.assertEqual(leaderboard_utils.save_badge_state.call_count, 2)
+        saved = leaderboard_utils.save_badge_state.call_args[0][0]
+        self.assertEqual(saved['CurrentStreak'], 2)
+        self.assertEqual(saved['WorkoutCount'], 2)
+        self.assertEqual(saved['Badges'], ['calorie_record'])
+    
+    @patch('leaderboard_utils.create_user_workout')
+    def test_record_workout_publishes_points(self, mock_create_user_workout, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that subscribed leaderboards receive the points of recorded workouts."""
+        import leaderboard_utils
+        subscription = leaderboard_utils.subscribe_to_points(min_interval=5)
+        record_workout('user1', {'workout_id': 'w1', 'start_timestamp': '2025-03-20 12:00:00', 'calories_burned': 100, 'distance': 2.0})
+        record_workout('user2', {'workout_id': 'w2', 'start_timestamp': '2025-03-20 12:05:00', 'calories_burned': 50, 'distance': 0.0})
+        
+        self.assertEqual(subscription.poll(now=0.0), {'deltas': {'user1': 106, 'user2': 50}, 'workouts': 2})
+        self.assertIsNone(subscription.poll(now=1.0))
     
+    def mock_leaderboard_rows(self, mock_bq_client):
+        """Make the mocked BigQuery client return aggregated leaderboard rows."""
+        rows = [
+            MagicMock(UserId=f"user{i}", Points=300 - i * 20, Name=f"User {i}", ImageUrl="", Rank=i, RankedUsers=6)
+            for i in range(1, 7)
+        ]
+        mock_bq_client.return_value.query.return_value.result.return_value = rows
+        return rows
+
     def test_get_user_rankings(self, mock_gen_model, mock_vertex_init, mock_bq_client):
         """Test that user rankings are retrieved correctly for different time periods."""
+        self.mock_leaderboard_rows(mock_bq_client)
+        
         # Test for each time period
         for period in ['day', 'week', 'month', 'year']:
             rankings = get_user_rankings(period)
@@ -67,6 +164,33 @@ class TestLeaderboardUtils(unittest.TestCase):
                 self.assertIsInstance(rank['user_id'], str)
                 self.assertIsInstance(rank['name'], str)
                 self.assertIsInstance(rank['points'], int)
+            
+            # Check that rankings are sorted by points
+            points = [rank['points'] for rank in rankings]
+            self.assertEqual(points, sorted(points, reverse=True))
+        
+        # Each period's ranking index is loaded by a single query and then reused
+        self.assertEqual(mock_bq_client.return_value.query.call_count, 4)
+        get_user_rankings('week')
+        get_user_stats('user3', 'week')
+        self.assertEqual(mock_bq_client.return_value.query.call_count, 4)
+    
+    @patch('leaderboard_utils.get_user_workout_points')
+    def test_get_user_activity_metrics_from_stored_points(self, mock_get_user_workout_points, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that the points summary lists stored workout points without re-scoring."""
+        import datetime
+        mock_get_user_workout_points.return_value = iter([
+            {'workout_id': 'w3', 'number': 2, 'start_timestamp': datetime.datetime(2025, 3, 20, 18), 'calories_burned': 320, 'distance': 10.0, 'points': 999},
+            {'workout_id': 'w1', 'number': 1, 'start_timestamp': datetime.datetime(2025, 3, 18, 7), 'calories_burned': 28, 'distance': 1.1, 'points': 31},
+        ])
+        metrics = get_user_activity_metrics('user1', 'last 7 days', limit=10)
+        
+        self.assertEqual([m['workout'] for m in metrics], [2, 1])
+        self.assertEqual(metrics[0]['points'], 999)
+        self.assertEqual(metrics[0]['miles'], 6.2)
+        user_id, since, limit = mock_get_user_workout_points.call_args[0]
+        self.assertEqual((user_id, limit), ('user1', 10))
+        self.assertEqual(since, datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=6), datetime.time()))
     
     def test_get_user_activity_metrics(self, mock_gen_model, mock_vertex_init, mock_bq_client):
         """Test that activity metrics are retrieved correctly for different time periods."""
@@ -92,6 +216,8 @@ class TestLeaderboardUtils(unittest.TestCase):
     
     def test_get_user_stats(self, mock_gen_model, mock_vertex_init, mock_bq_client):
         """Test that user stats are retrieved correctly for different time periods."""
+        self.mock_leaderboard_rows(mock_bq_client)
+        
         # Test for each time period
         for period in ['day', 'week', 'month', 'year']:
             stats = get_user_stats('user1', period)
@@ -104,13 +230,159 @@ class TestLeaderboardUtils(unittest.TestCase):
             self.assertIn('global_rank', stats)
             self.assertIn('friend_rank', stats)
             self.assertIn('badges', stats)
+            self.assertIn('top_percent', stats)
             
             # Check types
             self.assertIsInstance(stats['total_points'], int)
             self.assertIsInstance(stats['global_rank'], int)
             self.assertIsInstance(stats['friend_rank'], int)
             self.assertIsInstance(stats['badges'], int)
-
+            
+            # user1 tops the mocked leaderboard
+            self.assertEqual(stats['total_points'], 280)
+            self.assertEqual(stats['global_rank'], 1)
+    
+    @patch('leaderboard_utils.get_daily_points')
+    def test_rolling_windows(self, mock_get_daily_points, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that rolling windows are answered from the in-memory daily index."""
+        import datetime
+        
+        today = datetime.date.today()
+        mock_get_daily_points.return_value = [
+            {'user_id': 'user1', 'day': today, 'points': 100, 'name': 'Remi', 'profile_image': ''},
+            {'user_id': 'user2', 'day': today - datetime.timedelta(days=3), 'points': 150, 'name': 'Blake', 'profile_image': ''},
+            {'user_id': 'user2', 'day': today - datetime.timedelta(days=20), 'points': 500, 'name': 'Blake', 'profile_image': ''},
+        ]
+        
+        self.assertEqual(get_rolling_window_days('last 7 days'), 7)
+        self.assertEqual(get_rolling_window_days('Last 30 Days'), 30)
+        self.assertIsNone(get_rolling_window_days('week'))
+        
+        self.assertEqual(calculate_user_points('user2', 'last 7 days'), 150)
+        self.assertEqual(calculate_user_points('user2', 'last 30 days'), 650)
+        
+        rankings = get_user_rankings('last 7 days')
+        self.assertEqual([(r['rank'], r['user_id'], r['points']) for r in rankings], [(1, 'user2', 150), (2, 'user1', 100)])
+        self.assertEqual(rankings[0]['name'], 'Blake')
+        
+        stats = get_user_stats('user1', 'last 30 days')
+        self.assertEqual(stats['total_points'], 100)
+        self.assertEqual(stats['global_rank'], 2)
+        
+        # One load for all of the above, and nothing from BigQuery directly
+        mock_get_daily_points.assert_called_once()
+        mock_bq_client.return_value.query.assert_not_called()
+    
+    @patch('data_fetcher.get_friendships')
+    def test_get_friends_leaderboard(self, mock_get_friendships, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test ranking a user among their friends from the cached indexes."""
+        self.mock_leaderboard_rows(mock_bq_client)
+        mock_get_friendships.return_value = [('user3', 'user1'), ('user5', 'user3'), ('user3', 'user9'), ('user2', 'user4')]
+        
+        friends = get_friends_leaderboard('user3', 'week')
+        self.assertEqual(friends['friend_rank'], 2)
+        self.assertEqual(
+            [(row['rank'], row['user_id'], row['points']) for row in friends['rankings']],
+            [(1, 'user1', 280), (2, 'user3', 240), (3, 'user5', 200), (4, 'user9', 0)]
+        )
+        self.assertEqual(friends['rankings'][0]['name'], 'User 1')
+        self.assertEqual(friends['rankings'][3]['name'], 'user9')
+        
+        # A user without friends ranks first among themselves
+        self.assertEqual(get_friends_leaderboard('user6', 'week')['friend_rank'], 1)
+        self.assertEqual(get_user_stats('user4', 'week')['friend_rank'], 2)
+        
+        # One bulk load each for the friends and the points, whatever the number of friends
+        mock_get_friendships.assert_called_once()
+        mock_bq_client.return_value.query.assert_called_once()
+    
+    @patch('leaderboard_utils.create_user_workout')
+    def test_get_user_rankings_from_snapshot(self, mock_create_user_workout, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that a current batch snapshot is served until a newer workout is recorded."""
+        import datetime
+        self.mock_leaderboard_rows(mock_bq_client)
+        now = datetime.datetime.now()
+        snapshot = {
+            'version': now - datetime.timedelta(minutes=1),
+            'rankings': [
+                {'rank': i, 'user_id': f'batch{i}', 'name': f'Batch {i}', 'points': 900 - i, 'profile_image': ''}
+                for i in range(1, 11)
+            ]
+        }
+        
+        with patch('leaderboard_utils.get_latest_leaderboard_snapshot', return_value=snapshot) as mock_snapshot:
+            rankings = get_user_rankings('week')
+            self.assertEqual([row['user_id'] for row in rankings], ['batch1', 'batch2', 'batch3', 'batch4', 'batch5'])
+            mock_bq_client.return_value.query.assert_not_called()
+            
+            # Not enough rows in the snapshot for the request
+            self.assertEqual(get_user_rankings('week', limit=20)[0]['user_id'], 'user1')
+            
+            # A workout recorded after the snapshot makes the live index authoritative
+            record_workout('user6', {'workout_id': 'w1', 'start_timestamp': now.strftime('%Y-%m-%d %H:%M:%S'), 'calories_burned': 50, 'distance': 0.0})
+            self.assertEqual(get_user_rankings('week')[0]['user_id'], 'user1')
+            mock_snapshot.assert_called_once()
+        
+        # Snapshots that are too old are ignored
+        import leaderboard_utils
+        leaderboard_utils._snapshots.clear()
+        snapshot['version'] = now - datetime.timedelta(hours=2)
+        with patch('leaderboard_utils.get_latest_leaderboard_snapshot', return_value=snapshot):
+            self.assertIsNone(leaderboard_utils.get_leaderboard_snapshot('day'))
+    
+    def test_get_user_percentile(self, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test "top X%" standings counted from the ranking index."""
+        self.mock_leaderboard_rows(mock_bq_client)
+        
+        # Six users with points: the best is in the top 17%, the last in the top 100%
+        self.assertEqual(get_user_percentile('user1', 'month'), 17)
+        self.assertEqual(get_user_percentile('user3', 'month'), 50)
+        self.assertEqual(get_user_percentile('user6', 'month'), 100)
+        self.assertEqual(get_user_percentile('user9', 'month'), 100)
+        self.assertEqual(get_user_stats('user2', 'month')['top_percent'], 34)
+        mock_bq_client.return_value.query.assert_called_once()
+    
+    def test_get_user_stats_without_points(self, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that a user without points ranks after everyone who has some."""
+        self.mock_leaderboard_rows(mock_bq_client)
+        
+        stats = get_user_stats('user9', 'week')
+        self.assertEqual(stats['total_points'], 0)
+        self.assertEqual(stats['global_rank'], 7)
+    
+    @patch('leaderboard_utils.create_user_workout')
+    def test_record_workout_updates_rankings(self, mock_create_user_workout, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that a new workout moves the user up without reloading the rankings."""
+        import datetime
+        self.mock_leaderboard_rows(mock_bq_client)
+        self.assertEqual(get_user_stats('user5', 'week')['global_rank'], 5)
+        
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        record_workout('user5', {'workout_id': 'w1', 'start_timestamp': now, 'calories_burned': 500, 'distance': 0.0})
+        
+        stats = get_user_stats('user5', 'week')
+        self.assertEqual(stats['total_points'], 700)
+        self.assertEqual(stats['global_rank'], 1)
+        self.assertEqual(get_user_rankings('week', limit=1)[0]['name'], 'User 5')
+        mock_bq_client.return_value.query.assert_called_once()
+    
+    @patch('leaderboard_utils.create_user_workout')
+    def test_record_workout_updates_percentile(self, mock_create_user_workout, mock_gen_model, mock_vertex_init, mock_bq_client):
+        """Test that a user's "top X%" follows their new total right away."""
+        import datetime
+        self.mock_leaderboard_rows(mock_bq_client)
+        self.assertEqual(get_user_percentile('user6', 'month'), 100)
+        
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for workout_id in ('w1', 'w2', 'w3'):
+            record_workout('user6', {'workout_id': workout_id, 'start_timestamp': now, 'calories_burned': 2000, 'distance': 0.0})
+        self.assertEqual(get_user_percentile('user6', 'month'), 17)
+        
+        # A new earner joins the ranked users
+        record_workout('user9', {'workout_id': 'w4', 'start_timestamp': now, 'calories_burned': 1, 'distance': 0.0})
+        self.assertEqual(get_user_percentile('user9', 'month'), 100)
+        self.assertEqual(get_user_percentile('user6', 'month'), 15)
+        mock_bq_client.return_value.query.assert_called_once()
 
 @patch('google.cloud.bigquery.Client')
 @patch('vertexai.init')
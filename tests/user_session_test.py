@@ -0,0 +1,101 @@
+#############################################################################
+# user_session_test.py
+#
+# This file contains tests for user_session.py and how pages use it.
+#############################################################################
+import importlib
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+import streamlit as st
+
+# Add the parent directory to sys.path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import user_session
+
+
+def fresh_import(module_name):
+    """Import a page module from scratch, running its top-level script."""
+    sys.modules.pop(module_name, None)
+    return importlib.import_module(module_name)
+
+
+@patch('data_fetcher.get_user_profile', return_value={'full_name': 'Remi', 'profile_image': 'https://example.com/remi.jpg', 'friends': []})
+@patch('requests.get')
+@patch('data_fetcher.GenerativeModel')
+@patch('data_fetcher.vertexai.init')
+@patch('google.cloud.bigquery.Client')
+class TestUserSession(unittest.TestCase):
+    """Pages read the user from the session instead of importing home_page."""
+
+    def setUp(self):
+        import session_data
+        st.session_state.clear()
+        session_data._versions.clear()
+        sys.modules.pop('home_page', None)
+
+    def test_session_user_is_stable(self, mock_bq_client, mock_vertex_init, mock_gen_model, mock_requests_get, mock_get_user_profile):
+        """The first call picks a user and every later call returns it."""
+        user_id = user_session.get_user_id()
+        self.assertEqual(user_session.get_user_id(), user_id)
+        
+        user_session.set_user_id('user2')
+        self.assertEqual(user_session.get_user_id(), 'user2')
+        with self.assertRaises(ValueError):
+            user_session.set_user_id('nobody')
+
+    def test_importing_session_makes_no_remote_calls(self, mock_bq_client, mock_vertex_init, mock_gen_model, mock_requests_get, mock_get_user_profile):
+        """Importing the session module and reading the user touches no service."""
+        fresh_import('user_session').get_user_id()
+        
+        mock_bq_client.assert_not_called()
+        mock_vertex_init.assert_not_called()
+        mock_gen_model.assert_not_called()
+        mock_requests_get.assert_not_called()
+
+    def test_importing_activity_page_skips_home_page(self, mock_bq_client, mock_vertex_init, mock_gen_model, mock_requests_get, mock_get_user_profile):
+        """The Activity page loads only its own data: no GenAI advice and no posts."""
+        user_session.set_user_id('user1')
+        fresh_import('activity_page')
+        
+        self.assertNotIn('home_page', sys.modules)
+        mock_vertex_init.assert_not_called()
+        mock_gen_model.assert_not_called()
+        queries = [call.args[0] for call in mock_bq_client.return_value.query.call_args_list]
+        self.assertFalse(any('Posts' in query for query in queries))
+
+    def test_pages_share_the_session_user(self, mock_bq_client, mock_vertex_init, mock_gen_model, mock_requests_get, mock_get_user_profile):
+        """Every page works with the same user within a session."""
+        user_session.set_user_id('user3')
+        self.assertEqual(fresh_import('activity_page').user_id, 'user3')
+        self.assertEqual(fresh_import('community_page').userId, 'user3')
+        self.assertNotIn('home_page', sys.modules)
+
+
+    def test_navigating_back_makes_no_remote_calls(self, mock_bq_client, mock_vertex_init, mock_gen_model, mock_requests_get, mock_get_user_profile):
+        """After each page's first load, moving between pages reuses the session's data."""
+        workout = {
+            'workout_id': 'w1', 'start_timestamp': '2025-03-20 12:00:00', 'end_timestamp': '2025-03-20 12:30:00',
+            'start_lat_lng': [0, 0], 'end_lat_lng': [0, 0], 'distance': 5.0, 'steps': 6000, 'calories_burned': 300
+        }
+        user_session.set_user_id('user1')
+        with patch('data_fetcher.get_user_workouts', return_value=[workout]) as mock_get_user_workouts:
+            for page in ['home_page', 'activity_page', 'community_page']:
+                fresh_import(page)
+            queries = mock_bq_client.return_value.query.call_count
+            profiles = mock_get_user_profile.call_count
+            advice = mock_gen_model.call_count
+            
+            for page in ['activity_page', 'home_page', 'community_page', 'activity_page']:
+                fresh_import(page)
+            mock_get_user_workouts.assert_called_once_with('user1')
+            self.assertEqual(mock_bq_client.return_value.query.call_count, queries)
+            self.assertEqual(mock_get_user_profile.call_count, profiles)
+            self.assertEqual(mock_gen_model.call_count, advice)
+
+
+if __name__ == '__main__':
+    unittest.main()
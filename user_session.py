@@ -0,0 +1,42 @@
+#############################################################################
+# user_session.py
+#
+# This file contains the signed-in user's identity for the current
+# Streamlit session. Every page reads its user from here instead of
+# importing another page, so opening a page only loads that page's data.
+#
+# Importing this file makes no remote calls.
+#############################################################################
+
+import random
+import streamlit as st
+from data_fetcher import users
+
+USER_ID_KEY = "user_id"
+
+
+def get_user_id():
+    """
+    Get the current session's user ID.
+
+    The first call in a session picks the user (there is no sign-in yet) and
+    stores it in st.session_state, so every page and rerun sees the same user.
+
+    Returns:
+        The user's ID
+    """
+    if USER_ID_KEY not in st.session_state:
+        st.session_state[USER_ID_KEY] = random.choice(list(users.keys()))
+    return st.session_state[USER_ID_KEY]
+
+
+def set_user_id(user_id):
+    """
+    Switch the current session to another user.
+
+    Args:
+        user_id: ID of a known user
+    """
+    if user_id not in users:
+        raise ValueError(f'User {user_id} not found.')
+    st.session_state[USER_ID_KEY] = user_id